@@ -12,6 +12,7 @@ from collections import namedtuple
 
 # data must be imported first to install json serializer
 from . import data                  # noqa
+from . import codec                 # noqa
 from .app import app as celery_app  # noqa
 
 __version__ = '1.3.0'
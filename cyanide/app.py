@@ -36,6 +36,7 @@ class App(celery.Celery):
         if self.template_selected:
             raise RuntimeError('App already configured')
         self.template_selected = True
+        self.template = name
         use_template(self, name)
 
     def _maybe_use_default_template(self, **kwargs):
@@ -0,0 +1,87 @@
+"""Serializer microbenchmarks."""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import datetime
+import decimal
+import sys
+import uuid
+
+from celery.five import monotonic
+from kombu.exceptions import SerializerNotInstalled
+from kombu.serialization import dumps, loads
+
+from .data import BIG, SMALL, payload
+from .stats import format_latency, format_table
+
+__all__ = ['bench_codecs']
+
+#: Serializers compared by default, in addition to ``msgpack``
+#: when available.
+CODECS = ['json', 'pickle', 'cyanide-binary']
+
+
+def default_codecs():
+    # kombu registers msgpack even when the library is missing.
+    try:
+        import msgpack  # noqa
+    except ImportError:
+        return list(CODECS)
+    return CODECS + ['msgpack']
+
+
+def message_bodies():
+    """Task message bodies (protocol 2) used by :func:`bench_codecs`."""
+    small = [payload(64, label='item{0}'.format(i)) for i in range(1000)]
+    mixed = {
+        'when': datetime.datetime(2016, 10, 19, 12, 36),
+        'amount': decimal.Decimal('3.14'),
+        'id': uuid.UUID('a1e0b4f0-3b1c-4ad1-9b7b-4e7c6d3d2e11'),
+        'numbers': list(range(100)),
+    }
+    return [
+        ('SMALL', ((SMALL,), {}, {})),
+        ('BIG', ((BIG,), {}, {})),
+        ('1000 objects', ((small,), {}, {})),
+        ('mixed', ((mixed,), {}, {})),
+    ]
+
+
+def timeit(fun, min_time=0.2):
+    """Return average number of seconds spent calling ``fun``."""
+    n = 1
+    while 1:
+        start = monotonic()
+        for _ in range(n):
+            fun()
+        elapsed = monotonic() - start
+        if elapsed >= min_time:
+            return elapsed / n
+        n *= 2
+
+
+def bench_codecs(codecs=None, min_time=0.2, stdout=None):
+    stdout = sys.stdout if stdout is None else stdout
+    if codecs is None:
+        codecs = default_codecs()
+    rows = []
+    for label, body in message_bodies():
+        for codec in codecs:
+            try:
+                content_type, encoding, data = dumps(body, serializer=codec)
+            except SerializerNotInstalled:
+                continue
+            except Exception as exc:
+                rows.append([label, codec, 'unsupported: {0!r}'.format(exc),
+                             '', ''])
+                continue
+            rows.append([
+                label, codec, len(data),
+                format_latency(timeit(
+                    lambda: dumps(body, serializer=codec), min_time)),
+                format_latency(timeit(
+                    lambda: loads(data, content_type, encoding,
+                                  accept=[content_type]), min_time)),
+            ])
+    print(format_table(['body', 'codec', 'size', 'encode', 'decode'], rows),
+          file=stdout)
+    return rows
@@ -1,9 +1,27 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
+from contextlib import contextmanager
+
 from celery.bin.base import Command, Option
 from celery.utils.imports import symbol_by_name
 
 from cyanide.app import app as cyanide_app
+from cyanide.bench import bench_codecs
+from cyanide.compare import Comparison
+from cyanide.costmodel import calibration_table
+from cyanide.distributed import Agent, Coordinator
+from cyanide.fleet import Fleet
+from cyanide.loadgen import OpenLoop, parse_schedule
+from cyanide.templates import CYANIDE_QUEUE
+from cyanide.trace import Recorder, Replay
+from cyanide.tuning import Tuner, parse_range
+
+#: Options using broadcast messages (remote control commands or
+#: events), needing a transport supporting fanout exchanges.
+BROADCAST_OPTIONS = (
+    'diag', 'resources', 'leak_hunt', 'profile', 'calibrate', 'record',
+    'agent', 'agents',
+)
 
 
 class cyanide(Command):
@@ -16,13 +34,157 @@ class cyanide(Command):
         super(cyanide, self).__init__(app, *args, **kwargs)
 
     def run(self, *names, **options):
+        self.check_broadcast(options)
         try:
-            return self.run_suite(names, **options)
+            if options.get('bench_codecs'):
+                return bench_codecs(stdout=self.stdout)
+            if options.get('calibrate'):
+                return self.run_calibrate(**options)
+            if options.get('compare'):
+                return self.run_compare(names, **options)
+            if options.get('tune_prefetch'):
+                return self.run_tune(names, **options)
+            if options.get('record'):
+                return self.run_record(**options)
+            with self.local_workers(**options):
+                if options.get('replay'):
+                    return self.run_replay(**options)
+                if options.get('agent'):
+                    return self.run_agent(**options)
+                if options.get('agents'):
+                    return self.run_coordinator(names, **options)
+                if options.get('rate') or options.get('ramp'):
+                    return self.run_open_loop(**options)
+                return self.run_suite(names, **options)
         except KeyboardInterrupt:
             print('###interrupted by user: exiting...', file=self.stdout)
 
+    def check_broadcast(self, options):
+        used = [name for name in BROADCAST_OPTIONS if options.get(name)]
+        if not used:
+            return
+        with self.app.connection() as conn:
+            implements = getattr(conn.transport, 'implements', None)
+            transport = conn.transport_cls
+        if implements is not None and \
+                'fanout' not in implements.exchange_type:
+            raise self.UsageError(
+                'Transport {0!r} cannot broadcast, as needed by: {1}'.format(
+                    transport, ', '.join(
+                        '--' + name.replace('_', '-') for name in used)))
+
+    @contextmanager
+    def local_workers(self, workers=0, worker_concurrency=None,
+                      worker_pool=None, worker_logdir=None,
+                      marker_queue=None, **kwargs):
+        if not workers:
+            yield None
+        else:
+            queues = [CYANIDE_QUEUE]
+            if marker_queue:
+                queues.append(marker_queue)
+            with Fleet(self.app, workers,
+                       concurrency=worker_concurrency,
+                       pool=worker_pool,
+                       queues=queues,
+                       logdir=worker_logdir,
+                       stdout=self.stdout) as fleet:
+                yield fleet
+
+    def run_open_loop(self, rate=None, ramp=None, duration=10.0,
+                      **options):
+        return OpenLoop(
+            self.app, parse_schedule(rate, ramp, duration),
+            stdout=self.stdout,
+        ).run()
+
+    def run_calibrate(self, **options):
+        print(calibration_table(self.app.control.broadcast(
+            'calibrate', arguments={'force': True},
+            reply=True, timeout=5.0,
+        )), file=self.stdout)
+
+    def run_record(self, record=None, record_time=None, **options):
+        return Recorder(
+            self.app, record, stdout=self.stdout,
+        ).run(record_time)
+
+    def run_replay(self, replay=None, replay_speed=1.0, **options):
+        return Replay(
+            self.app, replay, speed=replay_speed, stdout=self.stdout,
+        ).run()
+
+    def run_agent(self, agent_name=None, block_timeout=None,
+                  no_color=False, **options):
+        return Agent(
+            self.app, agent_name,
+            block_timeout=block_timeout,
+            no_color=no_color,
+            stdout=self.stdout,
+            stderr=self.stderr,
+        ).run()
+
+    def run_coordinator(self, names, agents=None, suite=None, group='all',
+                        param=None, offset=0, numtests=None,
+                        agent_delay=2.0, block_timeout=None,
+                        json_report=None, **options):
+        return Coordinator(
+            self.app, names, agents, options,
+            suite=suite,
+            group=group,
+            param=param,
+            offset=offset,
+            numtests=numtests,
+            delay=agent_delay,
+            timeout=block_timeout,
+            json_report=json_report,
+            stdout=self.stdout,
+            stderr=self.stderr,
+        ).run()
+
+    def run_compare(self, names, compare=None, **options):
+        return Comparison(
+            compare.split(), self.child_argv(names, options),
+            stdout=self.stdout,
+        ).run()
+
+    def run_tune(self, names, tune_prefetch=None, tune_concurrency=None,
+                 workers=0, worker_pool=None, worker_logdir=None,
+                 **options):
+        exclude = ('compare', 'json_report', 'tune_prefetch',
+                   'tune_concurrency', 'workers', 'worker_concurrency',
+                   'worker_pool', 'worker_logdir')
+        return Tuner(
+            self.app, self.child_argv(names, options, exclude),
+            prefetch=parse_range(tune_prefetch),
+            concurrency=[int(c) for c in tune_concurrency.split(',')]
+            if tune_concurrency else None,
+            workers=workers or 1,
+            pool=worker_pool,
+            logdir=worker_logdir,
+            stdout=self.stdout,
+        ).run()
+
+    def child_argv(self, names, options,
+                   exclude=('compare', 'json_report')):
+        # recreate command-line arguments from parsed options.
+        argv = list(names)
+        for opt in self.get_options():
+            value = options.get(opt.dest)
+            if opt.dest in exclude or value == opt.default:
+                continue
+            if opt.action == 'store_true':
+                argv.append(opt.get_opt_string())
+            elif opt.action == 'append':
+                argv.extend('{0}={1}'.format(opt.get_opt_string(), v)
+                            for v in value)
+            else:
+                argv.append('{0}={1}'.format(opt.get_opt_string(), value))
+        return argv
+
     def run_suite(self, names, suite,
-                  block_timeout=None, no_color=False, **options):
+                  block_timeout=None, no_color=False,
+                  rate=None, ramp=None, duration=None, **options):
         return symbol_by_name(suite)(
             self.app,
             block_timeout=block_timeout,
@@ -33,6 +195,17 @@ class cyanide(Command):
         return (
             Option('-i', '--iterations', type='int', default=50,
                    help='Number of iterations for each test'),
+            Option('--warmup', type='int', default=0,
+                   help='Number of warm-up iterations to run before the '
+                        'measured iterations of each test'),
+            Option('--converge', type='float', default=None,
+                   help='Iterate until the 95 percent confidence interval '
+                        'of the time per iteration is narrower than this '
+                        'fraction of the mean (e.g. 0.05), '
+                        'ignores --iterations'),
+            Option('--max-time', type='float', default=None,
+                   help='Stop iterating a test after this many seconds '
+                        '(default with --converge: 600)'),
             Option('-n', '--numtests', type='int', default=None,
                    help='Number of tests to execute'),
             Option('-o', '--offset', type='int', default=0,
@@ -43,14 +216,107 @@ class cyanide(Command):
             Option('-r', '--repeat', type='float', default=0,
                    help='Number of times to repeat the test suite'),
             Option('-g', '--group', default='all',
-                   help='Specify test group (all|green|redis)'),
+                   help='Specify test group '
+                        '(all|green|redis|payload|scaling|eta|recovery|cost)'),
             Option('--diag', default=False, action='store_true',
-                   help='Enable diagnostics (slow)'),
+                   help='Enable diagnostics'),
+            Option('--diag-max-tasks', type='int', default=None,
+                   help='Max number of tasks to keep events for '
+                        '(default: 10000)'),
+            Option('--diag-max-age', type='float', default=None,
+                   help='Forget completed tasks older than n seconds'),
+            Option('--diag-sample', type='float', default=None,
+                   help='Fraction of tasks to keep events for (0.0-1.0)'),
+            Option('--param', action='append', default=None,
+                   help='Only run parametrized tests with these parameter '
+                        'values, e.g. --param n=10,100 (can be repeated)'),
+            Option('--join-strategy', default=None,
+                   help='How to wait for results: get, join, join_native, '
+                        'iter_native, per_result or auto to use the fastest '
+                        'for the result backend (default: get)'),
             Option('-J', '--no-join', default=False, action='store_true',
                    help='Do not wait for task results'),
             Option('-S', '--suite',
                    default=self.app.cyanide_suite,
                    help='Specify test suite to execute (path to class)'),
+            Option('--fps', type='float', default=None,
+                   help='Times per second to redraw the status of the '
+                        'running test in a terminal (default: 4)'),
+            Option('--status-interval', type='float', default=None,
+                   help='Seconds between status lines when not writing to '
+                        'a terminal (default: 10)'),
+            Option('--resources', default=False, action='store_true',
+                   help='Sample CPU and memory usage of client and '
+                        'local workers for every test'),
+            Option('--sample-interval', type='float', default=0.5,
+                   help='Seconds between resource usage samples'),
+            Option('--leak-hunt', default=False, action='store_true',
+                   help='Sample worker memory after every iteration and '
+                        'report tests where it keeps growing'),
+            Option('--leak-threshold', type='float', default=None,
+                   help='Growth in KB over a test to report as a leak '
+                        '(default: 1024)'),
+            Option('--profile', default=None, metavar='DIR',
+                   help='Profile every test in the client and in worker '
+                        'pool processes, writing stats files to DIR'),
+            Option('--marker-queue', default=None,
+                   help='Send markers to this queue instead of the test '
+                        'queue (local workers consume from it too)'),
+            Option('--workers', type='int', default=0,
+                   help='Start this many local workers for the run'),
+            Option('--worker-concurrency', type='int', default=None,
+                   help='Pool concurrency of local workers'),
+            Option('--worker-pool', default=None,
+                   help='Pool implementation of local workers'),
+            Option('--worker-logdir', default=None,
+                   help='Directory to write local worker logs to'),
+            Option('--agent', default=False, action='store_true',
+                   help='Wait for a coordinator (--agents) to tell what '
+                        'tests to run, instead of running them'),
+            Option('--agent-name', default=None,
+                   help='Name of this agent (default: cyanide.PID@HOST)'),
+            Option('--agents', type='int', default=None,
+                   help='Run the tests on this many agents at once '
+                        '(started with --agent) and merge the results'),
+            Option('--agent-delay', type='float', default=2.0,
+                   help='Seconds from sending a test until the agents '
+                        'all start it'),
+            Option('--tune-prefetch', default=None, metavar='LOW:HIGH',
+                   help='Search for the prefetch multiplier giving the best '
+                        'throughput and p99 latency for the selected tests, '
+                        'restarting local workers for every setting'),
+            Option('--tune-concurrency', default=None,
+                   help='Comma-separated list of worker concurrency values '
+                        'to search the prefetch multiplier for'),
+            Option('--compare', default=None,
+                   help='Run the tests once for every template in this '
+                        'space-separated list, and compare the results'),
+            Option('--json-report', default=None,
+                   help='Write test results to this file (json)'),
+            Option('--record', default=None, metavar='FILE',
+                   help='Record tasks executed by workers to a trace file '
+                        '(compressed if it ends with .gz)'),
+            Option('--record-time', type='float', default=None,
+                   help='Seconds to record for (default: until '
+                        'interrupted)'),
+            Option('--replay', default=None, metavar='FILE',
+                   help='Replay tasks recorded with --record using '
+                        'stand-in tasks of the same sizes and runtimes'),
+            Option('--replay-speed', type='float', default=1.0,
+                   help='Replay at this speed relative to the recording, '
+                        'e.g. 10 or 0.5'),
+            Option('--calibrate', default=False, action='store_true',
+                   help='Measure the CPU speed of worker hosts for '
+                        'tasks with calibrated costs'),
+            Option('--bench-codecs', default=False, action='store_true',
+                   help='Compare serializer speed and message size'),
+            Option('-R', '--rate', type='float', default=None,
+                   help='Open-loop mode: publish at this rate (tasks/s)'),
+            Option('--ramp', default=None,
+                   help='Open-loop mode: comma-separated list of rates '
+                        '(tasks/s) to step through'),
+            Option('--duration', type='float', default=10.0,
+                   help='Open-loop mode: seconds to hold each rate'),
         )
 
 
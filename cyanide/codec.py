@@ -0,0 +1,220 @@
+"""Compact binary serializer.
+
+Messages are encoded as tagged values using :mod:`struct`, with a
+frame of its own for :class:`~cyanide.data.Data` so the payload is
+written as-is instead of being escaped into a json string.
+
+Installed as the ``cyanide-binary`` serializer in kombu,
+and used by the ``binary`` configuration template.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import struct
+
+from kombu.serialization import register
+
+from .compat import PY3, text_t
+from .data import Data, find_reducer
+
+__all__ = ['dumps', 'loads', 'install_codec']
+
+NAME = 'cyanide-binary'
+CONTENT_TYPE = 'application/x-cyanide-binary'
+
+if PY3:  # pragma: no cover
+    int_types = (int,)
+else:  # pragma: no cover
+    int_types = (int, long)  # noqa
+
+_uint32 = struct.Struct('>I')
+_int64 = struct.Struct('>q')
+_double = struct.Struct('>d')
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+T_NONE = b'N'
+T_TRUE = b'T'
+T_FALSE = b'F'
+T_INT = b'i'
+T_BIGINT = b'I'
+T_FLOAT = b'f'
+T_BYTES = b'b'
+T_TEXT = b's'
+T_LIST = b'l'
+T_DICT = b'd'
+T_DATA = b'D'
+
+
+def _enc_none(obj, write):
+    write(T_NONE)
+
+
+def _enc_bool(obj, write):
+    write(T_TRUE if obj else T_FALSE)
+
+
+def _enc_int(obj, write):
+    if INT64_MIN <= obj <= INT64_MAX:
+        write(T_INT + _int64.pack(obj))
+    else:
+        _enc_sized(T_BIGINT, str(obj).encode(), write)
+
+
+def _enc_float(obj, write):
+    write(T_FLOAT + _double.pack(obj))
+
+
+def _enc_sized(tag, data, write):
+    write(tag + _uint32.pack(len(data)))
+    write(data)
+
+
+def _enc_bytes(obj, write):
+    _enc_sized(T_BYTES, obj, write)
+
+
+def _enc_text(obj, write):
+    _enc_sized(T_TEXT, obj.encode('utf-8'), write)
+
+
+def _enc_list(obj, write):
+    write(T_LIST + _uint32.pack(len(obj)))
+    for item in obj:
+        encode(item, write)
+
+
+def _enc_dict(obj, write):
+    write(T_DICT + _uint32.pack(len(obj)))
+    for key, value in obj.items():
+        encode(key, write)
+        encode(value, write)
+
+
+def _enc_data(obj, write):
+    write(T_DATA)
+    encode(obj.label, write)
+    encode(obj.data, write)
+
+
+#: Encoders by exact type, types not listed are resolved and cached
+#: by :func:`find_encoder`.
+encoders = {
+    type(None): _enc_none,
+    bool: _enc_bool,
+    float: _enc_float,
+    bytes: _enc_bytes,
+    text_t: _enc_text,
+    list: _enc_list,
+    tuple: _enc_list,
+    dict: _enc_dict,
+    Data: _enc_data,
+}
+for _t in int_types:
+    encoders[_t] = _enc_int
+
+
+def _reducing_encoder(reducer):
+
+    def _enc_reduced(obj, write):
+        encode(reducer(obj), write)
+    return _enc_reduced
+
+
+def _enc_proxy(obj, write):
+    encode(obj._get_current_object(), write)
+
+
+def find_encoder(cls):
+    try:
+        return encoders[cls]
+    except KeyError:
+        pass
+    if getattr(cls, '_get_current_object', None) is not None:
+        encoders[cls] = _enc_proxy  # celery.local.Proxy
+        return _enc_proxy
+    for base, encoder in ((dict, _enc_dict), ((list, tuple), _enc_list),
+                          (int_types, _enc_int), (text_t, _enc_text),
+                          (bytes, _enc_bytes)):
+        if issubclass(cls, base):
+            break
+    else:
+        # same types as supported by the json encoder.
+        reducer = find_reducer(cls)
+        if reducer is None:
+            raise TypeError('{0!r} cannot be serialized'.format(cls))
+        encoder = _reducing_encoder(reducer)
+    encoders[cls] = encoder
+    return encoder
+
+
+def encode(obj, write, encoders=encoders):
+    (encoders.get(type(obj)) or find_encoder(type(obj)))(obj, write)
+
+
+def dumps(obj):
+    chunks = []
+    encode(obj, chunks.append)
+    return b''.join(chunks)
+
+
+def _dec_sized(buf, i):
+    size, = _uint32.unpack_from(buf, i)
+    i += 4
+    return buf[i:i + size], i + size
+
+
+def decode(buf, i=0):
+    tag = buf[i:i + 1]
+    i += 1
+    if tag == T_INT:
+        return _int64.unpack_from(buf, i)[0], i + 8
+    elif tag == T_TEXT:
+        data, i = _dec_sized(buf, i)
+        return data.decode('utf-8'), i
+    elif tag == T_LIST:
+        n, = _uint32.unpack_from(buf, i)
+        i += 4
+        items = []
+        for _ in range(n):
+            item, i = decode(buf, i)
+            items.append(item)
+        return items, i
+    elif tag == T_DICT:
+        n, = _uint32.unpack_from(buf, i)
+        i += 4
+        d = {}
+        for _ in range(n):
+            key, i = decode(buf, i)
+            d[key], i = decode(buf, i)
+        return d, i
+    elif tag == T_NONE:
+        return None, i
+    elif tag == T_TRUE:
+        return True, i
+    elif tag == T_FALSE:
+        return False, i
+    elif tag == T_FLOAT:
+        return _double.unpack_from(buf, i)[0], i + 8
+    elif tag == T_BYTES:
+        return _dec_sized(buf, i)
+    elif tag == T_DATA:
+        label, i = decode(buf, i)
+        data, i = decode(buf, i)
+        return Data(label, data), i
+    elif tag == T_BIGINT:
+        data, i = _dec_sized(buf, i)
+        return int(data), i
+    raise ValueError('Unknown type tag {0!r} at offset {1}'.format(tag, i))
+
+
+def loads(s):
+    if not isinstance(s, bytes):
+        s = bytes(s)
+    obj, _ = decode(s)
+    return obj
+
+
+def install_codec():
+    register(NAME, dumps, loads,
+             content_type=CONTENT_TYPE, content_encoding='binary')
+install_codec()
@@ -0,0 +1,142 @@
+"""Incremental result collection."""
+from __future__ import absolute_import, unicode_literals
+
+from collections import OrderedDict
+from itertools import islice
+
+from celery import states
+from celery.five import values
+from celery.result import ResultSet
+
+__all__ = ['Collector', 'STRATEGIES', 'supported_strategies']
+
+
+def _get(rs, callback, **kwargs):
+    # join_native when the backend supports it, otherwise join.
+    rs.get(callback=callback, **kwargs)
+
+
+def _join(rs, callback, **kwargs):
+    rs.join(callback=callback, **kwargs)
+
+
+def _join_native(rs, callback, **kwargs):
+    rs.join_native(callback=callback, **kwargs)
+
+
+def _iter_native(rs, callback, propagate=True, **kwargs):
+    for task_id, meta in rs.iter_native(**kwargs):
+        value = meta['result']
+        if propagate and meta['status'] in states.PROPAGATE_STATES:
+            raise value
+        callback(task_id, value)
+
+
+def _per_result(rs, callback, **kwargs):
+    for result in rs.results:
+        callback(result.id, result.get(**kwargs))
+
+
+#: Ways of waiting for results, by name.
+STRATEGIES = OrderedDict([
+    ('get', _get),
+    ('join', _join),
+    ('join_native', _join_native),
+    ('iter_native', _iter_native),
+    ('per_result', _per_result),
+])
+
+#: Strategies only available when the backend supports native join.
+NATIVE_STRATEGIES = frozenset(['join_native', 'iter_native'])
+
+
+def supported_strategies(backend):
+    """Return list of strategy names supported by result backend."""
+    native = getattr(backend, 'supports_native_join', False)
+    return [name for name in STRATEGIES
+            if native or name not in NATIVE_STRATEGIES]
+
+
+class Collector(object):
+    """Keeps track of the results still outstanding for a set of tasks.
+
+    The set of outstanding results shrinks as every result arrives,
+    so the number of results left is known in constant time.  The
+    results are waited for using a single :class:`ResultSet` that
+    tasks are added to as they are sent, and results already received
+    are only removed from it once they outnumber the outstanding ones,
+    so waiting again does not rebuild it every time.
+
+    :param results: Iterable of :class:`~celery.result.AsyncResult`.
+    :keyword on_result: Called with ``(task_id, value)`` as soon as
+        the result for a task is received.
+    :keyword keep_values: Set to :const:`False` to not keep the values
+        received, e.g. when collecting results for a long time.
+    :keyword strategy: Name of the way to wait for results,
+        see :data:`STRATEGIES`.
+
+    """
+
+    def __init__(self, results=(), app=None, on_result=None,
+                 keep_values=True, strategy='get'):
+        self.app = app
+        self.on_result = on_result
+        self.keep_values = keep_values
+        self.strategy = STRATEGIES[strategy]
+        self.ids = []
+        self.pending = OrderedDict()
+        self.resultset = ResultSet([], app=app)
+        self.stale = 0  # results received, still in the result set.
+        self.values = {}
+        self.total = 0
+        self.received = 0
+        for result in results:
+            self.add(result)
+
+    def add(self, result):
+        if self.keep_values:
+            self.ids.append(result.id)
+        self.pending[result.id] = result
+        # ResultSet.add checks for duplicates, which is O(n).
+        self.resultset.results.append(result)
+        self.total += 1
+
+    def __call__(self, task_id, value):
+        if self.pending.pop(task_id, None) is not None:
+            if self.keep_values:
+                self.values[task_id] = value
+            self.received += 1
+            self.stale += 1
+            if self.on_result is not None:
+                self.on_result(task_id, value)
+
+    def collect(self, **kwargs):
+        """Wait for the outstanding results.
+
+        Accepts the same arguments as :meth:`ResultSet.get
+        <celery.result.ResultSet.get>` (``timeout`` is for every result
+        with the ``per_result`` strategy), and will raise
+        :exc:`~celery.exceptions.TimeoutError` if all the results
+        did not arrive within ``timeout`` seconds.
+
+        """
+        if self.pending:
+            if self.stale > len(self.pending):
+                self.resultset.results[:] = list(values(self.pending))
+                self.stale = 0
+            self.strategy(self.resultset, self, **kwargs)
+        return self.results()
+
+    def results(self):
+        """Return list of values received, in the order added."""
+        return [self.values.get(task_id) for task_id in self.ids]
+
+    def first_outstanding(self, n=10):
+        return list(islice(self.pending, n))
+
+    @property
+    def outstanding(self):
+        return len(self.pending)
+
+    def __len__(self):
+        return self.total
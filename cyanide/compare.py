@@ -0,0 +1,176 @@
+"""Compare test results across configuration templates.
+
+Every template runs the same tests in a child process of its own (as
+:meth:`App.use_template <cyanide.app.App.use_template>` can only be
+called once per process), and writes a json report that is read back
+to print the results side by side.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from collections import OrderedDict
+
+from celery.five import items
+
+from .stats import TestStats, format_latency, format_table
+
+__all__ = ['Comparison', 'load_report', 'compare_table', 'run_report']
+
+
+def load_report(path):
+    """Load json report written by :meth:`Suite.write_report
+    <cyanide.suite.Suite.write_report>`, returns :class:`TestStats`
+    by test name, all repetitions combined."""
+    with open(path) as fh:
+        report = json.load(fh)
+    by_name = OrderedDict()
+    for d in report['tests']:
+        by_name.setdefault(d['name'], []).append(TestStats.from_dict(d))
+    return OrderedDict(
+        (name, TestStats.combine(name, stats))
+        for name, stats in items(by_name)
+    )
+
+
+def run_report(template, argv, python=None, env=None):
+    """Run :program:`celery cyanide` in a child process using
+    ``template``, and return tuple of ``(exitcode, report)``, where
+    report is as returned by :func:`load_report` (or :const:`None`)."""
+    fd, path = tempfile.mkstemp(prefix='cyanide-', suffix='.json')
+    os.close(fd)
+    try:
+        retcode = subprocess.call(
+            [python or sys.executable, '-m', 'cyanide', '-Z', template,
+             '--json-report', path] + list(argv),
+            env=env,
+        )
+        try:
+            return retcode, load_report(path)
+        except ValueError:  # child did not write report
+            return retcode, None
+    finally:
+        os.unlink(path)
+
+
+def delta(value, baseline, significant=False):
+    if not value or not baseline:
+        return ''
+    return ' ({0:+.1f}%{1})'.format(
+        (value - baseline) / baseline * 100.0, '*' if significant else '')
+
+
+def differs(stats, baseline):
+    """Return true if the confidence intervals of the time per
+    iteration do not overlap."""
+    (mean, half), (base, base_half) = stats.time_ci(), baseline.time_ci()
+    if half is None or base_half is None:
+        return False
+    return abs(mean - base) > half + base_half
+
+
+def compare_table(reports):
+    """Format table comparing reports by template name.
+
+    The first template is the baseline, other columns show the
+    change relative to it.  Changes in time per iteration larger than
+    the confidence intervals are marked with ``*``.
+
+    """
+    templates = list(reports)
+    baseline = reports[templates[0]]
+    names = list(baseline)
+    for report in list(reports.values())[1:]:
+        names.extend(name for name in report if name not in names)
+    totals = dict(
+        (template, TestStats.combine('(total)', list(report.values())))
+        for template, report in items(reports)
+    )
+
+    def get(template, name):
+        if name == '(total)':
+            return totals[template]
+        return reports[template].get(name)
+
+    headers = ['test']
+    for template in templates:
+        headers.extend(['{0} tasks/s'.format(template),
+                        '{0} p50'.format(template),
+                        '{0} p99'.format(template),
+                        '{0} time/it'.format(template)])
+    rows = []
+    for name in names + ['(total)']:
+        base = get(templates[0], name)
+        row = [name]
+        for template in templates:
+            stats = get(template, name)
+            if stats is None:
+                row.extend(['-', '-', '-', '-'])
+                continue
+            p50 = stats.latency.percentile(50)
+            p99 = stats.latency.percentile(99)
+            row.extend([
+                '{0:.1f}{1}'.format(stats.rate, delta(
+                    stats.rate, base and base.rate)),
+                '{0}{1}'.format(format_latency(p50), delta(
+                    p50, base and base.latency.percentile(50))),
+                '{0}{1}'.format(format_latency(p99), delta(
+                    p99, base and base.latency.percentile(99))),
+                time_cell(stats, base),
+            ])
+        rows.append(row)
+    return format_table(headers, rows)
+
+
+def time_cell(stats, base):
+    mean, half = stats.time_ci()
+    if mean is None:
+        return '-'
+    cell = format_latency(mean)
+    if half is not None:
+        cell = '{0}+/-{1}'.format(cell, format_latency(half))
+    if base is None or base is stats:
+        return cell
+    return cell + delta(mean, base.time_ci()[0], differs(stats, base))
+
+
+class Comparison(object):
+    """Run the same tests using several templates.
+
+    :param templates: List of template names (a template name can be
+        a comma-separated list of templates to mix).
+    :param argv: Arguments passed on to every :program:`celery cyanide`
+        child process.
+
+    """
+
+    def __init__(self, templates, argv, stdout=None, python=None):
+        self.templates = templates
+        self.argv = argv
+        self.stdout = sys.stdout if stdout is None else stdout
+        self.python = python or sys.executable
+
+    def print(self, message):
+        print(message, file=self.stdout)
+
+    def run(self):
+        reports = OrderedDict()
+        for template in self.templates:
+            report = self.run_template(template)
+            if report is not None:
+                reports[template] = report
+        if reports:
+            self.print(compare_table(reports))
+        return reports
+
+    def run_template(self, template):
+        self.print('+running with template {0!r}'.format(template))
+        retcode, report = run_report(template, self.argv, self.python)
+        if retcode:
+            self.print('-template {0!r} failed with exit code {1}'.format(
+                template, retcode))
+        return report
@@ -2,14 +2,18 @@ from __future__ import absolute_import, unicode_literals
 
 import sys
 
-__all__ = ['bytes_if_py2']
+__all__ = ['bytes_if_py2', 'text_t']
 
 PY3 = sys.version_info[0] >= 3
 
 if PY3:  # pragma: no cover
+    text_t = str
+
     def bytes_if_py2(s):
         return s
 else:  # pragma: no cover
+    text_t = unicode  # noqa
+
     def bytes_if_py2(s):  # noqa
         if isinstance(s, unicode):
             return s.encode()
@@ -0,0 +1,160 @@
+"""Calibrated task costs.
+
+:task:`~cyanide.tasks.cost` burns a number of microseconds of CPU time
+by running a loop a number of times measured for the host, so a task
+burning 5ms takes the same CPU time on every machine (while how long
+it takes depends on the pool and what else is running).
+
+The host is measured once, by the first process needing it, and the
+result is shared by all processes on the host using a file in the
+temporary directory.  Pool processes load it when they start, and
+the ``calibrate`` remote control command measures the host again
+(used by pool processes started after that), and reports how long
+burning 5ms actually took:
+
+.. code-block:: console
+
+    $ celery cyanide --calibrate
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import json
+import os
+import platform
+import tempfile
+
+from celery.five import items
+from celery.signals import worker_process_init
+
+try:
+    from time import process_time
+except ImportError:  # pragma: no cover  (py2)
+    from time import clock as process_time
+
+try:
+    from celery.worker.control import control_command
+except ImportError:  # pragma: no cover  (celery < 4.0)
+    from celery.worker.control import Panel
+
+    def control_command(**kwargs):  # noqa
+        return Panel.register
+
+from .stats import format_latency, format_table
+
+__all__ = ['allocate', 'burn', 'calibration', 'calibration_table']
+
+#: Seconds of CPU time every measurement should take.
+CALIBRATION_TIME = 0.05
+
+#: Number of measurements, the median is used.
+CALIBRATION_ROUNDS = 5
+
+#: Loop iterations per microsecond of CPU time in this process.
+_loops_per_us = None
+
+
+def spin(n):
+    x = 0
+    for i in range(n):
+        x ^= i
+    return x
+
+
+def measure(target=CALIBRATION_TIME, rounds=CALIBRATION_ROUNDS):
+    """Return number of :func:`spin` iterations per microsecond."""
+    n = 1000
+    while 1:
+        start = process_time()
+        spin(n)
+        elapsed = process_time() - start
+        if elapsed >= target / 10:
+            break
+        n *= 2
+    n = max(int(n * target / elapsed), 1)
+    rates = []
+    for _ in range(rounds):
+        start = process_time()
+        spin(n)
+        rates.append(n / ((process_time() - start) * 1e6 or 1.0))
+    return sorted(rates)[len(rates) // 2]
+
+
+def _python():
+    return '{0} {1}'.format(platform.python_implementation(),
+                            platform.python_version())
+
+
+def _calibration_path():
+    return os.path.join(tempfile.gettempdir(), 'cyanide-calibration.json')
+
+
+def _load():
+    try:
+        with open(_calibration_path()) as fh:
+            saved = json.load(fh)
+    except (IOError, OSError, ValueError):
+        return None
+    # the speed of the loop depends on the Python implementation.
+    if saved.get('python') == _python():
+        return saved.get('loops_per_us')
+
+
+def _save(loops_per_us):
+    path = _calibration_path()
+    tmp = '{0}.{1}'.format(path, os.getpid())
+    with open(tmp, 'w') as fh:
+        json.dump({'loops_per_us': loops_per_us, 'python': _python()}, fh)
+    os.rename(tmp, path)  # other processes never read a partial file.
+
+
+def calibration(force=False):
+    """Return loop iterations per microsecond of CPU time,
+    measuring the host if not already done (or ``force``)."""
+    global _loops_per_us
+    if force:
+        _loops_per_us = None
+    elif _loops_per_us is None:
+        _loops_per_us = _load()
+    if _loops_per_us is None:
+        _loops_per_us = measure()
+        _save(_loops_per_us)
+    return _loops_per_us
+
+
+def burn(us):
+    """Use ``us`` microseconds of CPU time."""
+    if us:
+        spin(int(us * calibration()))
+
+
+def allocate(nbytes):
+    """Return ``nbytes`` bytes of memory, all pages touched."""
+    return bytearray(nbytes)
+
+
+@worker_process_init.connect(weak=False)
+def load_calibration(**kwargs):
+    # so the first task does not pay for it.
+    calibration()
+
+
+@control_command(args=[('force', bool)], signature='[force]')
+def calibrate(state, force=False, **kwargs):
+    """Measure the host, and burn 5ms of CPU time to check it."""
+    loops_per_us = calibration(force)
+    start = process_time()
+    burn(5000)
+    return {'ok': {'loops_per_us': loops_per_us,
+                   'burn_5ms': process_time() - start}}
+
+
+def calibration_table(replies):
+    """Format replies of the ``calibrate`` control command."""
+    rows = []
+    for reply in replies or ():
+        for hostname, r in sorted(items(reply)):
+            r = r.get('ok') or {}
+            rows.append([hostname, '{0:.1f}'.format(
+                r.get('loops_per_us') or 0),
+                format_latency(r.get('burn_5ms'))])
+    return format_table(['worker', 'loops/us', '5ms burn took'], rows)
@@ -0,0 +1,173 @@
+"""Live status of the running test.
+
+The suite only updates counters as tasks are sent and results arrive,
+and a background thread draws the status from them at a fixed rate:
+redrawing a single line when the output is a terminal, or printing a
+line at longer intervals when it is not (e.g. redirected to a file), so
+the output never slows down the test itself.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import sys
+import threading
+
+from collections import deque
+
+from celery.five import monotonic
+
+from .stats import Histogram, format_latency
+
+__all__ = ['Dashboard']
+
+F_STATUS = """\
+{index:2d}: {name:<36} {iteration}/{total} \
+| {rate:.1f} tasks/s | in-flight {in_flight} | outstanding {outstanding} \
+| p50 {p50} p99 {p99} | errors {errors} | {elapsed:.1f}s\
+"""
+
+
+def terminal_width(default=80):
+    try:
+        return os.get_terminal_size().columns
+    except (AttributeError, OSError, ValueError):  # py2, not a terminal
+        return int(os.environ.get('COLUMNS') or default)
+
+
+class Dashboard(threading.Thread):
+    """Draws the status of the running test from counters.
+
+    :keyword tty: Redraw the status line in place, by default if
+        ``file`` is a terminal.
+    :keyword fps: Times per second to redraw the status line (tty).
+    :keyword interval: Seconds between status lines (not a tty).
+    :keyword window: Seconds of results the rate and latency
+        percentiles are calculated from.
+
+    """
+
+    def __init__(self, file=None, tty=None, fps=4.0, interval=10.0,
+                 window=2.0):
+        super(Dashboard, self).__init__(name='cyanide.Dashboard')
+        self.daemon = True
+        self.file = sys.stdout if file is None else file
+        if tty is None:
+            isatty = getattr(self.file, 'isatty', None)
+            tty = bool(isatty and isatty())
+        self.tty = tty
+        self.period = 1.0 / fps if tty else interval
+        self.window = window
+        self.lock = threading.RLock()
+        self.shown = 0  # length of status line currently displayed
+        self.test = None
+        self._stopped = threading.Event()
+        self.reset()
+
+    def set_rate(self, fps=None, interval=None):
+        if self.tty and fps:
+            self.period = 1.0 / fps
+        elif not self.tty and interval:
+            self.period = interval
+
+    def reset(self, name='', total=0, index=0):
+        self.name = name
+        self.total = total
+        self.index = index
+        self.iteration = 0
+        self.published = 0
+        self.completed = 0
+        self.errors = 0
+        self.outstanding = 0
+        self.started = monotonic()
+        self.samples = deque([(self.started, 0)])
+        self.current = Histogram()
+        self.previous = None
+        self.window_started = self.started
+
+    # -- counters, updated by the suite.
+
+    def start_test(self, name, total, index=0):
+        with self.lock:
+            self.reset(name, total, index)
+            self.test = name
+        if not self.is_alive():
+            self.start()
+
+    def stop_test(self):
+        with self.lock:
+            self.test = None
+            self.clear()
+
+    def task_published(self):
+        self.published += 1
+
+    def task_completed(self, latency=None):
+        self.completed += 1
+        if latency is not None:
+            self.current.record(latency)
+
+    def iteration_started(self, iteration):
+        self.iteration = iteration
+
+    def error(self):
+        self.errors += 1
+
+    # -- output
+
+    def write(self, message, file=None):
+        """Print message without mixing it up with the status line."""
+        with self.lock:
+            self.clear()
+            print(message, file=self.file if file is None else file)
+
+    def clear(self):
+        if self.tty and self.shown:
+            self.file.write('\r' + ' ' * self.shown + '\r')
+            self.file.flush()
+            self.shown = 0
+
+    def run(self):
+        while not self._stopped.wait(self.period):
+            with self.lock:
+                if self.test is not None:
+                    self.draw(monotonic())
+
+    def stop(self):
+        self._stopped.set()
+        self.stop_test()
+
+    def draw(self, now):
+        line = self.status(now)
+        if self.tty:
+            # a wrapped line cannot be redrawn in place.
+            line = line[:terminal_width() - 1]
+            self.file.write('\r' + line.ljust(self.shown))
+            self.shown = len(line)
+        else:
+            self.file.write(line + '\n')
+        self.file.flush()
+
+    def status(self, now):
+        if now - self.window_started >= self.window:
+            # percentiles are from the last complete window, so the
+            # histogram read is no longer updated by the suite.
+            self.previous, self.current = self.current, Histogram()
+            self.window_started = now
+        completed = self.completed
+        self.samples.append((now, completed))
+        while len(self.samples) > 2 and \
+                now - self.samples[0][0] > self.window:
+            self.samples.popleft()
+        since, before = self.samples[0]
+        latency = self.previous
+        return F_STATUS.format(
+            index=self.index, name=self.name,
+            iteration=self.iteration, total=self.total,
+            rate=(completed - before) / (now - since) if now > since else 0.0,
+            in_flight=max(self.published - completed, 0),
+            outstanding=self.outstanding,
+            p50=format_latency(latency.percentile(50) if latency else None),
+            p99=format_latency(latency.percentile(99) if latency else None),
+            errors=self.errors,
+            elapsed=now - self.started,
+        )
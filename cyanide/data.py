@@ -3,9 +3,15 @@ from __future__ import absolute_import, unicode_literals
 
 import datetime
 import decimal
+import os
+import random
+import string
+import threading
 import uuid
 
-from .compat import bytes_if_py2
+from collections import OrderedDict
+
+from .compat import bytes_if_py2, text_t
 
 try:
     import simplejson as json
@@ -20,49 +26,95 @@ except ImportError:                 # pragma: no cover
 
 
 _encoder_cls = type(json._default_encoder)
+
+#: Decoders for reduced objects, by qualified type name.
 type_registry = {}
 
+#: Reducers turning objects into something json serializable,
+#: by exact type.  Resolved and cached the first time a type is seen,
+#: :const:`None` means the type is not supported.
+reducers = {}
+
+
+def _reduce_datetime(obj):
+    r = obj.isoformat()
+    if r.endswith('+00:00'):
+        r = r[:-6] + 'Z'
+    return r
+
+
+def _reduce_date(obj):
+    return _reduce_datetime(
+        datetime.datetime(obj.year, obj.month, obj.day, 0, 0, 0, 0))
+
+
+def _reduce_isoformat(obj):
+    return obj.isoformat()
+
+
+def _reduce_proxy(obj):
+    obj = obj._get_current_object()
+    return find_reducer(type(obj))(obj)
+
+
+def find_reducer(cls):
+    """Return the reducer used to serialize objects of type ``cls``."""
+    try:
+        return reducers[cls]
+    except KeyError:
+        pass
+    reducer = reducers[cls] = _resolve_reducer(cls)
+    return reducer
+
+
+def _resolve_reducer(cls):
+    to_json = getattr(cls, '__to_json__', None)
+    if to_json is not None:
+        return to_json
+    if issubclass(cls, datetime.datetime):
+        return _reduce_datetime
+    if issubclass(cls, datetime.date):
+        return _reduce_date
+    if issubclass(cls, datetime.time):
+        return _reduce_isoformat
+    if issubclass(cls, (decimal.Decimal, uuid.UUID)):
+        return text_t
+    if getattr(cls, '_get_current_object', None) is not None:
+        return _reduce_proxy  # celery.local.Proxy
+
+
+def register_type(cls, reducer):
+    """Register function used to serialize objects of exact type ``cls``.
+
+    The function must return a json serializable value.
+
+    """
+    reducers[cls] = reducer
+
 
 class JSONEncoder(_encoder_cls):
     """Kombu custom json encoder."""
 
-    def default(self, obj,
-                dates=(datetime.datetime, datetime.date),
-                times=(datetime.time,),
-                textual=(decimal.Decimal, uuid.UUID),
-                isinstance=isinstance,
-                datetime=datetime.datetime):
-        try:
+    def default(self, obj, reducers=reducers):
+        reducer = reducers.get(type(obj)) or find_reducer(type(obj))
+        if reducer is None:
+            # raises TypeError
             return super(JSONEncoder, self).default(obj)
-        except TypeError:
-            reducer = getattr(obj, '__to_json__', None)
-            if reducer:
-                return reducer()
-            if isinstance(obj, dates):
-                if not isinstance(obj, datetime):
-                    obj = datetime(obj.year, obj.month, obj.day, 0, 0, 0, 0)
-                r = obj.isoformat()
-                if r.endswith("+00:00"):
-                    r = r[:-6] + "Z"
-                return r
-            elif isinstance(obj, times):
-                return obj.isoformat()
-            elif isinstance(obj, textual):
-                return text_t(obj)
-            raise
+        return reducer(obj)
 
 
 def decode_hook(d):
-    try:
-        d = d['py/obj']
-    except KeyError:
+    obj = d.get('py/obj')
+    if obj is None:
         return d
-    type_registry[d['type']](**d['attrs'])
+    return type_registry[obj['type']](**obj['attrs'])
 
 
 def install_json():
     json._default_encoder = JSONEncoder()
-    json._default_decoder.object_hook = decode_hook
+    # the C scanner reads object_hook when the decoder is created,
+    # so setting the attribute of an existing decoder has no effect.
+    json._default_decoder = json.JSONDecoder(object_hook=decode_hook)
     try:
         from kombu.utils import json as kombujson
     except ImportError:
@@ -73,9 +125,22 @@ install_json()  # ugh, ugly but it's a test suite after all
 
 
 # this imports kombu.utils.json, so can only import after install_json()
+from celery.local import PromiseProxy  # noqa
 from celery.utils.debug import humanbytes  # noqa
 from celery.utils.imports import qualname  # noqa
 
+#: Size of the block repeated to build random payloads.
+#: Larger than the zlib window, so payloads are still incompressible.
+RANDOM_BLOCK_SIZE = 64 * 1024
+
+#: Payloads are kept for reuse, up to this many bytes in total
+#: (larger payloads are not kept at all).
+PAYLOAD_CACHE_BYTES = 16 * 2 ** 20
+
+_payloads = OrderedDict()
+_payloads_size = 0
+_payloads_lock = threading.Lock()
+
 
 def json_reduce(obj, attrs):
     return {'py/obj': {'type': qualname(obj), 'attrs': attrs}}
@@ -83,6 +148,7 @@ def json_reduce(obj, attrs):
 
 def jsonable(cls):
     type_registry[qualname(cls)] = cls.__from_json__
+    register_type(cls, cls.__to_json__)
     return cls
 
 
@@ -111,5 +177,83 @@ class Data(object):
     def __reduce__(self):
         return Data, (self.label, self.data)
 
-BIG = Data('BIG', 'x' * 2 ** 20 * 8)
-SMALL = Data('SMALL', 'e' * 1024)
+
+def _repeat(block, size):
+    if not block:
+        return block
+    return (block * (size // len(block) + 1))[:size]
+
+
+def _compressible(size):
+    return 'x' * size
+
+
+def _random(size):
+    rand = random.Random(size)
+    return _repeat(''.join(
+        rand.choice(string.ascii_letters)
+        for _ in range(min(size, RANDOM_BLOCK_SIZE))
+    ), size)
+
+
+def _binary(size):
+    return _repeat(os.urandom(min(size, RANDOM_BLOCK_SIZE)), size)
+
+
+#: Payload content generators by name.
+patterns = {
+    'compressible': _compressible,
+    'random': _random,
+    'binary': _binary,
+}
+
+
+def payload(size, pattern='compressible', label=None):
+    """Return :class:`Data` object of ``size`` bytes.
+
+    Payloads are created when first asked for, and the most
+    recently used ones are kept (up to :data:`PAYLOAD_CACHE_BYTES`)
+    so that tests publishing the same payload over and over do not
+    create it again.
+
+    :param size: Size of payload in bytes.
+    :keyword pattern: Content: ``compressible`` (text repeating a single
+        character), ``random`` (random text) or ``binary`` (random bytes,
+        requires a serializer supporting binary data, e.g. ``pickle``).
+    :keyword label: Label of the returned :class:`Data`, default is
+        the pattern and size.
+
+    """
+    key = (int(size), pattern, label)
+    with _payloads_lock:
+        data = _payloads.pop(key, None)
+        if data is not None:
+            _payloads[key] = data  # most recently used last.
+            return data
+    try:
+        gen = patterns[pattern]
+    except KeyError:
+        raise ValueError('Unknown payload pattern: {0!r}'.format(pattern))
+    data = Data(
+        label or '{0}:{1}'.format(pattern, humanbytes(size)),
+        gen(int(size)),
+    )
+    _keep_payload(key, data)
+    return data
+
+
+def _keep_payload(key, data):
+    global _payloads_size
+    size = len(data.data)
+    if size > PAYLOAD_CACHE_BYTES:
+        return
+    with _payloads_lock:
+        if key in _payloads:
+            _payloads_size -= len(_payloads.pop(key).data)
+        _payloads[key] = data
+        _payloads_size += size
+        while _payloads_size > PAYLOAD_CACHE_BYTES:
+            _payloads_size -= len(_payloads.popitem(last=False)[1].data)
+
+BIG = PromiseProxy(payload, (2 ** 20 * 8,), {'label': 'BIG'})
+SMALL = PromiseProxy(payload, (1024,), {'label': 'SMALL'})
@@ -0,0 +1,268 @@
+"""Generating load from several client processes.
+
+A single client publishes and waits for results from one thread, which
+is not enough to saturate a real cluster.  Instead any number of agents
+(:option:`celery cyanide --agent`, on this or other hosts) can wait for
+a coordinator (:option:`celery cyanide --agents`) to tell them what to
+run, using broadcast messages sent through the broker.
+
+For every test the coordinator:
+
+- sends a start time to the agents, corrected for the clock offset of
+  every agent measured when they were discovered, so they all start
+  the test at the same time;
+- every agent runs its share of the iterations (see :func:`share_of`)
+  and replies with its results;
+- the latency histograms and counters of the agents are merged into
+  a single result for the test, where the runtime is that of the
+  slowest agent, so the throughput is that of all agents together.
+
+Broadcast requires a broker supporting fanout exchanges (e.g. RabbitMQ
+or Redis, but not the ``filesystem`` template).
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import json
+import os
+import socket
+import sys
+import traceback
+
+from collections import OrderedDict
+from time import sleep, time
+
+from celery.five import items, monotonic, values
+from celery.utils.imports import symbol_by_name
+from kombu.pidbox import Mailbox
+
+from .stats import TestStats, format_latency, format_table
+
+__all__ = ['Agent', 'Coordinator', 'share_of']
+
+#: Options of :meth:`Suite.run <cyanide.suite.Suite.run>` passed on
+#: from the coordinator to the agents.
+AGENT_OPTIONS = (
+    'iterations', 'warmup', 'converge', 'max_time', 'join_strategy',
+    'no_join', 'resources', 'sample_interval', 'leak_hunt',
+    'leak_threshold', 'marker_queue',
+)
+
+mailbox = Mailbox('cyanide', type='fanout', serializer='json',
+                  accept=['json'])
+
+
+def share_of(n, index, total):
+    """Return number of the ``n`` iterations run by agent number
+    ``index`` of ``total``, so the shares add up to ``n``."""
+    return n // total + (1 if index < n % total else 0)
+
+
+def agent_name():
+    return 'cyanide.{0}@{1}'.format(os.getpid(), socket.gethostname())
+
+
+class Agent(object):
+    """Run tests when told to by a :class:`Coordinator`.
+
+    :keyword hostname: Name of this agent, must be unique.
+
+    """
+
+    def __init__(self, app, hostname=None, block_timeout=None,
+                 no_color=False, stdout=None, stderr=None):
+        self.app = app
+        self.hostname = hostname or agent_name()
+        self.block_timeout = block_timeout
+        self.no_color = no_color
+        self.stdout = sys.stdout if stdout is None else stdout
+        self.stderr = sys.stderr if stderr is None else stderr
+        self.suites = {}
+
+    def print(self, message, file=None):
+        print(message, file=self.stdout if file is None else file)
+
+    def run(self):
+        with self.app.connection() as conn:
+            node = mailbox(conn).Node(self.hostname, state=self, handlers={
+                'ping': type(self).ping,
+                'run': type(self).run_test,
+            })
+            node.channel = conn.channel()
+            node.listen()
+            self.print('+agent {0} waiting for coordinator...'.format(
+                self.hostname))
+            while 1:
+                conn.drain_events()
+
+    def ping(self):
+        return {'time': time()}
+
+    def suite(self, path):
+        # suites are reused, as every instance starts threads of its own.
+        try:
+            suite = self.suites[path]
+        except KeyError:
+            kwargs = {'no_color': self.no_color}
+            if self.block_timeout:
+                kwargs['block_timeout'] = self.block_timeout
+            suite = self.suites[path] = symbol_by_name(path)(
+                self.app, **kwargs)
+        suite.results.clear()
+        return suite
+
+    def run_test(self, suite, names, options, start_at, agents):
+        try:
+            suite = self.suite(suite)
+            delay = start_at[self.hostname] - time()
+            if delay > 0:
+                sleep(delay)
+            started = time()
+            suite.run(names, share=(agents.index(self.hostname),
+                                    len(agents)), **options)
+            return {'report': suite.report(), 'started': started}
+        except Exception as exc:
+            self.print('-test failed: {0!r}\n{1}'.format(
+                exc, traceback.format_exc()), file=self.stderr)
+            return {'error': repr(exc)}
+
+
+class Coordinator(object):
+    """Run tests on several :class:`Agent`'s at once, and merge the
+    results.
+
+    :param names: Names of tests to run (all in ``group`` if empty).
+    :param agents: Number of agents to wait for.
+    :param options: Options passed on to every agent
+        (see :data:`AGENT_OPTIONS`).
+    :keyword delay: Seconds from sending a test until the agents start
+        it, must be longer than it takes to deliver the message.
+    :keyword timeout: Seconds to wait for the agents to complete a test.
+
+    """
+
+    #: Seconds to wait for the expected number of agents.
+    discover_timeout = 60.0
+
+    def __init__(self, app, names, agents, options, suite=None,
+                 group='all', param=None, offset=0, numtests=None,
+                 delay=2.0, timeout=30 * 60, json_report=None,
+                 stdout=None, stderr=None):
+        self.app = app
+        self.names = names
+        self.agents = agents
+        self.options = dict(
+            (k, v) for k, v in items(options) if k in AGENT_OPTIONS)
+        # agents look up tests by name in the same group.
+        self.options.update(group=group, param=param)
+        self.suite = suite or app.cyanide_suite
+        self.group = group
+        self.param = param
+        self.offset = offset
+        self.numtests = numtests
+        self.delay = delay
+        self.timeout = timeout
+        self.json_report = json_report
+        self.stdout = sys.stdout if stdout is None else stdout
+        self.stderr = sys.stderr if stderr is None else stderr
+        self.offsets = {}
+        self.results = OrderedDict()
+
+    def print(self, message, file=None):
+        print(message, file=self.stdout if file is None else file)
+
+    def tests(self):
+        suite = symbol_by_name(self.suite)(self.app, no_color=True)
+        return [test.__name__ for test in suite.filtertests(
+            self.group, self.names, self.param,
+        )[self.offset:self.numtests or None]]
+
+    def run(self):
+        tests = self.tests()
+        with self.app.connection() as conn:
+            agents = self.discover(mailbox(conn))
+            if not agents:
+                return
+            for name in tests:
+                self.run_test(mailbox(conn), agents, name)
+        rows = [[name, n, stats.iterations, stats.tasks,
+                 '{0:.1f}'.format(stats.rate),
+                 format_latency(stats.latency.percentile(50)),
+                 format_latency(stats.latency.percentile(99)),
+                 format_latency(spread)]
+                for name, (stats, n, spread) in items(self.results)]
+        self.print(format_table(
+            ['test', 'agents', 'iterations', 'tasks', 'tasks/s',
+             'p50', 'p99', 'start spread'], rows))
+        if self.json_report:
+            self.write_report(self.json_report, agents)
+        return self.results
+
+    def discover(self, bound):
+        """Wait for agents, and measure the offset of their clocks."""
+        self.print('+waiting for {0} agent(s)...'.format(self.agents))
+        deadline = monotonic() + self.discover_timeout
+        while monotonic() < deadline:
+            sent = time()
+
+            def on_reply(reply):
+                received = time()
+                for hostname, r in items(reply):
+                    self.offsets[hostname] = (
+                        r['time'] - (sent + received) / 2.0)
+
+            bound._broadcast('ping', reply=True, timeout=1.0,
+                             limit=self.agents, callback=on_reply)
+            if len(self.offsets) >= self.agents:
+                agents = sorted(self.offsets)[:self.agents]
+                self.print('+agents: {0}'.format(', '.join(
+                    '{0} (clock {1:+.3f}s)'.format(h, self.offsets[h])
+                    for h in agents)))
+                return agents
+        self.print('-only found {0} of {1} agent(s)'.format(
+            len(self.offsets), self.agents), file=self.stderr)
+
+    def run_test(self, bound, agents, name):
+        self.print('[[[{0}]]] on {1} agent(s)'.format(name, len(agents)))
+        start_at = time() + self.delay
+        replies = bound._broadcast('run', {
+            'suite': self.suite,
+            'names': [name],
+            'options': self.options,
+            'start_at': dict(
+                (h, start_at + self.offsets[h]) for h in agents),
+            'agents': agents,
+        }, destination=agents, reply=True, limit=len(agents),
+            timeout=self.delay + self.timeout)
+        stats, started = [], []
+        for reply in replies:
+            for hostname, r in items(reply):
+                if r.get('error'):
+                    self.print('-{0}: {1}'.format(hostname, r['error']),
+                               file=self.stderr)
+                    continue
+                started.append(r['started'] - self.offsets[hostname])
+                stats.extend(TestStats.from_dict(d)
+                             for d in r['report']['tests'])
+        if len(started) < len(agents):
+            self.print('-{0} of {1} agent(s) did not complete'.format(
+                len(agents) - len(started), len(agents)), file=self.stderr)
+        if not stats:
+            return
+        merged = TestStats.combine(name, stats, concurrent=True)
+        self.results[name] = (merged, len(started),
+                              max(started) - min(started))
+        self.print('{0} iterations in {1:.2f}s {2}'.format(
+            merged.iterations, merged.runtime, merged.summary()))
+
+    def report(self, agents):
+        return {
+            'suite': self.suite,
+            'template': self.app.template,
+            'agents': agents,
+            'tests': [stats.as_dict()
+                      for stats, _, _ in values(self.results)],
+        }
+
+    def write_report(self, path, agents):
+        with open(path, 'w') as fh:
+            json.dump(self.report(agents), fh)
@@ -1,47 +1,137 @@
 from __future__ import absolute_import, print_function, unicode_literals
 
-import socket
 import sys
+import threading
+import zlib
 
 from contextlib import contextmanager
+from time import time
 
 from celery import states
+from celery.five import items, monotonic, values
+from celery.utils.debug import humanbytes
+
+F_FOOTPRINT = """\
+events: tracking {tasks} tasks ({sample:.0%} sampled, {expired} expired) \
+using ~{size}\
+"""
+
+
+def _sizeof(obj, getsizeof=sys.getsizeof):
+    size = getsizeof(obj)
+    fields = getattr(obj, '__dict__', None)
+    if fields is not None:
+        size += getsizeof(fields) + sum(
+            getsizeof(k) + getsizeof(v) for k, v in items(fields))
+    return size
 
 
 class FBI(object):
+    """Keeps track of task events for diagnostics.
+
+    :keyword max_tasks: Maximum number of tasks to keep state for,
+        the least recently used are evicted first.
+    :keyword max_age: Evict completed tasks older than this (in seconds).
+    :keyword sample: Fraction of task ids to track (``0.0 - 1.0``).
+
+    """
 
-    def __init__(self, app):
+    #: How often tasks older than :attr:`max_age` are evicted (in seconds).
+    evict_interval = 10.0
+
+    def __init__(self, app, max_tasks=10000, max_age=None, sample=1.0):
         self.app = app
         self.receiver = None
-        self.state = self.app.events.State()
-        self.connection = None
+        self.thread = None
         self.enabled = False
+        self.max_tasks = max_tasks
+        self.max_age = max_age
+        self.sample = sample
+        self.expired = 0
+        self.last_evict = monotonic()
+        self.state = self.app.events.State(max_tasks_in_memory=max_tasks)
 
-    def enable(self, enabled):
+    def enable(self, enabled, max_tasks=None, max_age=None, sample=None):
         self.enabled = enabled
+        if max_tasks is not None:
+            self.max_tasks = max_tasks
+            self.state = self.app.events.State(max_tasks_in_memory=max_tasks)
+        if max_age is not None:
+            self.max_age = max_age
+        if sample is not None:
+            self.sample = sample
+
+    def on_event(self, event):
+        uuid = event.get('uuid')
+        if uuid is None or self.is_sampled(uuid):
+            self.state.event(event)
+        if self.max_age and \
+                monotonic() - self.last_evict > self.evict_interval:
+            self.state.freeze_while(self.evict_older_than, self.max_age)
+            self.last_evict = monotonic()
+
+    def is_sampled(self, uuid):
+        # the same task ids are always sampled, so all events
+        # for a task are kept or none of them are.
+        return self.sample >= 1.0 or (
+            zlib.crc32(uuid.encode()) & 0xffffffff
+        ) < self.sample * 0xffffffff
+
+    def evict_older_than(self, max_age):
+        tasks = self.state.tasks
+        oldest = time() - max_age
+        expired = [
+            uuid for uuid, task in items(tasks)
+            if task.state in states.READY_STATES and
+            (task.timestamp or 0) < oldest
+        ]
+        for uuid in expired:
+            tasks.pop(uuid, None)
+        self.expired += len(expired)
+
+    def footprint(self, samples=100):
+        """Return estimated size of the task state (in bytes)."""
+        tasks = list(values(self.state.tasks))
+        if not tasks:
+            return 0
+        step = max(len(tasks) // samples, 1)
+        sampled = tasks[::step]
+        return int(sum(_sizeof(t) for t in sampled) *
+                   len(tasks) / len(sampled))
+
+    def report(self):
+        return self.state.freeze_while(self._report)
+
+    def _report(self):
+        return F_FOOTPRINT.format(
+            tasks=len(self.state.tasks), sample=self.sample,
+            expired=self.expired, size=humanbytes(self.footprint()),
+        )
+
+    def start(self):
+        if self.enabled and self.thread is None:
+            self.receiver = self.app.events.Receiver(
+                self.app.connection(), handlers={'*': self.on_event},
+            )
+            self.thread = threading.Thread(
+                target=self.receiver.run, name='cyanide.FBI',
+            )
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self, timeout=5.0):
+        if self.thread is not None:
+            self.receiver.should_stop = True
+            self.thread.join(timeout)
+            self.receiver.connection.release()
+            self.thread = self.receiver = None
 
     @contextmanager
     def investigation(self):
-        if self.enabled:
-            with self.app.connection() as conn:
-                receiver = self.app.events.Receiver(
-                    conn, handlers={'*': self.state.event},
-                )
-                with receiver.consumer_context() as (conn, _, _):
-                    self.connection = conn
-                    try:
-                        yield self
-                    finally:
-                        self.ffwd()
-        else:
-            yield
-
-    def ffwd(self):
-        while 1:
-            try:
-                self.connection.drain_events(timeout=1)
-            except socket.error:
-                break
+        # events are consumed continuously in a background thread,
+        # so there's nothing to catch up with after the block.
+        self.start()
+        yield self if self.enabled else None
 
     def state_of(self, tid):
         try:
@@ -61,6 +151,8 @@ class FBI(object):
 
     def diag(self, ids, file=sys.stderr):
         if self.enabled:
-            self.ffwd()
-            for tid in ids:
-                print(self.state_of(tid), file=file)
+            self.state.freeze_while(self._diag, ids, file=file)
+
+    def _diag(self, ids, file=sys.stderr):
+        for tid in ids:
+            print(self.state_of(tid), file=file)
@@ -0,0 +1,195 @@
+"""Local worker processes started for the duration of a run."""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+
+from time import sleep
+
+from celery.five import monotonic
+
+from .templates import CYANIDE_QUEUE
+
+__all__ = ['Fleet', 'WorkersNotReady']
+
+E_NOT_READY = """\
+Workers did not answer ping within {timeout}s: {missing}\
+"""
+
+E_EXITED = """\
+Worker {name} exited with code {code} before it was ready, \
+see log: {logfile}\
+"""
+
+
+class WorkersNotReady(Exception):
+    pass
+
+
+class Worker(object):
+
+    def __init__(self, name, argv, logfile, env=None):
+        self.name = name
+        self.argv = argv
+        self.logfile = logfile
+        self.env = env
+        self.process = None
+
+    def start(self):
+        with open(self.logfile, 'a') as output:
+            # the worker inherits the file descriptor.
+            self.process = subprocess.Popen(
+                self.argv, env=self.env,
+                stdout=output, stderr=subprocess.STDOUT,
+            )
+
+    def stop(self, timeout=30.0):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()  # warm shutdown
+        deadline = monotonic() + timeout
+        while self.process.poll() is None:
+            if monotonic() > deadline:
+                self.process.send_signal(
+                    getattr(signal, 'SIGKILL', signal.SIGTERM))
+                self.process.wait()
+                break
+            sleep(0.1)
+
+    @property
+    def exitcode(self):
+        return self.process.poll() if self.process else None
+
+    def has_logged(self, text):
+        try:
+            with open(self.logfile) as fh:
+                return text in fh.read()
+        except IOError:
+            return False
+
+
+class Fleet(object):
+    """Start local workers and stop them again when done.
+
+    Workers consume from :envvar:`CYANIDE_QUEUE` using the same template
+    as the client.  Can be used as a context manager.
+
+    :keyword workers: Number of workers to start.
+    :keyword concurrency: Pool concurrency of every worker.
+    :keyword pool: Pool implementation (``prefork``, ``threads``, ...).
+    :keyword logdir: Directory to write worker logs to, a new temporary
+        directory is created by default.
+    :keyword env: Environment for worker processes, defaults to the
+        environment of the current process.
+    :keyword ping_timeout: Seconds to wait for all workers to be ready.
+
+    """
+    Worker = Worker
+
+    def __init__(self, app, workers=1, concurrency=None, pool=None,
+                 queues=None, logdir=None, template=None, env=None,
+                 ping_timeout=60.0, stdout=None):
+        self.app = app
+        self.workers = workers
+        self.concurrency = concurrency
+        self.pool = pool
+        self.queues = queues or [CYANIDE_QUEUE]
+        self.logdir = logdir
+        self.template = template or app.template or 'default'
+        self.env = env
+        self.ping_timeout = ping_timeout
+        self.stdout = sys.stdout if stdout is None else stdout
+        self.hostname = socket.gethostname()
+        self.procs = []
+
+    def print(self, message):
+        print(message, file=self.stdout)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if self.logdir is None:
+            self.logdir = tempfile.mkdtemp(prefix='cyanide-workers-')
+        elif not os.path.isdir(self.logdir):
+            os.makedirs(self.logdir)
+        self.procs = [self.new_worker(i + 1) for i in range(self.workers)]
+        self.print('+starting {0} local worker(s), logs in {1}'.format(
+            len(self.procs), self.logdir))
+        try:
+            for worker in self.procs:
+                worker.start()
+            self.wait_ready()
+        except BaseException:
+            self.stop()
+            raise
+
+    def new_worker(self, index):
+        name = 'cyanide{0}.{1}@{2}'.format(index, os.getpid(), self.hostname)
+        argv = [
+            sys.executable, '-m', 'celery', '-A', 'cyanide', 'worker',
+            '-Z', self.template, '-n', name, '-Q', ','.join(self.queues),
+            '-l', 'info',
+        ]
+        if self.concurrency:
+            argv.extend(['-c', str(self.concurrency)])
+        if self.pool:
+            argv.extend(['-P', self.pool])
+        return self.Worker(
+            name, argv,
+            os.path.join(self.logdir, 'worker{0}.log'.format(index)),
+            env=self.env,
+        )
+
+    def stop(self):
+        for worker in self.procs:
+            worker.stop()
+        if self.procs:
+            self.print('-stopped {0} local worker(s), logs in {1}'.format(
+                len(self.procs), self.logdir))
+        self.procs = []
+
+    def wait_ready(self):
+        missing = set(w.name for w in self.procs)
+        check = (self.ping if self.supports_broadcast()
+                 else self.logged_ready)
+        deadline = monotonic() + self.ping_timeout
+        while missing:
+            for worker in self.procs:
+                if worker.exitcode is not None:
+                    raise WorkersNotReady(E_EXITED.format(
+                        name=worker.name, code=worker.exitcode,
+                        logfile=worker.logfile))
+            missing -= check(missing)
+            if missing and monotonic() > deadline:
+                raise WorkersNotReady(E_NOT_READY.format(
+                    timeout=self.ping_timeout, missing=', '.join(missing)))
+
+    def ping(self, names):
+        replies = self.app.control.ping(destination=list(names), timeout=1.0)
+        return set(name for reply in replies or () for name in reply)
+
+    def logged_ready(self, names):
+        # transports without broadcast support cannot answer ping,
+        # so look for the message logged when the worker is ready.
+        sleep(0.5)
+        return set(w.name for w in self.procs
+                   if w.name in names and w.has_logged('ready.'))
+
+    def supports_broadcast(self):
+        with self.app.connection() as conn:
+            implements = getattr(conn.transport, 'implements', None)
+            return (implements is None or
+                    'fanout' in implements.exchange_type)
+
+    @property
+    def pids(self):
+        return [w.process.pid for w in self.procs if w.process]
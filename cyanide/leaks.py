@@ -0,0 +1,244 @@
+"""Finding memory leaks in workers.
+
+Worker memory is sampled after every iteration of a test, and a trend
+line is fitted to the samples: a test is flagged as leaking when memory
+keeps growing steadily over the iterations, rather than settling after
+warming up.
+
+Workers on another host report the memory of their pool processes
+using the ``poolrss`` remote control command, which reads it from
+:file:`/proc`.  Where that is not available only the memory of the
+worker main processes is known, and the report says so.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import os
+import re
+
+from celery.five import items, values
+from celery.utils.debug import humanbytes
+
+try:
+    from celery.worker.control import control_command
+except ImportError:  # pragma: no cover  (celery < 4.0)
+    from celery.worker.control import Panel
+
+    def control_command(**kwargs):  # noqa
+        return Panel.register
+
+from .profiling import pool_processes
+from .resources import children_of, proc_available, read_usage
+
+__all__ = [
+    'fit_line', 'parse_bytes', 'worker_rss', 'pool_rss', 'LeakHunter',
+    'format_leak', 'leak_table', 'signed_bytes',
+]
+
+#: Fraction of the first samples ignored, as memory usually grows
+#: while caches and pools warm up.
+WARMUP = 0.1
+
+#: Default total growth (in bytes) over the run before flagging a leak.
+THRESHOLD = 1024 * 1024
+
+#: Minimum fraction of non-decreasing steps for growth to be monotonic.
+MONOTONIC = 0.8
+
+UNITS = {'b': 1, 'kb': 2 ** 10, 'mb': 2 ** 20, 'gb': 2 ** 30, 'tb': 2 ** 40}
+
+RE_BYTES = re.compile(r'^\s*([\d.]+)\s*([a-zA-Z]*)\s*$')
+
+F_LEAK = """\
+memory: {source} {growth} over {n} iterations ({rate:+.1f}KB/iteration, \
+r2={r2:.2f}, {monotonic:.0%} monotonic){flag}\
+"""
+
+
+def fit_line(xs, ys):
+    """Least-squares fit of a straight line.
+
+    Returns tuple of ``(slope, intercept, r2)``, where ``r2`` is the
+    coefficient of determination (1.0 is a perfect fit).
+
+    """
+    n = float(len(xs))
+    if n < 2:
+        return 0.0, (ys[0] if ys else 0.0), 0.0
+    mean_x, mean_y = sum(xs) / n, sum(ys) / n
+    sxx = sum((x - mean_x) ** 2 for x in xs)
+    syy = sum((y - mean_y) ** 2 for y in ys)
+    sxy = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    if not sxx:
+        return 0.0, mean_y, 0.0
+    slope = sxy / sxx
+    r2 = (sxy * sxy) / (sxx * syy) if syy else 0.0
+    return slope, mean_y - slope * mean_x, r2
+
+
+def monotonicity(ys):
+    """Fraction of steps where the value did not decrease."""
+    if len(ys) < 2:
+        return 0.0
+    return sum(b >= a for a, b in zip(ys, ys[1:])) / float(len(ys) - 1)
+
+
+def parse_bytes(s):
+    """Parse size formatted by :func:`~celery.utils.debug.humanbytes`."""
+    m = RE_BYTES.match(s)
+    if m is None:
+        raise ValueError('Unknown size: {0!r}'.format(s))
+    number, unit = m.groups()
+    return int(float(number) * UNITS[unit.lower() or 'b'])
+
+
+def worker_rss(app, timeout=1.0, limit=None):
+    """Return total resident memory of worker main processes
+    using the ``memsample`` remote control command,
+    or :const:`None` if unknown."""
+    replies = app.control.inspect(
+        timeout=timeout, limit=limit).memsample() or {}
+    try:
+        return sum(parse_bytes(v) for v in values(replies)
+                   if v and v != 'N/A') or None
+    except ValueError:
+        return None
+
+
+def pool_rss(app, timeout=1.0, limit=None):
+    """Return total resident memory of worker pool processes
+    using the ``poolrss`` remote control command,
+    or :const:`None` if no worker could read it."""
+    replies = app.control.broadcast(
+        'poolrss', reply=True, timeout=timeout, limit=limit) or ()
+    sizes = [r['ok'] for reply in replies for r in values(reply)
+             if isinstance(r, dict) and 'ok' in r]
+    return sum(sizes) if sizes else None
+
+
+@control_command()
+def poolrss(state, **kwargs):
+    """Return resident memory of the pool processes in bytes
+    (of the main process for pools without child processes)."""
+    if not proc_available():
+        return {'error': 'no /proc'}
+    usage = [read_usage(pid)
+             for pid in pool_processes(state) or [os.getpid()]]
+    return {'ok': sum(u[1] for u in usage if u is not None)}
+
+
+class LeakHunter(object):
+    """Sample worker memory between iterations and look for growth.
+
+    Memory of the pool processes is read from :file:`/proc` when
+    the workers run on this host (``worker_pids`` is not empty),
+    otherwise using the ``poolrss`` remote control command, falling
+    back to the resident memory of the worker main processes
+    (``memsample``) when the workers cannot read :file:`/proc`.
+
+    :keyword threshold: Minimum total growth in bytes
+        to flag a test as leaking.
+    :keyword monotonic: Minimum fraction of samples that must not
+        decrease for growth to count as steady.
+
+    """
+
+    def __init__(self, app, worker_pids=None, threshold=THRESHOLD,
+                 monotonic=MONOTONIC, warmup=WARMUP, timeout=1.0):
+        self.app = app
+        self.worker_pids = worker_pids
+        self.threshold = threshold
+        self.monotonic = monotonic
+        self.warmup = warmup
+        self.timeout = timeout
+        self.samples = []
+        #: Number of workers replying to remote samples, and whether
+        #: they report pool memory (:const:`None` until known).
+        self.limit = None
+        self.remote_pool = None
+        if not worker_pids:
+            self.limit = len(app.control.ping(timeout=timeout) or ()) or None
+
+    @property
+    def source(self):
+        return 'main process' if self.remote_pool is False else 'pool'
+
+    def reset(self):
+        self.samples = []
+
+    def sample(self):
+        rss = (self.pool_rss() if self.worker_pids
+               else self.remote_rss())
+        if rss is not None:
+            self.samples.append(rss)
+        return rss
+
+    def pool_rss(self):
+        total = 0
+        for pid in self.worker_pids:
+            for child in children_of(pid):
+                usage = read_usage(child)
+                if usage is not None:
+                    total += usage[1]
+        return total
+
+    def remote_rss(self):
+        if self.remote_pool is not False:
+            rss = pool_rss(self.app, self.timeout, self.limit)
+            if rss is not None or self.remote_pool:
+                self.remote_pool = True
+                return rss
+            self.remote_pool = False
+        return worker_rss(self.app, self.timeout, self.limit)
+
+    def report(self):
+        """Return dict describing the memory trend,
+        or :const:`None` if there are too few samples."""
+        skip = int(len(self.samples) * self.warmup)
+        ys = self.samples[skip:]
+        if len(ys) < 3:
+            return None
+        slope, _, r2 = fit_line(list(range(len(ys))), ys)
+        growth = slope * (len(ys) - 1)
+        steady = monotonicity(ys)
+        return {
+            'source': self.source,
+            'samples': len(ys),
+            'first': ys[0],
+            'last': ys[-1],
+            'slope': slope,
+            'growth': growth,
+            'r2': r2,
+            'monotonic': steady,
+            'leak': (growth >= self.threshold and
+                     steady >= self.monotonic),
+        }
+
+
+def format_leak(report):
+    """Format dict returned by :meth:`LeakHunter.report` as text."""
+    return F_LEAK.format(
+        source=report['source'],
+        growth=signed_bytes(report['growth']),
+        n=report['samples'],
+        rate=report['slope'] / 1024.0,
+        r2=report['r2'],
+        monotonic=report['monotonic'],
+        flag=' LEAK?' if report['leak'] else '',
+    )
+
+
+def signed_bytes(n):
+    """Format size that can be negative, e.g. ``+1.5MB``."""
+    return '{0}{1}'.format('-' if n < 0 else '+', humanbytes(abs(n)))
+
+
+def leak_table(reports):
+    """Return list of rows for tests flagged as leaking,
+    sorted by growth per iteration."""
+    return sorted(
+        ([name, '{0:+.1f}'.format(r['slope'] / 1024.0),
+          signed_bytes(r['growth']),
+          '{0:.2f}'.format(r['r2'])]
+         for name, r in items(reports) if r and r['leak']),
+        key=lambda row: -reports[row[0]]['slope'],
+    )
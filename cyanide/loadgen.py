@@ -0,0 +1,195 @@
+"""Open-loop, rate-controlled load generation.
+
+The tests in a :class:`~cyanide.suite.Suite` are closed-loop: they wait
+for a group to complete before publishing the next one, so a slow
+cluster makes them publish less.  :class:`OpenLoop` publishes at a fixed
+rate from a dedicated thread, whether results come back or not, and
+latency is measured from the time a task *should* have been sent,
+so a stall anywhere shows up as latency instead of lowering the load.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import socket
+import sys
+import threading
+
+from time import sleep
+
+from celery.exceptions import TimeoutError
+from celery.five import Empty, Queue, monotonic
+from celery.utils import uuid
+
+from .collector import Collector
+from .stats import Histogram, format_latency
+from .tasks import add
+
+__all__ = ['OpenLoop', 'Step', 'parse_schedule']
+
+F_STEP = """\
+{0.index:2d}: offered {0.rate:>9.1f}/s achieved {0.achieved:>9.1f}/s \
+completed {0.completed_rate:>9.1f}/s lost {0.lost} {latency}\
+"""
+
+
+def parse_schedule(rate=None, ramp=None, duration=10.0):
+    """Return list of ``(rate, duration)`` steps.
+
+    :keyword rate: Constant rate in tasks/s.
+    :keyword ramp: Comma-separated list of rates, each held for
+        ``duration`` seconds.  E.g. ``"500,1000,5000"``.
+
+    """
+    rates = ([float(r) for r in ramp.split(',') if r.strip()]
+             if ramp else [float(rate)])
+    if not rates or any(r <= 0 for r in rates):
+        raise ValueError('Rates must be positive: {0!r}'.format(rates))
+    return [(r, float(duration)) for r in rates]
+
+
+class Step(object):
+    """Measurements for one rate step of an open-loop run."""
+
+    def __init__(self, index, rate, duration):
+        self.index = index
+        self.rate = rate
+        self.duration = duration
+        self.latency = Histogram()
+        self.published = 0
+        self.completed = 0
+        self.lost = 0
+        self.started = None
+        self.publish_time = 0.0
+        self.complete_time = 0.0
+
+    @property
+    def achieved(self):
+        return self.published / self.publish_time if self.publish_time else 0
+
+    @property
+    def completed_rate(self):
+        return (self.completed / self.complete_time
+                if self.complete_time else 0)
+
+    def saturated(self, tolerance):
+        return self.lost or self.completed_rate < self.rate * tolerance
+
+    def __str__(self):
+        return F_STEP.format(self, latency=self.latency.summary())
+
+
+class OpenLoop(object):
+    """Publish tasks at a target rate and collect results asynchronously.
+
+    :param app: Celery app.
+    :param schedule: List of ``(rate, duration)`` steps,
+        see :func:`parse_schedule`.
+    :keyword tolerance: A step is saturated when fewer than
+        ``rate * tolerance`` tasks/s completed.
+    :keyword drain_timeout: Seconds to wait for outstanding results
+        after the last task of a step was published.
+
+    """
+    task = add
+
+    def __init__(self, app, schedule, tolerance=0.95, drain_timeout=30.0,
+                 tick=0.1, stdout=None):
+        self.app = app
+        self.schedule = schedule
+        self.tolerance = tolerance
+        self.drain_timeout = drain_timeout
+        self.tick = tick
+        self.stdout = sys.stdout if stdout is None else stdout
+
+    def print(self, message):
+        print(message, file=self.stdout)
+
+    def run(self):
+        self.print('open-loop: {0} step(s) of {1}'.format(
+            len(self.schedule), self.task.name))
+        steps = []
+        for i, (rate, duration) in enumerate(self.schedule):
+            step = self.run_step(Step(i + 1, rate, duration))
+            self.print(str(step))
+            steps.append(step)
+        self.report(steps)
+        return steps
+
+    def report(self, steps):
+        saturated = [s for s in steps if s.saturated(self.tolerance)]
+        if saturated:
+            first = saturated[0]
+            self.print(
+                'saturation at step {0.index}: offered {0.rate:.1f}/s, '
+                'completed {0.completed_rate:.1f}/s, p99 {1}'.format(
+                    first, format_latency(first.latency.percentile(99))))
+        else:
+            self.print('not saturated at {0:.1f}/s'.format(steps[-1].rate))
+
+    def run_step(self, step):
+        intended = {}
+        published = Queue()
+        # results for the rpc backend are sent to the thread that
+        # publishes unless told otherwise, so send them here.
+        reply_to = getattr(self.app.backend, 'oid', None)
+        step.started = monotonic()
+        publisher = threading.Thread(
+            target=self.publish,
+            args=(step, intended, published, reply_to),
+            name='cyanide.OpenLoop.publisher',
+        )
+        publisher.daemon = True
+        publisher.start()
+        self.collect(step, intended, published, publisher)
+        return step
+
+    def publish(self, step, intended, published, reply_to):
+        total = int(step.rate * step.duration)
+        interval = 1.0 / step.rate
+        with self.app.producer_or_acquire() as producer:
+            for i in range(total):
+                scheduled = step.started + i * interval
+                delay = scheduled - monotonic()
+                if delay > 0:
+                    sleep(delay)
+                # never skip sends when behind schedule: the time lost
+                # is accounted for as latency from the intended time.
+                task_id = uuid()
+                intended[task_id] = scheduled
+                published.put(self.task.apply_async(
+                    (i, i), task_id=task_id,
+                    producer=producer, reply_to=reply_to,
+                ))
+                step.published += 1
+        step.publish_time = monotonic() - step.started
+
+    def collect(self, step, intended, published, publisher):
+
+        def on_result(task_id, value):
+            step.latency.record(monotonic() - intended.pop(task_id))
+            step.completed += 1
+            step.complete_time = monotonic() - step.started
+        collector = Collector(
+            app=self.app, on_result=on_result, keep_values=False)
+
+        deadline = None
+        while True:
+            try:
+                while 1:
+                    collector.add(published.get_nowait())
+            except Empty:
+                pass
+            if not publisher.is_alive() and published.empty():
+                if not collector.outstanding:
+                    break
+                if deadline is None:
+                    deadline = monotonic() + self.drain_timeout
+                elif monotonic() > deadline:
+                    break
+            if not collector.outstanding:
+                sleep(self.tick)
+                continue
+            try:
+                collector.collect(propagate=False, timeout=self.tick)
+            except (socket.timeout, TimeoutError):
+                pass
+        step.lost = collector.outstanding
@@ -0,0 +1,125 @@
+"""Publishing markers in the background.
+
+Markers are only there to make the worker logs easier to follow, so
+they must never block or slow down the test: they are added to a
+bounded buffer, and a background thread sends everything buffered
+as a single message, backing off exponentially while the broker
+is unavailable.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import sys
+import threading
+
+from collections import deque
+from time import sleep
+
+from celery.five import monotonic
+
+__all__ = ['MarkerPublisher']
+
+E_PUBLISH = """\
+Publishing markers failed, retrying in {interval:.1f}s: {exc!r}\
+"""
+
+W_DROPPED = '{0} marker(s) dropped'
+
+
+class MarkerPublisher(threading.Thread):
+    """Send markers from a background thread.
+
+    :param send: Function called with a list of ``(text, sep)`` tuples
+        and the name of the queue (or :const:`None`) to send them.
+    :keyword maxsize: Max number of markers buffered, the oldest are
+        dropped when it is full.
+    :keyword coalesce: Seconds to wait for more markers after the first,
+        so a burst is sent as one message.
+    :keyword queue: Name of queue to send markers to, e.g. a separate
+        low priority queue, by default the default queue.
+
+    """
+
+    def __init__(self, send, maxsize=1000, coalesce=0.05, queue=None,
+                 interval_start=0.1, interval_max=30.0, stderr=None):
+        super(MarkerPublisher, self).__init__(name='cyanide.MarkerPublisher')
+        self.daemon = True
+        self.send = send
+        self.maxsize = maxsize
+        self.coalesce = coalesce
+        self.queue = queue
+        self.interval_start = interval_start
+        self.interval_max = interval_max
+        self.stderr = stderr
+        self.buffer = deque(maxlen=maxsize)
+        self.dropped = 0
+        self.failures = 0
+        self.sending = False
+        self._pending = threading.Event()
+        self._lock = threading.Lock()
+
+    def put(self, text, sep='---'):
+        """Buffer marker to be sent, never blocks."""
+        with self._lock:
+            if len(self.buffer) >= self.maxsize:
+                self.dropped += 1
+            self.buffer.append((text, sep))
+            if not self.is_alive():
+                self.start()
+        self._pending.set()
+
+    def take(self):
+        with self._lock:
+            batch = list(self.buffer)
+            self.buffer.clear()
+            self._pending.clear()
+            self.sending = self.sending or bool(batch)
+            return batch
+
+    def run(self):
+        while 1:
+            self._pending.wait()
+            sleep(self.coalesce)  # let a burst accumulate
+            self.publish(self.take())
+
+    def publish(self, batch):
+        interval = self.interval_start
+        while batch:
+            dropped = self.dropped
+            if dropped:
+                message = [(W_DROPPED.format(dropped), '!')] + batch
+            else:
+                message = batch
+            try:
+                self.send(message, self.queue)
+            except Exception as exc:
+                if not self.failures:
+                    print(E_PUBLISH.format(interval=interval, exc=exc),
+                          file=self.stderr or sys.stderr)
+                self.failures += 1
+                sleep(interval)
+                interval = min(interval * 2, self.interval_max)
+                # markers added while waiting are sent with this batch.
+                batch.extend(self.take())
+                if len(batch) > self.maxsize:
+                    with self._lock:
+                        self.dropped += len(batch) - self.maxsize
+                    batch = batch[-self.maxsize:]
+            else:
+                with self._lock:
+                    self.dropped -= dropped
+                self.failures = 0
+                break
+        self.sending = False
+
+    def flush(self, timeout=5.0):
+        """Wait for buffered markers to be sent.
+
+        Returns :const:`False` if they were not sent within ``timeout``.
+
+        """
+        deadline = monotonic() + timeout
+        while self.buffer or self.sending:
+            if monotonic() > deadline:
+                return False
+            sleep(0.05)
+        return True
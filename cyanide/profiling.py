@@ -0,0 +1,167 @@
+"""Profiling tests in the client and in worker pool processes.
+
+The client profiles itself using :mod:`cProfile`, and starts/stops
+profilers in the workers using the ``profile`` remote control command.
+
+Remote control commands are handled by the worker main process, so the
+request is written to a file and the pool processes are told to read it
+by sending them :sig:`USR2`.  Pools without child processes (``solo``,
+``threads``, ``eventlet``, ...) are profiled in the main process.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import cProfile
+import json
+import os
+import re
+import signal
+import sys
+import tempfile
+
+from celery.signals import worker_process_init
+
+try:
+    from celery.worker.control import control_command
+except ImportError:  # pragma: no cover  (celery < 4.0)
+    from celery.worker.control import Panel
+
+    def control_command(**kwargs):  # noqa
+        return Panel.register
+
+__all__ = ['ProfileSession', 'profile_label']
+
+PROFILE_SIGNAL = getattr(signal, 'SIGUSR2', None)
+
+#: Profiler of the current process, started by a remote control request.
+_profiler = None
+
+
+def profile_label(name, repetition=1):
+    """Return name of test usable as part of a filename."""
+    label = re.sub(r'[^\w.=-]+', '_', name).strip('_')
+    return label if repetition == 1 else '{0}.{1}'.format(label, repetition)
+
+
+def _request_path(pid):
+    return os.path.join(
+        tempfile.gettempdir(), 'cyanide-profile-{0}.json'.format(pid))
+
+
+def apply_request(action, directory=None, label='worker'):
+    global _profiler
+    if action == 'start':
+        if _profiler is None:
+            _profiler = cProfile.Profile()
+            _profiler.enable()
+    elif _profiler is not None:
+        _profiler.disable()
+        profiler, _profiler = _profiler, None
+        if directory:
+            profiler.dump_stats(os.path.join(
+                directory, '{0}.worker.{1}.prof'.format(label, os.getpid())))
+
+
+def on_profile_signal(signum, frame):
+    try:
+        with open(_request_path(os.getppid())) as fh:
+            request = json.load(fh)
+    except (IOError, OSError, ValueError):
+        return
+    apply_request(**request)
+
+
+@worker_process_init.connect(weak=False)
+def install_profile_handler(**kwargs):
+    if PROFILE_SIGNAL is not None:
+        signal.signal(PROFILE_SIGNAL, on_profile_signal)
+
+
+def pool_processes(state):
+    pool = getattr(getattr(state, 'consumer', None), 'pool', None)
+    try:
+        return list(pool.info.get('processes') or ())
+    except AttributeError:
+        return []
+
+
+@control_command(
+    args=[('action', str), ('directory', str), ('label', str)],
+    signature='<start|stop> [directory [label]]',
+)
+def profile(state, action='start', directory=None, label='worker', **kwargs):
+    """Start or stop profiling the pool processes."""
+    if action not in ('start', 'stop'):
+        return {'error': 'action must be start or stop'}
+    request = {'action': action, 'directory': directory, 'label': label}
+    processes = pool_processes(state) if PROFILE_SIGNAL else []
+    if not processes:
+        apply_request(**request)
+        return {'ok': '{0} profiling main process'.format(action)}
+    with open(_request_path(os.getpid()), 'w') as fh:
+        json.dump(request, fh)
+    for pid in processes:
+        try:
+            os.kill(pid, PROFILE_SIGNAL)
+        except OSError:
+            pass
+    return {'ok': '{0} profiling {1} pool processes'.format(
+        action, len(processes))}
+
+
+class ProfileSession(object):
+    """Profile the client and the workers while a test runs.
+
+    Stats files are written to ``directory`` as
+    :file:`{test}.client.prof`, and :file:`{test}.worker.{pid}.prof`
+    for every pool process (by the workers, so the directory must be
+    shared when the workers run on another host).
+
+    Read them using :mod:`pstats`, or a viewer like :pypi:`snakeviz`.
+
+    """
+
+    def __init__(self, app, directory, workers=True, timeout=1.0,
+                 stdout=None):
+        self.app = app
+        self.directory = os.path.abspath(directory)
+        self.workers = workers
+        self.timeout = timeout
+        self.stdout = sys.stdout if stdout is None else stdout
+        self.profiler = None
+        self.label = None
+        #: Number of workers replying, so broadcasts return as soon as
+        #: all of them replied rather than waiting for the timeout.
+        self.limit = None
+        if workers:
+            self.limit = len(app.control.ping(timeout=timeout) or ()) or None
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def start(self, label):
+        self.label = label
+        if self.workers:
+            self.broadcast('start')
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop(self):
+        if self.profiler is None:
+            return
+        self.profiler.disable()
+        path = os.path.join(self.directory, '{0}.client.prof'.format(
+            self.label))
+        self.profiler.dump_stats(path)
+        self.profiler = None
+        if self.workers:
+            self.broadcast('stop')
+        print('profile: written to {0}'.format(path), file=self.stdout)
+
+    def broadcast(self, action):
+        return self.app.control.broadcast(
+            'profile', reply=True, timeout=self.timeout, limit=self.limit,
+            arguments={
+                'action': action,
+                'directory': self.directory,
+                'label': self.label,
+            },
+        )
@@ -0,0 +1,105 @@
+"""Measuring how workers recover from a crashing pool process.
+
+A group of :task:`~cyanide.tasks.probe` tasks is sent with a task
+crashing its process in the middle, and the same group without it is
+sent first as a baseline.  Every probe returns the pid of the process
+executing it and when it started and finished, so using the worker
+clock only:
+
+- the process that died is the one that stopped executing probes
+  nearest to when the probe sent after the crashing task started, and
+  before the first probe executed by a new process.  The time it died
+  is estimated as the end of its last probe (plus the time the crashing
+  task hangs for, e.g. until the hard time limit).  The group must keep
+  the healthy processes busy until well after the dead process was
+  replaced, or they cannot be told apart;
+- recovery time is from the process dying to the first probe started by
+  a new process;
+- the delay of healthy tasks is how much longer the group took compared
+  to the baseline;
+- the throughput drop compares the rate of probes completed while
+  recovering to the rate of the baseline.
+"""
+from __future__ import absolute_import, unicode_literals
+
+from celery.five import items
+
+from .stats import format_latency
+
+__all__ = ['analyze', 'format_recovery']
+
+F_RECOVERY = """\
+recovery: {replaced} replaced, recovered in {recovery}, healthy tasks \
+delayed {delay}, throughput drop {drop}\
+"""
+
+
+def spans(probes):
+    """Return ``{pid: (first_started, last_finished, count)}``."""
+    by_pid = {}
+    for pid, started, finished in probes:
+        first, last, n = by_pid.get(pid, (started, finished, 0))
+        by_pid[pid] = (min(first, started), max(last, finished), n + 1)
+    return by_pid
+
+
+def duration(probes):
+    if not probes:
+        return None
+    return (max(finished for _, _, finished in probes) -
+            min(started for _, started, _ in probes))
+
+
+def analyze(baseline, probes, hang=0.0, crash_index=None):
+    """Compare probes of a group with a crash to the baseline.
+
+    :param baseline: List of ``(pid, started, finished)`` of the group
+        sent without a crashing task.
+    :param probes: The same for the group with a crashing task,
+        in the order sent.
+    :keyword hang: Seconds the crashing task ran before the process died.
+    :keyword crash_index: Number of probes sent before the crashing task
+        (default is half of them).
+
+    """
+    known = set(pid for pid, _, _ in baseline)
+    by_pid = spans(probes)
+    new = [pid for pid in by_pid if pid not in known]
+    base_duration, run_duration = duration(baseline), duration(probes)
+    report = {
+        'replaced': len(new),
+        'recovery': None,
+        'delay': (run_duration - base_duration
+                  if base_duration is not None and run_duration is not None
+                  else None),
+        'throughput_drop': None,
+    }
+    if not new:
+        return report
+    replaced_at = min(by_pid[pid][0] for pid in new)
+    stopped = [last for pid, (_, last, _) in items(by_pid)
+               if pid not in new and last <= replaced_at]
+    if not stopped:
+        return report
+    # healthy processes keep executing probes until the group ends.
+    index = len(probes) // 2 if crash_index is None else crash_index
+    crashed_at = probes[min(index, len(probes) - 1)][1]
+    died = min(stopped, key=lambda last: abs(last - crashed_at)) + hang
+    report['recovery'] = replaced_at - died
+    window = replaced_at - died
+    if window > 0 and base_duration:
+        during = sum(1 for _, _, finished in probes
+                     if died <= finished <= replaced_at)
+        report['throughput_drop'] = 1.0 - (
+            (during / window) / (len(baseline) / base_duration))
+    return report
+
+
+def format_recovery(report):
+    drop = report['throughput_drop']
+    return F_RECOVERY.format(
+        replaced=report['replaced'],
+        recovery=format_latency(report['recovery']),
+        delay=format_latency(report['delay']),
+        drop='-' if drop is None else '{0:.0%}'.format(drop),
+    )
@@ -0,0 +1,189 @@
+"""Sampling CPU and memory usage of local processes from :file:`/proc`."""
+from __future__ import absolute_import, unicode_literals
+
+import os
+import socket
+import threading
+
+from collections import OrderedDict
+
+from celery.five import items
+from celery.utils.debug import humanbytes
+
+__all__ = [
+    'proc_available', 'read_usage', 'children_of', 'worker_pids',
+    'Usage', 'format_usage', 'ResourceSampler',
+]
+
+PROC = '/proc'
+
+try:
+    CLK_TCK = os.sysconf(str('SC_CLK_TCK'))
+except (AttributeError, ValueError, OSError):  # pragma: no cover
+    CLK_TCK = 100
+
+
+def proc_available():
+    return os.path.isdir(os.path.join(PROC, 'self'))
+
+
+def read_usage(pid):
+    """Return tuple of ``(cpu_seconds, rss_bytes)`` for process,
+    or :const:`None` if the process does not exist."""
+    try:
+        with open(os.path.join(PROC, str(pid), 'stat')) as fh:
+            stat = fh.read()
+        with open(os.path.join(PROC, str(pid), 'status')) as fh:
+            status = fh.read()
+    except (IOError, OSError):
+        return None
+    # the command name may contain spaces, so split after it.
+    fields = stat[stat.rindex(')') + 2:].split()
+    cpu = (int(fields[11]) + int(fields[12])) / float(CLK_TCK)
+    rss = 0
+    for line in status.splitlines():
+        if line.startswith('VmRSS:'):
+            rss = int(line.split()[1]) * 1024
+            break
+    return cpu, rss
+
+
+def children_of(pid):
+    """Return list of child process ids."""
+    try:
+        with open(os.path.join(
+                PROC, str(pid), 'task', str(pid), 'children')) as fh:
+            return [int(p) for p in fh.read().split()]
+    except (IOError, OSError):
+        pass
+    # kernel without CONFIG_PROC_CHILDREN: scan all processes.
+    children = []
+    for entry in os.listdir(PROC):
+        if entry.isdigit():
+            try:
+                with open(os.path.join(PROC, entry, 'stat')) as fh:
+                    stat = fh.read()
+            except (IOError, OSError):
+                continue
+            if int(stat[stat.rindex(')') + 2:].split()[1]) == pid:
+                children.append(int(entry))
+    return children
+
+
+def worker_pids(app, timeout=1.0):
+    """Return list of main process ids for workers on this host,
+    found using the ``stats`` remote control command."""
+    hostname = socket.gethostname()
+    pids = []
+    for nodename, stats in items(app.control.inspect(timeout).stats() or {}):
+        host = nodename.partition('@')[2] or nodename
+        pid = stats.get('pid')
+        if pid and host.split('.')[0] == hostname.split('.')[0] and \
+                os.path.exists(os.path.join(PROC, str(pid))):
+            pids.append(pid)
+    return pids
+
+
+class Usage(object):
+    """CPU and memory usage of a group of processes."""
+
+    def __init__(self):
+        self.cpu_first = {}
+        self.cpu_last = {}
+        self.rss_first = None
+        self.rss_last = 0
+        self.rss_peak = 0
+
+    def update(self, samples):
+        rss = 0
+        for pid, (cpu, pid_rss) in items(samples):
+            self.cpu_first.setdefault(pid, cpu)
+            self.cpu_last[pid] = cpu
+            rss += pid_rss
+        if self.rss_first is None:
+            self.rss_first = rss
+        self.rss_last = rss
+        self.rss_peak = max(self.rss_peak, rss)
+
+    @property
+    def cpu(self):
+        return sum(self.cpu_last[pid] - self.cpu_first[pid]
+                   for pid in self.cpu_last)
+
+    @property
+    def rss_growth(self):
+        return self.rss_last - (self.rss_first or 0)
+
+    def as_dict(self):
+        return {
+            'cpu': self.cpu,
+            'rss_peak': self.rss_peak,
+            'rss_growth': self.rss_growth,
+        }
+
+
+def format_usage(usage):
+    """Format dict of :meth:`Usage.as_dict` by role as text."""
+    return ' | '.join(
+        '{0} cpu={1:.2f}s rss={2} ({3}{4})'.format(
+            role, u['cpu'], humanbytes(u['rss_peak']),
+            '-' if u['rss_growth'] < 0 else '+',
+            humanbytes(abs(u['rss_growth'])))
+        for role, u in items(usage)
+    )
+
+
+class ResourceSampler(threading.Thread):
+    """Thread sampling CPU time and RSS of processes at an interval.
+
+    :param roles: Mapping of role name to a function returning the
+        list of process ids to sample for that role.  The function
+        is called for every sample, so it can find replaced processes.
+    :keyword interval: Seconds between samples.
+
+    """
+
+    def __init__(self, roles, interval=0.5):
+        super(ResourceSampler, self).__init__(name='cyanide.ResourceSampler')
+        self.daemon = True
+        self.roles = roles
+        self.interval = interval
+        self.usage = OrderedDict((role, Usage()) for role in roles)
+        self._stopped = threading.Event()
+
+    def sample(self):
+        for role, get_pids in items(self.roles):
+            samples = {}
+            for pid in get_pids():
+                usage = read_usage(pid)
+                if usage is not None:
+                    samples[pid] = usage
+            self.usage[role].update(samples)
+
+    def run(self):
+        while not self._stopped.is_set():
+            self.sample()
+            self._stopped.wait(self.interval)
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        self.sample()
+        return self.report()
+
+    def report(self):
+        return OrderedDict(
+            (role, usage.as_dict()) for role, usage in items(self.usage)
+        )
+
+    @classmethod
+    def for_workers(cls, worker_pids, interval=0.5):
+        """Sample the current process, worker main processes,
+        and their pool processes."""
+        client = [os.getpid()]
+        return cls(OrderedDict([
+            ('client', lambda: client),
+            ('worker', lambda: worker_pids),
+            ('pool', lambda: [child for pid in worker_pids
+                              for child in children_of(pid)]),
+        ]), interval=interval)
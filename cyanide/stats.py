@@ -0,0 +1,456 @@
+"""Latency histograms and per-test statistics."""
+from __future__ import absolute_import, unicode_literals
+
+import math
+
+from collections import OrderedDict
+
+from celery.five import items
+
+__all__ = [
+    'Histogram', 'Samples', 'TestStats', 'format_latency', 'format_value',
+    'format_table',
+    'log_range', 'find_cliff', 'mean_ci', 'coefficient_of_variation',
+]
+
+#: Percentiles included in summaries.
+PERCENTILES = (50.0, 90.0, 99.0, 99.9)
+
+#: Two-sided 95% critical values of Student's t distribution
+#: by degrees of freedom.
+T_95 = (
+    None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262,
+    2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093,
+    2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045,
+    2.042,
+)
+Z_95 = 1.959964
+
+#: Minimum number of iterations before a test can be considered converged.
+MIN_CONVERGE = 5
+
+
+def format_latency(secs):
+    """Format latency in seconds using a suitable unit."""
+    if secs is None:
+        return '-'
+    if secs < 1e-3:
+        return '{0:.0f}us'.format(secs * 1e6)
+    if secs < 1.0:
+        return '{0:.2f}ms'.format(secs * 1e3)
+    return '{0:.3f}s'.format(secs)
+
+
+def format_value(value, unit='s'):
+    """Format value of :class:`Samples`, which can be negative."""
+    if value is None:
+        return '-'
+    if unit == 's':
+        return ('-' if value < 0 else '') + format_latency(abs(value))
+    if unit == '%':
+        return '{0:.1%}'.format(value)
+    return '{0:.3g}{1}'.format(value, unit or '')
+
+
+def format_percentile(p):
+    return 'p{0:g}'.format(p)
+
+
+def format_table(headers, rows):
+    """Format rows as text table with columns aligned."""
+    rows = [[str(c) for c in row] for row in rows]
+    widths = [max(len(c) for c in col) for col in zip(headers, *rows)]
+    return '\n'.join(
+        '  '.join([row[0].ljust(widths[0])] + [
+            c.rjust(w) for c, w in zip(row[1:], widths[1:])
+        ]) for row in [list(headers)] + rows
+    )
+
+
+def log_range(lowest, highest, factor=4):
+    """Return list of values from lowest to highest (inclusive),
+    each ``factor`` times larger than the previous."""
+    values = []
+    value = lowest
+    while value < highest:
+        values.append(int(value))
+        value *= factor
+    return values + [highest]
+
+
+def find_cliff(xs, ys, drop=0.5):
+    """Find the first point after the peak of ``ys`` where the value
+    drops to less than ``drop`` of the value before it.
+
+    Returns tuple of ``(x_before, x_after, ratio)``, or :const:`None`.
+
+    """
+    if not ys:
+        return None
+    peak = ys.index(max(ys))
+    for i in range(peak + 1, len(ys)):
+        if ys[i - 1] and ys[i] / ys[i - 1] < drop:
+            return xs[i - 1], xs[i], ys[i] / ys[i - 1]
+
+
+def t_critical(df):
+    """Return two-sided 95% critical value of Student's t."""
+    if df < len(T_95):
+        return T_95[df]
+    # Cornish-Fisher expansion, accurate to 3 decimals for df > 30.
+    z = Z_95
+    return (z + (z ** 3 + z) / (4.0 * df) +
+            (5 * z ** 5 + 16 * z ** 3 + 3 * z) / (96.0 * df ** 2))
+
+
+def stdev(values):
+    """Sample standard deviation."""
+    n = len(values)
+    if n < 2:
+        return None
+    mean = sum(values) / float(n)
+    return math.sqrt(sum((v - mean) ** 2 for v in values) / (n - 1))
+
+
+def mean_ci(values):
+    """Return tuple of ``(mean, half_width)`` of the 95% confidence
+    interval for the mean, ``half_width`` is :const:`None` for less than
+    two values."""
+    if not values:
+        return None, None
+    n = len(values)
+    mean = sum(values) / float(n)
+    if n < 2:
+        return mean, None
+    return mean, t_critical(n - 1) * stdev(values) / math.sqrt(n)
+
+
+def coefficient_of_variation(values):
+    """Standard deviation relative to the mean."""
+    sd = stdev(values)
+    if sd is None:
+        return None
+    mean = sum(values) / float(len(values))
+    return sd / mean if mean else None
+
+
+class Histogram(object):
+    """Histogram with logarithmic buckets.
+
+    Values are counted in buckets growing exponentially in size,
+    so memory use depends only on the range of values and the
+    precision, never on the number of values recorded.
+
+    :keyword lowest: Smallest value that can be told apart (in seconds),
+        smaller values (e.g. negative) are clamped.
+    :keyword highest: Values larger than this are clamped.
+    :keyword precision: Maximum relative error of reported percentiles.
+
+    The number of values clamped is counted and shown in the summary,
+    use :class:`Samples` for values that can be negative.
+
+    """
+
+    def __init__(self, lowest=1e-6, highest=3600.0, precision=0.01):
+        self.lowest = lowest
+        self.highest = highest
+        self.precision = precision
+        self._log_base = math.log(1.0 + 2.0 * precision)
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.clamped = 0
+
+    def record(self, value, n=1):
+        if not self.lowest <= value <= self.highest:
+            self.clamped += n
+            value = min(max(value, self.lowest), self.highest)
+        index = int(math.log(value / self.lowest) / self._log_base)
+        self.buckets[index] = self.buckets.get(index, 0) + n
+        self.count += n
+        self.total += value * n
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for index, n in items(other.buckets):
+            self.buckets[index] = self.buckets.get(index, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.clamped += other.clamped
+        if other.min is not None and (self.min is None or
+                                      other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or
+                                      other.max > self.max):
+            self.max = other.max
+        return self
+
+    def percentile(self, p):
+        if not self.count:
+            return None
+        threshold = self.count * p / 100.0
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= threshold:
+                return min(max(self.value_at(index), self.min), self.max)
+        return self.max
+
+    def value_at(self, index):
+        # geometric midpoint of the bucket
+        return self.lowest * math.exp((index + 0.5) * self._log_base)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def summary(self, percentiles=PERCENTILES):
+        return ' '.join(
+            ['min={0}'.format(format_latency(self.min))] +
+            ['{0}={1}'.format(format_percentile(p),
+                              format_latency(self.percentile(p)))
+             for p in percentiles] +
+            ['max={0}'.format(format_latency(self.max))] +
+            (['clamped={0}'.format(self.clamped)] if self.clamped else [])
+        )
+
+    def as_dict(self):
+        return {
+            'lowest': self.lowest,
+            'highest': self.highest,
+            'precision': self.precision,
+            'buckets': [[i, n] for i, n in items(self.buckets)],
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'clamped': self.clamped,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        h = cls(d['lowest'], d['highest'], d['precision'])
+        h.buckets = dict((int(i), n) for i, n in d['buckets'])
+        h.count, h.total = d['count'], d['total']
+        h.min, h.max = d['min'], d['max']
+        h.clamped = d.get('clamped') or 0
+        return h
+
+    def __len__(self):
+        return self.count
+
+    def __bool__(self):
+        return bool(self.count)
+    __nonzero__ = __bool__
+
+
+class Samples(object):
+    """Values of a measurement that can be negative, or is not a time.
+
+    Every value is kept, so this is for measurements made a few times
+    per iteration, not for every task.
+
+    :keyword unit: ``s`` for seconds, ``%`` for fractions shown as
+        percent, or any other unit label.
+
+    """
+
+    def __init__(self, unit='s', values=None):
+        self.unit = unit
+        self.values = values or []
+
+    def record(self, value):
+        self.values.append(value)
+
+    def merge(self, other):
+        self.values.extend(other.values)
+        return self
+
+    def percentile(self, p):
+        if not self.values:
+            return None
+        ordered = sorted(self.values)
+        index = int(math.ceil(len(ordered) * p / 100.0)) - 1
+        return ordered[min(max(index, 0), len(ordered) - 1)]
+
+    @property
+    def mean(self):
+        return (sum(self.values) / float(len(self.values))
+                if self.values else None)
+
+    def summary(self, percentiles=(50.0, 99.0)):
+        points = (
+            [('min', min(self.values) if self else None)] +
+            [(format_percentile(p), self.percentile(p))
+             for p in percentiles] +
+            [('max', max(self.values) if self else None)]
+        )
+        return ' '.join('{0}={1}'.format(label, format_value(v, self.unit))
+                        for label, v in points)
+
+    def as_dict(self):
+        return {'unit': self.unit, 'values': self.values}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d.get('unit', 's'), list(d.get('values') or ()))
+
+    def __len__(self):
+        return len(self.values)
+
+    def __bool__(self):
+        return bool(self.values)
+    __nonzero__ = __bool__
+
+
+class TestStats(object):
+    """Measurements for one run of a test (a single repetition)."""
+
+    def __init__(self, name, repetition=1):
+        self.name = name
+        self.repetition = repetition
+        self.latency = Histogram()
+        self.iterations = 0
+        self.runtime = 0.0
+        #: Duration of every iteration (excluding warm-up iterations).
+        self.times = []
+        #: Number of warm-up iterations run before the measured ones.
+        self.warmup = 0
+        #: Other measurements made by the test, as histograms by name.
+        self.metrics = OrderedDict()
+        #: Measurements that can be negative or are not times,
+        #: as :class:`Samples` by name.
+        self.samples = OrderedDict()
+        #: CPU and memory usage by role, when sampled
+        #: (see :mod:`cyanide.resources`).
+        self.resources = None
+        #: Worker memory trend, when hunting for leaks
+        #: (see :mod:`cyanide.leaks`).
+        self.leak = None
+
+    def metric(self, name):
+        try:
+            return self.metrics[name]
+        except KeyError:
+            h = self.metrics[name] = Histogram()
+            return h
+
+    def sample(self, name, unit='s'):
+        try:
+            return self.samples[name]
+        except KeyError:
+            s = self.samples[name] = Samples(unit)
+            return s
+
+    def metrics_summary(self):
+        """Return list of lines summarizing :attr:`metrics`
+        and :attr:`samples`."""
+        return ['{0}: {1}'.format(name, h.summary((50.0, 99.0)))
+                for name, h in items(self.metrics)] + [
+                '{0}: {1}'.format(name, s.summary())
+                for name, s in items(self.samples)]
+
+    @property
+    def tasks(self):
+        return self.latency.count
+
+    @property
+    def rate(self):
+        return self.tasks / self.runtime if self.runtime else 0.0
+
+    def time_ci(self):
+        """Mean time per iteration and half width of its
+        95% confidence interval."""
+        return mean_ci(self.times)
+
+    @property
+    def cv(self):
+        return coefficient_of_variation(self.times)
+
+    def converged(self, width, min_iterations=MIN_CONVERGE):
+        """Return true if the confidence interval of the time per
+        iteration is narrower than ``width`` relative to the mean."""
+        if len(self.times) < min_iterations:
+            return False
+        mean, half = self.time_ci()
+        return bool(mean) and half / mean <= width
+
+    def time_summary(self):
+        mean, half = self.time_ci()
+        if half is None:
+            return ''
+        return 'time/it: {0} +/- {1} (cv={2:.1%})'.format(
+            format_latency(mean), format_latency(half), self.cv or 0.0,
+        )
+
+    def summary(self):
+        parts = []
+        if self.latency:
+            parts.append('tasks: {0} ({1:.1f}/s) latency: {2}'.format(
+                self.tasks, self.rate, self.latency.summary(),
+            ))
+        timing = self.time_summary()
+        if timing:
+            parts.append(timing)
+        return ' '.join(parts)
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'repetition': self.repetition,
+            'iterations': self.iterations,
+            'runtime': self.runtime,
+            'latency': self.latency.as_dict(),
+            'times': self.times,
+            'metrics': dict(
+                (name, h.as_dict()) for name, h in items(self.metrics)),
+            'samples': dict(
+                (name, s.as_dict()) for name, s in items(self.samples)),
+            'warmup': self.warmup,
+            'resources': self.resources,
+            'leak': self.leak,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls(d['name'], d['repetition'])
+        stats.iterations, stats.runtime = d['iterations'], d['runtime']
+        stats.latency = Histogram.from_dict(d['latency'])
+        stats.times = d.get('times') or []
+        stats.warmup = d.get('warmup') or 0
+        for name, h in sorted(items(d.get('metrics') or {})):
+            stats.metrics[name] = Histogram.from_dict(h)
+        for name, s in sorted(items(d.get('samples') or {})):
+            stats.samples[name] = Samples.from_dict(s)
+        stats.resources = d.get('resources')
+        stats.leak = d.get('leak')
+        return stats
+
+    @classmethod
+    def combine(cls, name, stats, repetition=1, concurrent=False):
+        """Merge several :class:`TestStats` into one.
+
+        With ``concurrent`` the runs were at the same time (e.g. by
+        several clients), so the runtime is that of the longest run
+        instead of the sum.
+
+        """
+        combined = cls(name, repetition)
+        for s in stats:
+            combined.latency.merge(s.latency)
+            combined.iterations += s.iterations
+            if concurrent:
+                combined.runtime = max(combined.runtime, s.runtime)
+            else:
+                combined.runtime += s.runtime
+            combined.times.extend(s.times)
+            for metric, h in items(s.metrics):
+                combined.metric(metric).merge(h)
+            for metric, samples in items(s.samples):
+                combined.sample(metric, samples.unit).merge(samples)
+        return combined
@@ -4,6 +4,7 @@ import celery
 import cyanide
 
 import inspect
+import json
 import platform
 import socket
 import sys
@@ -11,18 +12,29 @@ import traceback
 
 from collections import OrderedDict, defaultdict, namedtuple
 from functools import partial
-from itertools import count, cycle
+from itertools import count, cycle, product
 
+from celery import group
 from celery.exceptions import TimeoutError
 from celery.five import items, monotonic, range, values
+from celery.signals import after_task_publish
 from celery.utils.debug import blockdetection
 from celery.utils.imports import qualname
 from celery.utils.text import pluralize, truncate
 from celery.utils.term import colored
 from kombu.utils import retry_over_time
 
+from .collector import STRATEGIES, Collector, supported_strategies
+from .dashboard import Dashboard
+from .distributed import share_of
 from .fbi import FBI
-from .tasks import marker, _marker
+from .leaks import THRESHOLD, LeakHunter, format_leak, leak_table
+from .profiling import ProfileSession, profile_label
+from .resources import (
+    ResourceSampler, format_usage, proc_available, worker_pids,
+)
+from .stats import TestStats, format_latency, format_table
+from .tasks import MARKER_TASKS, add, marker, markers
 
 try:
     from celery.platforms import isatty
@@ -117,18 +129,27 @@ class Speaker(object):
 
 class Meter(object):
 
-    def __init__(self, s='.', end='', cursor='/-\\', file=None):
+    def __init__(self, s='.', end='', cursor='/-\\', file=None,
+                 min_interval=0.25):
         self.s = s
         self.end = end
         self.file = sys.stdout if file is None else file
         self.counter = 0
         self.cursor = cycle(cursor)
+        self.min_interval = min_interval
+        self.last_emit = None
 
     def emit(self, *args, **kwargs):
         self.counter += len(self.s)
-        print(self.s * (self.counter - 1) + next(self.cursor),
-              end='\r', file=self.file)
-        self.file.flush()
+        # only redraw a few times per second, as writing to
+        # the terminal is slow.
+        now = monotonic()
+        if self.last_emit is None or \
+                now - self.last_emit >= self.min_interval:
+            self.last_emit = now
+            print(self.s * (self.counter - 1) + next(self.cursor),
+                  end='\r', file=self.file)
+            self.file.flush()
 
     def revert(self):
         self.counter = 0
@@ -150,6 +171,64 @@ def testgroup(*funs):
     return OrderedDict((fun.__name__, fun) for fun in funs)
 
 
+def param_label(value):
+    label = getattr(value, 'label', None)
+    return label if label is not None else str(value)
+
+
+class ParametrizedTest(object):
+    """Test method called with one combination of the values
+    from the parameter axes of its :func:`testcase`."""
+
+    def __init__(self, meth, params):
+        self.meth = meth
+        self.params = params
+        self.basename = meth.__name__
+        self.labels = OrderedDict(
+            (axis, param_label(value)) for axis, value in items(params)
+        )
+        self.__name__ = '{0}[{1}]'.format(self.basename, ','.join(
+            '{0}={1}'.format(axis, label) for axis, label in items(self.labels)
+        ))
+        self.__func__ = meth.__func__
+        self.__iterations__ = meth.__iterations__
+
+    def __call__(self):
+        return self.meth(**self.params)
+
+    def matches(self, filters):
+        return all(
+            self.labels[axis] in allowed
+            for axis, allowed in items(filters) if axis in self.labels
+        )
+
+
+def expand_axes(meth):
+    """Return list of tests for every combination of parameters."""
+    axes = getattr(meth.__func__, '__testaxes__', None)
+    if not axes:
+        return [meth]
+    names = [axis for axis, _ in axes]
+    return [
+        ParametrizedTest(meth, OrderedDict(zip(names, combination)))
+        for combination in product(*[vals for _, vals in axes])
+    ]
+
+
+def parse_param_filters(params):
+    """Parse list of ``axis=value1,value2`` strings."""
+    filters = {}
+    for param in params or ():
+        axis, sep, allowed = param.partition('=')
+        if not sep:
+            raise ValueError(
+                'Parameter filter must be axis=value[,value]: {0!r}'.format(
+                    param))
+        filters.setdefault(axis.strip(), set()).update(
+            v.strip() for v in allowed.split(','))
+    return filters
+
+
 class ManagerMixin(object):
     TaskPredicate = StopSuite
     Meter = Meter
@@ -162,14 +241,93 @@ class ManagerMixin(object):
         self.block_timeout = block_timeout
         self.progress = None
         self.speaker = Speaker(file=self.stdout)
+        self.dashboard = Dashboard(file=self.stdout)
         self.fbi = FBI(app)
+        self.stats = None
+        self.results = OrderedDict()
+        self.sent = {}
+        self.worker_pids = None
+        self.sample_interval = 0.5
+        self.leak_hunter = None
+        self.profiler = None
+        self.warmup = 0
+        self.converge = None
+        self.max_time = None
+        self.join_strategy = 'get'
+        #: ``(index, total)`` when this is one of several agents.
+        self.share = None
+        after_task_publish.connect(self.on_task_published)
+
+    def on_task_published(self, sender=None, headers=None, body=None,
+                          **kwargs):
+        if self.stats is not None and sender not in MARKER_TASKS:
+            try:
+                task_id = headers['id']
+            except (KeyError, TypeError):
+                task_id = body['id']  # protocol 1
+            self.sent[task_id] = monotonic()
+            self.dashboard.task_published()
+
+    def enable_resources(self, interval=0.5):
+        """Sample CPU and memory usage of the client and
+        of local workers while tests run."""
+        if not proc_available():
+            return self.warn('resources: no /proc: not sampling usage')
+        self.sample_interval = interval
+        self.worker_pids = worker_pids(self.app)
+        if not self.worker_pids:
+            self.warn('resources: no workers on this host, '
+                      'sampling client only')
+
+    def enable_leak_hunt(self, threshold=None):
+        """Sample worker memory after every iteration, and flag tests
+        where it keeps growing."""
+        if self.worker_pids is None and proc_available():
+            self.worker_pids = worker_pids(self.app)
+        self.leak_hunter = LeakHunter(
+            self.app, self.worker_pids,
+            threshold=THRESHOLD if threshold is None else threshold * 1024,
+        )
+        self.print('+leak hunt: sampling {0} memory after every '
+                   'iteration'.format(self.leak_hunter.source))
+
+    def start_sampler(self):
+        if self.worker_pids is not None:
+            sampler = ResourceSampler.for_workers(
+                self.worker_pids, interval=self.sample_interval)
+            sampler.start()
+            return sampler
+
+    def record_latency(self, task_id, value=None):
+        sent = self.sent.pop(task_id, None)
+        if sent is not None and self.stats is not None:
+            latency = monotonic() - sent
+            self.stats.latency.record(latency)
+            return latency
+
+    def record(self, name, value, unit='s', signed=False):
+        """Record measurement ``name`` of the current test, reported
+        with the test results.
+
+        Times are recorded in a histogram, while values that can be
+        negative (``signed``, e.g. the difference between clocks) or
+        are not in seconds are kept as :class:`~cyanide.stats.Samples`.
+
+        """
+        if self.stats is not None:
+            if signed or unit != 's':
+                self.stats.sample(name, unit).record(value)
+            else:
+                self.stats.metric(name).record(value)
+
+    def marker(self, s, sep='-'):
+        """Log ``s`` in the worker logs, printing it without mixing
+        it up with the status line."""
+        marker(s, sep, write=self.dashboard.write)
 
     def new_meter(self):
         return self.Meter(file=self.stdout)
 
-    def missing_results(self, r):
-        return [res.id for res in r if res.id not in res.backend._cache]
-
     def wait_for(self, fun, catch,
                  desc='thing', args=(), kwargs={}, errback=None,
                  max_retries=10, interval_start=0.1, interval_step=0.5,
@@ -219,32 +377,66 @@ class ManagerMixin(object):
     def retry_over_time(self, *args, **kwargs):
         return retry_over_time(*args, **kwargs)
 
-    def join(self, r, propagate=False, max_retries=10, **kwargs):
+    def join(self, r, propagate=False, max_retries=10, latency=None,
+             strategy=None, **kwargs):
         if self.no_join:
             return
-        received = []
 
         def on_result(task_id, value):
-            received.append(task_id)
-
-        for i in range(max_retries) if max_retries else count(0):
-            received[:] = []
+            secs = self.record_latency(task_id)
+            if latency is not None and secs is not None:
+                latency.record(secs)
+            self.dashboard.task_completed(secs)
+            self.dashboard.outstanding = collector.outstanding
+        collector = Collector(r, app=self.app, on_result=on_result,
+                              strategy=strategy or self.join_strategy)
+        self.dashboard.outstanding = collector.outstanding
+        stalls = 0
+        while collector.outstanding:
+            received = collector.received
             try:
-                return r.get(callback=on_result, propagate=propagate, **kwargs)
+                return collector.collect(propagate=propagate, **kwargs)
             except (socket.timeout, TimeoutError) as exc:
-                waiting_for = self.missing_results(r)
                 self.speaker.beep()
-                marker(
+                self.marker(
                     'Still waiting for {0}/{1}: [{2}]: {3!r}'.format(
-                        len(r) - len(received), len(r),
-                        truncate(', '.join(waiting_for)), exc), '!',
+                        collector.outstanding, len(collector),
+                        truncate(', '.join(collector.first_outstanding())),
+                        exc), '!',
                 )
-                self.fbi.diag(waiting_for)
+                self.fbi.diag(collector.pending)
             except self.connerrors as exc:
                 self.speaker.beep()
-                marker('join: connection lost: {0!r}'.format(exc), '!')
+                self.marker('join: connection lost: {0!r}'.format(exc), '!')
+            # only count attempts where no results at all arrived.
+            if collector.received == received:
+                stalls += 1
+                if max_retries and stalls >= max_retries:
+                    break
+        else:
+            return collector.results()
         raise self.TaskPredicate('Test failed: Missing task results')
 
+    def fastest_join_strategy(self, n=100, rounds=3):
+        """Time waiting for a group of tasks using every strategy
+        supported by the result backend, and return the fastest."""
+        timings = []
+        for strategy in supported_strategies(self.app.backend):
+            best = None
+            for _ in range(rounds):
+                r = group(add.s(i, i) for i in range(n))()
+                start = monotonic()
+                self.join(r, timeout=30, propagate=True, strategy=strategy)
+                elapsed = monotonic() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings.append((best, strategy))
+        self.print('join strategies for {0}:\n{1}'.format(
+            type(self.app.backend).__name__, format_table(
+                ['strategy', 'join ({0} tasks)'.format(n)],
+                [[strategy, format_latency(secs)]
+                 for secs, strategy in sorted(timings)])))
+        return min(timings)[1]
+
     def inspect(self, timeout=1):
         return self.app.control.inspect(timeout=timeout)
 
@@ -302,6 +494,12 @@ class Suite(ManagerMixin):
 
     TaskPredicate = StopSuite
 
+    #: Number of repetitions to keep test statistics for.
+    keep_repetitions = 100
+
+    #: Time limit for a test to converge when no limit is set.
+    converge_max_time = 600.0
+
     def __init__(self, app, no_color=False, **kwargs):
         self.app = app
         self._init_manager(app, **kwargs)
@@ -317,13 +515,13 @@ class Suite(ManagerMixin):
         pass
 
     def print(self, message, file=None):
-        print(message, file=self.stdout if file is None else file)
+        self.dashboard.write(message, file=file)
 
     def error(self, message):
-        print(self.colored.red(message), file=self.stderr)
+        self.dashboard.write(self.colored.red(message), file=self.stderr)
 
     def warn(self, message):
-        print(self.colored.cyan(message), file=self.stdout)
+        self.dashboard.write(self.colored.cyan(message))
 
     def init_groups(self):
         acc = defaultdict(list)
@@ -335,51 +533,207 @@ class Suite(ManagerMixin):
                 except AttributeError:
                     pass
                 else:
+                    tests = [t for t in expand_axes(meth)
+                             if self.include_test(t)]
                     for g in groups:
-                        acc[g].append(meth)
+                        acc[g].extend(tests)
         # sort the tests by the order in which they are defined in the class
         for g in values(acc):
             g[:] = sorted(g, key=lambda m: m.__func__.__testsort__)
         self.groups = dict(
             (name, testgroup(*tests)) for name, tests in items(acc)
         )
+        self.cases = dict(
+            (test.__name__, test) for tests in values(acc) for test in tests
+            if isinstance(test, ParametrizedTest)
+        )
+
+    def include_test(self, test):
+        """Return false to leave out a test, e.g. a parametrized test
+        with values not supported by this configuration."""
+        return True
+
+    def check_join_strategy(self, strategy):
+        if strategy is None or strategy == 'auto':
+            return
+        if strategy not in STRATEGIES:
+            raise ValueError(
+                'Unknown join strategy {0!r}, must be one of: {1}'.format(
+                    strategy, ', '.join(['auto'] + list(STRATEGIES))))
+        supported = supported_strategies(self.app.backend)
+        if strategy not in supported:
+            raise ValueError(
+                'Join strategy {0!r} not supported by {1}: {2}'.format(
+                    strategy, type(self.app.backend).__name__,
+                    ', '.join(supported)))
 
     def run(self, names=None, iterations=50, offset=0,
             numtests=None, list_all=False, repeat=0, group='all',
-            diag=False, no_join=False, **kw):
+            diag=False, no_join=False, diag_max_tasks=None,
+            diag_max_age=None, diag_sample=None, param=None,
+            json_report=None, resources=False, sample_interval=0.5,
+            leak_hunt=False, leak_threshold=None, profile=None,
+            warmup=0, converge=None, max_time=None, join_strategy=None,
+            fps=None, status_interval=None, marker_queue=None,
+            share=None, **kw):
+        self.check_join_strategy(join_strategy)
         self.no_join = no_join
-        self.fbi.enable(diag)
-        tests = self.filtertests(group, names)[offset:numtests or None]
+        self.share = share
+        markers.queue = marker_queue
+        self.dashboard.set_rate(fps, status_interval)
+        self.warmup = warmup
+        self.converge = converge
+        self.max_time = max_time
+        if converge is not None and not max_time:
+            self.max_time = self.converge_max_time
+        if profile:
+            self.profiler = ProfileSession(
+                self.app, profile, stdout=self.stdout)
+        if resources:
+            self.enable_resources(sample_interval)
+        if leak_hunt:
+            self.enable_leak_hunt(leak_threshold)
+        self.fbi.enable(diag, max_tasks=diag_max_tasks,
+                        max_age=diag_max_age, sample=diag_sample)
+        tests = self.filtertests(
+            group, names, param)[offset:numtests or None]
         if list_all:
             return self.print(self.testlist(tests))
         self.print(self.banner(tests))
         self.print('+enable worker task events...')
         self.app.control.enable_events()
+        if join_strategy == 'auto':
+            self.join_strategy = self.fastest_join_strategy()
+        elif join_strategy:
+            self.join_strategy = join_strategy
+        self.print('+waiting for results using {0!r}'.format(
+            self.join_strategy))
+        try:
+            self.run_repetitions(tests, iterations, repeat)
+        finally:
+            self.fbi.stop()
+            markers.flush()
+            if json_report:
+                self.write_report(json_report)
+
+    def report(self):
+        return {
+            'suite': qualname(self),
+            'template': self.app.template,
+            'tests': [stats.as_dict() for stats in values(self.results)],
+        }
+
+    def write_report(self, path):
+        with open(path, 'w') as fh:
+            json.dump(self.report(), fh)
+
+    def run_repetitions(self, tests, iterations=50, repeat=0):
         it = count() if repeat == Inf else range(int(repeat) or 1)
         for i in it:
-            marker(
+            self.marker(
                 '{0} (repetition {1})'.format(
                     self.colored.bold('suite start'), i + 1),
                 '+',
             )
+            self.forget_results(i + 1 - self.keep_repetitions)
             for j, test in enumerate(tests):
                 self.runtest(test, iterations, j + 1, i + 1)
-            marker(
+            self.marker(
                 '{0} (repetition {1})'.format(
                     self.colored.bold('suite end'), i + 1),
                 '+',
             )
+            self.print(self.suite_summary(i + 1))
+            report = self.axis_report(i + 1)
+            if report:
+                self.print(report)
+            if self.leak_hunter is not None:
+                self.print(self.leak_report(i + 1))
+            if self.fbi.enabled:
+                self.print(self.fbi.report())
+
+    def forget_results(self, repetition):
+        for key in [k for k in self.results if k[1] <= repetition]:
+            self.results.pop(key)
+
+    def suite_summary(self, repetition):
+        stats = TestStats.combine('suite', [
+            s for (_, rep), s in items(self.results) if rep == repetition
+        ], repetition)
+        return 'suite repetition {0}: {1} iterations in {2} {3}'.format(
+            repetition, stats.iterations, humanize_seconds(stats.runtime),
+            stats.summary() or 'tasks: 0',
+        )
+
+    def leak_report(self, repetition):
+        rows = leak_table(OrderedDict(
+            (name, stats.leak) for (name, rep), stats in items(self.results)
+            if rep == repetition
+        ))
+        if not rows:
+            return 'leak hunt: no steady memory growth found'
+        return 'leak hunt: memory grows steadily in {0} {1}:\n{2}\n'.format(
+            len(rows), pluralize(len(rows), 'test'), format_table(
+                ['test', 'KB/iteration', 'growth', 'r2'], rows))
 
     def assert_equal(self, a, b):
         return assert_equal(a, b)
 
-    def filtertests(self, group, names):
+    def filtertests(self, group, names, params=None):
         tests = self.groups[group]
+        selected = ([t for n in names for t in self._tests_named(tests, n)]
+                    if names else list(values(tests)))
+        filters = parse_param_filters(params)
+        if filters:
+            selected = [t for t in selected
+                        if not isinstance(t, ParametrizedTest) or
+                        t.matches(filters)]
+        return selected
+
+    def _tests_named(self, tests, name):
+        # a parametrized test can be selected by its full name,
+        # or all variants of it by the name of the method.
         try:
-            return ([tests[n] for n in names] if names
-                    else list(values(tests)))
-        except KeyError as exc:
-            raise KeyError('Unknown test name: {0}'.format(exc))
+            return [tests[name]]
+        except KeyError:
+            found = [t for t in values(tests)
+                     if getattr(t, 'basename', None) == name]
+            if not found:
+                raise KeyError('Unknown test name: {0!r}'.format(name))
+            return found
+
+    def axis_report(self, repetition):
+        """Return tables summarizing parametrized tests by parameter."""
+        runs = OrderedDict()
+        for (name, rep), stats in items(self.results):
+            test = self.cases.get(name)
+            if rep == repetition and test is not None:
+                runs.setdefault(test.basename, []).append((test, stats))
+        return '\n'.join(
+            self._axis_table(basename, axis, tests)
+            for basename, tests in items(runs)
+            for axis in tests[0][0].labels
+        )
+
+    def _axis_table(self, basename, axis, tests):
+        by_value = OrderedDict()
+        for test, stats in tests:
+            by_value.setdefault(test.labels[axis], []).append(stats)
+        rows = []
+        for value, stats in items(by_value):
+            combined = TestStats.combine(basename, stats)
+            rows.append([
+                value, len(stats), combined.iterations, combined.tasks,
+                '{0:.1f}'.format(combined.rate),
+                format_latency(combined.latency.percentile(50)),
+                format_latency(combined.latency.percentile(99)),
+                format_latency(combined.runtime / combined.iterations
+                               if combined.iterations else None),
+            ])
+        return '{0} by {1}:\n{2}\n'.format(basename, axis, format_table(
+            [axis, 'tests', 'iterations', 'tasks', 'tasks/s',
+             'p50', 'p99', 'time/it'], rows,
+        ))
 
     def testlist(self, tests):
         return ',\n'.join(
@@ -403,43 +757,121 @@ class Suite(ManagerMixin):
 
     def runtest(self, fun, n=50, index=0, repeats=1):
         n = getattr(fun, '__iterations__', None) or n
-        header = '[[[{0}({1})]]]'.format(fun.__name__, n)
+        if self.share:
+            # run by several agents, see cyanide.distributed.
+            n = share_of(n, *self.share)
+            if not n:
+                return
+        # tests running a single (long) iteration are not repeated
+        # for warm-up or convergence.
+        adaptive = self.converge is not None and n > 1
+        warmup = self.warmup if n > 1 else 0
+        total = '~{0:g}%'.format(self.converge * 100) if adaptive else n
+        header = '[[[{0}({1})]]]'.format(fun.__name__, total)
         if repeats > 1:
             header = '{0} #{1}'.format(header, repeats)
         self.print(header)
+        self.dashboard.start_test(fun.__name__, total, index)
         with blockdetection(self.block_timeout):
             with self.fbi.investigation():
+                if warmup:
+                    self.warmup_test(fun, warmup, index, repeats)
+                # started before the clock, as they wait for the workers.
+                if self.leak_hunter is not None:
+                    self.leak_hunter.reset()
+                    self.leak_hunter.sample()
+                if self.profiler is not None:
+                    self.profiler.start(profile_label(fun.__name__, repeats))
                 runtime = elapsed = monotonic()
                 i = 0
                 failed = False
+                self.stats = self.results[(fun.__name__, repeats)] = (
+                    TestStats(fun.__name__, repeats))
+                self.stats.warmup = warmup
                 self.progress = Progress(
-                    fun, i, n, index, repeats, elapsed, runtime, 0,
+                    fun, i, total, index, repeats, elapsed, runtime, 0,
                 )
-                _marker.delay(pstatus(self.progress))
+                markers.put(pstatus(self.progress))
+                sampler = self.start_sampler()
 
                 try:
-                    for i in range(n):
+                    for i in count() if adaptive else range(n):
                         runtime = monotonic()
                         self.progress = Progress(
-                            fun, i + 1, n, index, repeats, runtime, elapsed, 0,
+                            fun, i + 1, total, index, repeats,
+                            runtime, elapsed, 0,
                         )
+                        self.dashboard.iteration_started(i + 1)
                         self.execute_test(fun)
+                        self.stats.times.append(monotonic() - runtime)
+                        if self.leak_hunter is not None:
+                            # the clock is paused while sampling.
+                            paused = monotonic()
+                            self.leak_hunter.sample()
+                            elapsed += monotonic() - paused
+                        if self.done_iterating(elapsed, adaptive):
+                            break
 
                 except Exception:
                     failed = True
                     self.speaker.beep()
                     raise
                 finally:
+                    self.dashboard.stop_test()
+                    self.stats.iterations = i + 1
+                    self.stats.runtime = monotonic() - elapsed
+                    if self.profiler is not None:
+                        self.profiler.stop()
+                    if sampler is not None:
+                        self.stats.resources = sampler.stop()
+                    summary = self.stats.summary()
                     if n > 1 or failed:
-                        self.print('{0} {1} iterations in {2}'.format(
+                        self.print('{0} {1} iterations in {2}{3}'.format(
                             'failed after' if failed else 'completed',
-                            i + 1, humanize_seconds(monotonic() - elapsed),
+                            i + 1, humanize_seconds(self.stats.runtime),
+                            ' ' + summary if summary else '',
                         ), file=self.stderr if failed else self.stdout)
+                    elif summary:
+                        self.print(summary)
+                    for line in self.stats.metrics_summary():
+                        self.print(line)
+                    if self.stats.resources:
+                        self.print('resources: {0}'.format(
+                            format_usage(self.stats.resources)))
+                    if self.leak_hunter is not None:
+                        self.stats.leak = self.leak_hunter.report()
+                        if self.stats.leak:
+                            self.print(format_leak(self.stats.leak))
+                    self.stats = None
+                    self.sent.clear()
                     if not failed:
                         self.progress = Progress(
-                            fun, i + 1, n, index, repeats, runtime, elapsed, 1,
+                            fun, i + 1, total, index, repeats,
+                            runtime, elapsed, 1,
                         )
 
+    def warmup_test(self, fun, n, index, repeats):
+        # iterations run before the stats are created are not measured.
+        started = monotonic()
+        for i in range(n):
+            self.progress = Progress(
+                fun, 'warm-up {0}'.format(i + 1), n, index, repeats,
+                monotonic(), started, 0,
+            )
+            self.execute_test(fun)
+        self.print('warm-up: {0} iterations in {1}'.format(
+            n, humanize_seconds(monotonic() - started)))
+
+    def done_iterating(self, started, adaptive=False):
+        if adaptive and self.stats.converged(self.converge):
+            return True
+        if self.max_time and monotonic() - started >= self.max_time:
+            self.warn('stopping after {0}: time limit reached{1}'.format(
+                humanize_seconds(self.max_time),
+                ' before converging' if adaptive else ''))
+            return True
+        return False
+
     def execute_test(self, fun):
         self.setup()
         try:
@@ -451,12 +883,11 @@ class Suite(ManagerMixin):
                 self.on_test_error(exc, 'FAILED')
             except Exception as exc:
                 self.on_test_error(exc, 'ERROR')
-            else:
-                self.print(pstatus(self.progress, self.colored.green('OK')))
         finally:
             self.teardown()
 
     def on_test_error(self, exc, status):
+        self.dashboard.error()
         self.error('-> {0!r}'.format(exc))
         self.error(traceback.format_exc())
         self.error(pstatus(self.progress, self.colored.red(status)))
@@ -468,13 +899,28 @@ _creation_counter = count(0)
 
 
 def testcase(*groups, **kwargs):
+    """Mark method as test case belonging to one or more groups.
+
+    :keyword iterations: Custom number of iterations for this test.
+
+    Any other keyword argument is a parameter axis: a list of values to
+    call the test with.  A separate test is created for every combination
+    of values, e.g. ``@testcase('all', n=[10, 100], data=['a', 'b'])``
+    creates four tests named ``name[data=a,n=10]`` and so on.  Use plain
+    values (e.g. a size, or the name of a payload), as the label of a
+    lazy payload like :data:`~cyanide.data.BIG` would create it.
+
+    """
     if not groups:
         raise ValueError('@testcase requires at least one group name')
+    iterations = kwargs.pop('iterations', None)
+    axes = [(axis, list(kwargs[axis])) for axis in sorted(kwargs)]
 
     def _mark_as_case(fun):
         fun.__testgroup__ = groups
         fun.__testsort__ = next(_creation_counter)
-        fun.__iterations__ = kwargs.get('iterations')
+        fun.__iterations__ = iterations
+        fun.__testaxes__ = axes
         return fun
 
     return _mark_as_case
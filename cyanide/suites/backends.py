@@ -0,0 +1,63 @@
+"""Result backend test suite.
+
+Compares the ways of waiting for results (see
+:data:`cyanide.collector.STRATEGIES`) for groups of tasks of different
+sizes returning values of different sizes, and measures the cost of
+forgetting large results.
+
+Client CPU and memory usage is sampled for every test when
+:file:`/proc` is available.
+
+Use with :option:`celery cyanide -S`, and a template to select the backend:
+
+.. code-block:: console
+
+    $ celery cyanide -Z redistore -S cyanide.suites.backends:Backends
+"""
+from __future__ import absolute_import, unicode_literals
+
+from celery import group
+from celery.five import monotonic
+
+from cyanide.collector import STRATEGIES, supported_strategies
+from cyanide.data import payload
+from cyanide.resources import proc_available
+from cyanide.suite import Suite, testcase
+from cyanide.tasks import any_returning
+
+
+class Backends(Suite):
+
+    def run(self, *args, **kwargs):
+        self.print('+result backend: {0} ({1})'.format(
+            type(self.app.backend).__name__,
+            ', '.join(supported_strategies(self.app.backend))))
+        kwargs['resources'] = kwargs.get('resources') or proc_available()
+        return super(Backends, self).run(*args, **kwargs)
+
+    def include_test(self, test):
+        strategy = getattr(test, 'params', {}).get('strategy')
+        return strategy is None or \
+            strategy in supported_strategies(self.app.backend)
+
+    @testcase('all', 'backend', strategy=list(STRATEGIES),
+              n=[10, 100, 1000], size=[64, 4096, 262144], iterations=10)
+    def retrieve(self, strategy, n, size):
+        data = payload(size)
+        r = group(any_returning.s(data) for _ in range(n))()
+        start = monotonic()
+        self.join(r, timeout=max(30, n * size / 2 ** 20),
+                  propagate=True, strategy=strategy)
+        self.record('join', monotonic() - start)
+
+    @testcase('all', 'backend', n=[8], size=[2 ** 20, 2 ** 23],
+              iterations=10)
+    def forget(self, n, size):
+        r = group(any_returning.s(payload(size)) for _ in range(n))()
+        self.join(r, timeout=max(30, n * size / 2 ** 20))
+        start = monotonic()
+        try:
+            r.forget()
+        except NotImplementedError:
+            return self.warn('forget: not supported by backend')
+        self.record('forget', monotonic() - start)
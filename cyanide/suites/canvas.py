@@ -0,0 +1,128 @@
+"""Canvas test suite: chords, chains and nested workflows at scale.
+
+Every test records client-side timings in addition to the task latency:
+
+- ``build``: time to create and freeze the workflow signature.
+- ``publish``: time to send it.
+- ``chord_join``: time from the last task in a chord header being
+  executed to the chord body being executed, as measured by the
+  :task:`~cyanide.tasks.timestamp` and :task:`~cyanide.tasks.chord_latency`
+  tasks, so the clocks of the worker hosts must be in sync.
+
+Chords need a result backend supporting them (e.g. the ``redis`` template).
+
+Use with :option:`celery cyanide -S`:
+
+.. code-block:: console
+
+    $ celery cyanide -Z redis -S cyanide.suites.canvas:Canvas
+"""
+from __future__ import absolute_import, unicode_literals
+
+from celery import chain, chord, group
+from celery.five import monotonic
+
+from cyanide.tasks import (
+    chord_adds, chord_latency, chord_replace, ids, timestamp, xsum,
+)
+from cyanide.suite import Suite, testcase
+
+E_NO_CHORDS = """\
+The {0} result backend does not support chords, \
+use a template with a different backend, e.g. -Z redis\
+"""
+
+
+def root_of(res):
+    while res.parent:
+        res = res.parent
+    return res
+
+
+class Canvas(Suite):
+
+    def run(self, *args, **kwargs):
+        backend = self.app.backend
+        if type(backend).__name__ in ('RPCBackend', 'AMQPBackend',
+                                      'DisabledBackend'):
+            self.warn(E_NO_CHORDS.format(type(backend).__name__))
+        return super(Canvas, self).run(*args, **kwargs)
+
+    @testcase('all', 'canvas', n=[10, 100, 1000, 10000, 100000],
+              iterations=5)
+    def chord_header(self, n):
+        r = self.publish(lambda: chord(
+            (timestamp.s() for _ in range(n)), chord_latency.s()))
+        self.record_chord_join(self.join([r], timeout=max(30, n / 100),
+                                         propagate=True)[0])
+
+    @testcase('all', 'canvas', n=[10, 100, 1000], iterations=5)
+    def chain_depth(self, n):
+        r = self.publish(lambda: chain(ids.si(i) for i in range(n)))
+        start = monotonic()
+        self.join([r], timeout=max(30, n / 10), propagate=True)
+        self.record('per_hop', (monotonic() - start) / n)
+        self.assert_ids(r, n - 1)
+
+    @testcase('all', 'canvas', groups=[2, 10], width=[10, 100],
+              iterations=10)
+    def nested_workflow(self, groups, width):
+        # group in chord in chain.
+        r = self.publish(lambda: chain(
+            ids.si(0),
+            chord([group(timestamp.s() for _ in range(width))
+                   for _ in range(groups)], chord_latency.s()),
+            ids.si(1),
+        ))
+        self.join([r], timeout=max(30, groups * width / 100),
+                  propagate=True)
+        self.record_chord_join(r.parent.get(timeout=10))
+        root_id, parent_id, value = r.get(timeout=10)
+        self.assert_equal(value, 1)
+        self.assert_equal(root_id, root_of(r).id)
+        self.assert_equal(parent_id, r.parent.id)
+
+    @testcase('all', 'canvas', n=[10, 100, 1000], iterations=10)
+    def dynamic_add(self, n):
+        r = self.publish(lambda: chord(
+            (chord_adds.s(i) for i in range(n)), xsum.s()))
+        total, = self.join([r], timeout=max(30, n / 50), propagate=True)
+        # every header task returns 42 and adds a task returning i + i.
+        self.assert_equal(total, 42 * n + sum(i + i for i in range(n)))
+
+    @testcase('all', 'canvas', n=[10, 100, 1000], iterations=10)
+    def dynamic_replace(self, n):
+        r = self.publish(lambda: chord(
+            (chord_replace.s(i) for i in range(n)), xsum.s()))
+        total, = self.join([r], timeout=max(30, n / 50), propagate=True)
+        self.assert_equal(total, sum(i + i for i in range(n)))
+
+    def publish(self, build):
+        """Build, freeze and send the workflow returned by ``build``,
+        recording the time of every step."""
+        start = monotonic()
+        sig = build()
+        sig.freeze()
+        built = monotonic()
+        r = sig.apply_async()
+        self.record('build', built - start)
+        self.record('publish', monotonic() - built)
+        return r
+
+    def record_chord_join(self, value):
+        header_done, body_started = value
+        # timestamps are from different worker clocks.
+        self.record('chord_join', body_started - header_done, signed=True)
+
+    def assert_ids(self, res, size):
+        """Check the ``root_id``/``parent_id`` returned by every
+        :task:`~cyanide.tasks.ids` task in a chain."""
+        root, node, i = root_of(res), res, size
+        while node:
+            root_id, parent_id, value = node.get(timeout=30)
+            self.assert_equal(value, i)
+            if node.parent:
+                self.assert_equal(parent_id, node.parent.id)
+            self.assert_equal(root_id, root.id)
+            node = node.parent
+            i -= 1
@@ -2,20 +2,58 @@ from __future__ import absolute_import, unicode_literals
 
 import random
 
-from time import sleep
+from time import sleep, time
 
 from celery import group
+from celery.five import monotonic, values
+from celery.utils.debug import humanbytes
 
 from cyanide.tasks import (
-    add, any_, exiting, kill, sleeping,
+    add, any_, cost, exiting, kill, sleeping,
     sleeping_ignore_limits, any_returning,
+    lateness, lateness_acks_late, probe, segfault,
+)
+from cyanide.data import BIG, SMALL, payload
+from cyanide.leaks import signed_bytes, worker_rss
+from cyanide.recovery import analyze, format_recovery
+from cyanide.stats import (
+    Histogram, find_cliff, format_latency, format_table, log_range,
 )
-from cyanide.data import BIG, SMALL
 from cyanide.suite import Suite, testcase
 
 
 class Default(Suite):
 
+    #: Max number of bytes to send for each point of a payload sweep.
+    sweep_budget = 2 ** 28
+
+    #: Seconds to spread the ETA of scheduled tasks over.
+    eta_window = 60.0
+
+    #: Publish rate (tasks/s) assumed when scheduling the first ETA task,
+    #: so all tasks are sent before any is due.
+    eta_publish_rate = 5000.0
+
+    #: Min number of probe tasks sent around a crashing task.
+    recovery_probes = 200
+
+    #: Seconds every probe task takes.
+    recovery_probe_time = 0.01
+
+    #: Seconds the probe tasks keep every pool process busy for, which
+    #: must be well past the time it takes to replace a dead process.
+    recovery_busy_time = 3.0
+
+    #: Total pool concurrency of the workers, read by the first
+    #: recovery test.
+    _concurrency = None
+
+    #: Hard time limit of the ``time_limit`` crash.
+    recovery_time_limit = 1.0
+
+    #: Number of tasks in every group of the ``cost`` tests.
+    cost_tasks = 100
+
     @testcase('all', 'green')
     def manyshort(self):
         self.join(group(add.s(i, i) for i in range(1000))(),
@@ -93,12 +131,200 @@ class Default(Suite):
     def revoketermslow(self, wait=5):
         self._revoketerm(wait, True, True, BIG)
 
+    @testcase('scaling', n=[10, 100, 1000, 10000])
+    def manyshort_scaling(self, n):
+        self.join(group(add.s(i, i) for i in range(n))(),
+                  timeout=max(10, n / 100), propagate=True)
+
+    @testcase('scaling', n=[8, 16, 32], data=['SMALL', 'BIG'],
+              iterations=10)
+    def revoketerm_scaling(self, n, data):
+        # payloads are named so listing tests does not create them.
+        data = {'SMALL': SMALL, 'BIG': BIG}[data]
+        self._revoketerm(None, True, False, data, n=n)
+
     def _revoketerm(self, wait=None, terminate=True,
-                    joindelay=True, data=BIG):
-        g = group(any_.s(data, sleep=wait) for i in range(8))
+                    joindelay=True, data=BIG, n=8):
+        g = group(any_.s(data, sleep=wait) for i in range(n))
         r = g()
         if terminate:
             if joindelay:
                 sleep(random.choice(range(4)))
             r.revoke(terminate=True)
         self.join(r, timeout=10)
+
+    @testcase('payload', iterations=1)
+    def payload_sweep(self):
+        self._payload_sweep(any_)
+
+    @testcase('payload', iterations=1)
+    def payload_sweep_returning(self):
+        self._payload_sweep(any_returning)
+
+    def _payload_sweep(self, task, lowest=100, highest=2 ** 26, factor=4):
+        conf = self.app.conf
+        self.print('{0}: broker={1} backend={2} serializer={3}/{4}'.format(
+            task.name, self.app.connection().transport_cls,
+            type(self.app.backend).__name__,
+            conf.CELERY_TASK_SERIALIZER, conf.CELERY_RESULT_SERIALIZER,
+        ))
+        sizes = log_range(lowest, highest, factor)
+        points = [self._payload_point(task, size) for size in sizes]
+        self.print(format_table(
+            ['size', 'n', 'msg/s', 'MB/s',
+             'publish p50', 'publish p99', 'rtt p50', 'rtt p99'],
+            [[humanbytes(size), n, '{0:.1f}'.format(rate),
+              '{0:.2f}'.format(rate * size / 2 ** 20),
+              format_latency(publish.percentile(50)),
+              format_latency(publish.percentile(99)),
+              format_latency(rtt.percentile(50)),
+              format_latency(rtt.percentile(99))]
+             for size, n, rate, publish, rtt in points],
+        ))
+        cliff = find_cliff(sizes, [rate * size for size, _, rate, _, _
+                                   in points])
+        if cliff:
+            self.print('throughput falls off between {0} and {1} '
+                       '(MB/s x {2:.2f})'.format(
+                           humanbytes(cliff[0]), humanbytes(cliff[1]),
+                           cliff[2]))
+        else:
+            self.print('no throughput cliff up to {0}'.format(
+                humanbytes(highest)))
+
+    def _payload_point(self, task, size):
+        data = payload(size)
+        n = max(min(self.sweep_budget // size, 500), 2)
+        publish, rtt = Histogram(), Histogram()
+        results = []
+        start = monotonic()
+        for _ in range(n):
+            sent = monotonic()
+            results.append(task.delay(data))
+            publish.record(monotonic() - sent)
+        self.join(results, timeout=max(10, n * size / 2 ** 20),
+                  latency=rtt)
+        return size, n, n / (monotonic() - start), publish, rtt
+
+    @testcase('eta', n=[10000, 100000, 1000000], iterations=1)
+    def eta_lateness(self, n):
+        self._eta(lateness, n)
+
+    @testcase('eta', n=[10000, 100000], iterations=1)
+    def eta_lateness_acks_late(self, n):
+        self._eta(lateness_acks_late, n)
+
+    def _eta(self, task, n):
+        delay = 5.0 + n / self.eta_publish_rate
+        first = time() + delay
+        rss_before = worker_rss(self.app)
+        results = []
+        for i in range(n):
+            eta = first + self.eta_window * i / n
+            results.append(task.apply_async((eta,), countdown=eta - time()))
+        sleep(1.0)  # let the workers receive them.
+        rss_holding = worker_rss(self.app)
+        if time() > first:
+            self.warn('eta: publishing took longer than {0}: first tasks '
+                      'were due before all were sent'.format(
+                          format_latency(delay)))
+        values = self.join(results, timeout=delay + self.eta_window + 30,
+                           propagate=True)
+        early = redelivered = 0
+        for late, was_redelivered in values or ():
+            if late < 0:
+                early += 1
+            else:
+                self.record('lateness', late)
+            redelivered += was_redelivered
+        self.print(
+            'eta: {0} tasks over {1}: {2} early, {3} redelivered, '
+            'worker rss {4} -> {5}{6}'.format(
+                n, format_latency(self.eta_window), early, redelivered,
+                humanbytes(rss_before or 0), humanbytes(rss_holding or 0),
+                ' ({0}/task)'.format(signed_bytes(
+                    (rss_holding - rss_before) / float(n)))
+                if rss_before and rss_holding else ''))
+
+    @testcase('cost', cpu=[100, 1000, 10000], iterations=10)
+    def cost_cpu(self, cpu):
+        self._cost(cpu=cpu)
+
+    @testcase('cost', io=[1000, 10000], iterations=10)
+    def cost_io(self, io):
+        self._cost(io=io)
+
+    @testcase('cost', alloc=[2 ** 20, 2 ** 24], iterations=10)
+    def cost_memory(self, alloc):
+        self._cost(alloc=alloc, hold=10000)
+
+    @testcase('cost', result_size=[2 ** 10, 2 ** 16, 2 ** 20],
+              iterations=10)
+    def cost_result(self, result_size):
+        self._cost(result_size=result_size)
+
+    def _cost(self, **costs):
+        # parallelism is the time the tasks keep a process busy
+        # divided by the time the group took, e.g. CPU-bound tasks
+        # only run in parallel using prefork.
+        n = self.cost_tasks
+        busy = n * sum(costs.get(k, 0) for k in ('cpu', 'io', 'hold')) / 1e6
+        start = monotonic()
+        self.join(group(cost.s(**costs) for _ in range(n))(),
+                  timeout=max(30, busy * 2), propagate=True)
+        elapsed = monotonic() - start
+        self.record('group', elapsed)
+        if busy:
+            self.print('{0} tasks busy {1} each in {2}: '
+                       'parallelism {3:.1f}'.format(
+                           n, format_latency(busy / n),
+                           format_latency(elapsed), busy / elapsed))
+
+    @testcase('recovery', crash=['kill', 'exit', 'segfault', 'time_limit'],
+              iterations=10)
+    def recovery(self, crash):
+        crashing, hang = self.crash_signature(crash)
+        n, t = self.recovery_group_size(hang), self.recovery_probe_time
+        baseline = self._probe(group(probe.s(t) for _ in range(n)))
+        probes = self._probe(group(
+            [probe.s(t) for _ in range(n // 2)] + [crashing] +
+            [probe.s(t) for _ in range(n - n // 2)]
+        ))
+        report = analyze(baseline, probes, hang, crash_index=n // 2)
+        # all can be negative, e.g. the group was faster than the baseline.
+        for metric, unit in (('recovery', 's'), ('delay', 's'),
+                             ('throughput_drop', '%')):
+            if report[metric] is not None:
+                self.record(metric, report[metric], unit, signed=True)
+        self.print(format_recovery(report))
+
+    def recovery_group_size(self, hang=0.0):
+        """Return number of probe tasks keeping all pool processes busy
+        for :attr:`recovery_busy_time` seconds after the crash."""
+        if self._concurrency is None:
+            self._concurrency = sum(
+                (stats.get('pool') or {}).get('max-concurrency') or 0
+                for stats in values(self.app.control.inspect().stats() or {})
+            ) or 1
+        return max(self.recovery_probes, int(
+            2 * self._concurrency * (self.recovery_busy_time + hang) /
+            self.recovery_probe_time))
+
+    def crash_signature(self, crash):
+        """Return tuple of signature of task crashing its process,
+        and the seconds it runs before the process dies."""
+        if crash == 'kill':
+            return kill.si(), 0.0
+        elif crash == 'exit':
+            return exiting.si(), 0.0
+        elif crash == 'segfault':
+            return segfault.si(), 0.0
+        elif crash == 'time_limit':
+            return (sleeping.si(self.recovery_time_limit * 10).set(
+                time_limit=self.recovery_time_limit),
+                self.recovery_time_limit)
+        raise ValueError('Unknown crash: {0!r}'.format(crash))
+
+    def _probe(self, g):
+        return [v for v in self.join(g(), timeout=30) or ()
+                if isinstance(v, (list, tuple)) and len(v) == 3]
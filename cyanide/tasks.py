@@ -5,32 +5,32 @@ import os
 import signal
 import sys
 
-from time import sleep
+from time import sleep, time
 
 from celery.exceptions import SoftTimeLimitExceeded
 from celery.utils.log import get_task_logger
 
 from .app import app
-
-E_MARKER_DELAY_ERROR = """\
-Retrying marker.delay().  It failed to start: {0}\
-"""
+from .costmodel import allocate, burn
+from .data import payload
+from .markers import MarkerPublisher
 
 logger = get_task_logger(__name__)
 
 
-def marker(s, sep='-'):
+def marker(s, sep='-', write=None):
     """Marker is a task that logs something to the worker logs.
 
+    The marker is sent in the background by :data:`markers`,
+    so this never blocks.
+
     :param s: Text to log.
+    :keyword write: Function used to print the marker locally,
+        by default :func:`print`.
 
     """
-    print('{0}{1}'.format(sep, s))
-    while True:
-        try:
-            return _marker.delay(s, sep)
-        except Exception as exc:
-            print(E_MARKER_DELAY_ERROR.format(exc))
+    (print if write is None else write)('{0}{1}'.format(sep, s))
+    markers.put(s, sep)
 
 
 @app.task
@@ -38,6 +38,24 @@ def _marker(s, sep='---'):
     print('{sep} {0} {sep}'.format(s, sep=sep))
 
 
+@app.task
+def _markers(batch):
+    """Log list of ``(text, sep)`` markers."""
+    for s, sep in batch:
+        _marker(s, sep)
+
+
+def _send_markers(batch, queue=None):
+    _markers.apply_async((batch,), queue=queue)
+
+#: Publishes markers in the background.
+markers = MarkerPublisher(_send_markers)
+
+#: Names of the tasks sending markers, which are not part of any test.
+MARKER_TASKS = frozenset(
+    '{0}.{1}'.format(__name__, name) for name in ('_marker', '_markers'))
+
+
 @app.task
 def add(x, y):
     """Add two numbers."""
@@ -68,6 +86,34 @@ def xsum(x):
     return sum(x)
 
 
+@app.task
+def timestamp(*args, **kwargs):
+    """Returns the time the task was executed (:func:`time.time`),
+    any arguments are ignored."""
+    return time()
+
+
+def _flatten(values):
+    for value in values:
+        if isinstance(value, (list, tuple)):
+            for v in _flatten(value):
+                yield v
+        else:
+            yield value
+
+
+@app.task
+def chord_latency(stamps):
+    """Chord body used with :task:`timestamp` in the header: returns a
+    tuple of the time the last header task was executed, and the time
+    this task was executed.
+
+    The header results can be nested lists (groups in the header).
+
+    """
+    return max(_flatten(stamps)), time()
+
+
 @app.task
 def any_(*args, **kwargs):
     """Task taking any argument, returning nothing.
@@ -91,6 +137,49 @@ def any_returning(*args, **kwargs):
     return args, kwargs
 
 
+@app.task
+def probe(duration=0):
+    """Task sleeping for ``duration`` seconds, returning a tuple of
+    ``(pid, started, finished)`` (:func:`time.time` timestamps)."""
+    started = time()
+    if duration:
+        sleep(duration)
+    return os.getpid(), started, time()
+
+
+@app.task
+def cost(cpu=0, io=0, alloc=0, hold=0, result_size=0):
+    """Task with calibrated costs (see :mod:`cyanide.costmodel`).
+
+    :keyword cpu: Microseconds of CPU time to use.
+    :keyword io: Microseconds to block for, like waiting for I/O.
+    :keyword alloc: Bytes of memory to allocate, held until the
+        task returns.
+    :keyword hold: Microseconds to hold the memory for (sleeping).
+    :keyword result_size: Size of the returned payload in bytes.
+
+    """
+    held = allocate(alloc) if alloc else None
+    burn(cpu)
+    if io or hold:
+        sleep((io + hold) / 1e6)
+    del held
+    return payload(result_size) if result_size else None
+
+
+@app.task
+def stand_in(data=None, runtime=0, result_size=0):
+    """Stand-in for a recorded task (see :mod:`cyanide.trace`).
+
+    The argument is ignored, the task sleeps for ``runtime`` seconds
+    and returns a payload of ``result_size`` bytes.
+
+    """
+    if runtime:
+        sleep(runtime)
+    return payload(result_size) if result_size else None
+
+
 @app.task
 def exiting(status=0):
     """Task calling ``sys.exit(status)`` to terminate its own worker
@@ -148,6 +237,25 @@ def retries(self, n=1, countdown=1, return_value=10):
     return return_value
 
 
+def _lateness(request, eta):
+    redelivered = (request.delivery_info or {}).get('redelivered')
+    return time() - eta, bool(redelivered)
+
+
+@app.task(bind=True)
+def lateness(self, eta):
+    """Returns a tuple of how many seconds late the task was executed
+    compared to ``eta`` (a :func:`time.time` timestamp), and whether the
+    message was redelivered."""
+    return _lateness(self.request, eta)
+
+
+@app.task(bind=True, acks_late=True)
+def lateness_acks_late(self, eta):
+    """Same as :task:`lateness`, but acknowledged after execution."""
+    return _lateness(self.request, eta)
+
+
 @app.task
 def print_unicode(log_message='håå®ƒ valmuefrø', print_message='hiöäüß'):
     """Task that both logs and print strings containing funny characters."""
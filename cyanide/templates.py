@@ -2,6 +2,7 @@ from __future__ import absolute_import, unicode_literals
 
 import celery
 import os
+import tempfile
 
 from functools import partial
 
@@ -12,6 +13,8 @@ from kombu.utils import symbol_by_name
 CYANIDE_TRANS = os.environ.get('CYANIDE_TRANS', False)
 default_queue = 'c.stress.trans' if CYANIDE_TRANS else 'c.stress'
 CYANIDE_QUEUE = os.environ.get('CYANIDE_QUEUE', default_queue)
+CYANIDE_FSDIR = os.environ.get(
+    'CYANIDE_FSDIR', os.path.join(tempfile.gettempdir(), 'cyanide'))
 
 templates = {}
 
@@ -39,15 +42,26 @@ if IS_CELERY_4:
         def load_template(sender, source, **kwargs):
             mixin_templates(template[1:], source)
 
+        prepare_templates(template)
         app.config_from_object(templates[template[0]])
 else:
 
     def use_template(app, template='default'):  # noqa
         template = template.split(',')
         app.after_configure = partial(mixin_templates, template[1:])
+        prepare_templates(template)
         app.config_from_object(templates[template[0]])
 
 
+def prepare_templates(names):
+    """Call the ``_prepare`` method of templates that have one,
+    e.g. to create directories needed by the configuration."""
+    for name in names:
+        prepare = getattr(symbol_by_name(templates[name]), '_prepare', None)
+        if prepare is not None:
+            prepare()
+
+
 def mixin_templates(templates, conf):
     return [mixin_template(template, conf) for template in templates]
 
@@ -75,7 +89,10 @@ class default(object):
     CELERY_RESULT_EXPIRES = 300
     CELERY_MAX_CACHED_RESULTS = 100
     CELERY_DEFAULT_QUEUE = CYANIDE_QUEUE
-    CELERY_IMPORTS = ['cyanide.tasks']
+    CELERY_IMPORTS = [
+        'cyanide.tasks', 'cyanide.profiling', 'cyanide.costmodel',
+        'cyanide.leaks',
+    ]
     CELERY_TRACK_STARTED = True
     CELERY_QUEUES = [
         Queue(CYANIDE_QUEUE,
@@ -121,6 +138,13 @@ class pickle(default):
     CELERY_RESULT_SERIALIZER = 'pickle'
 
 
+@template()
+class binary(default):
+    CELERY_ACCEPT_CONTENT = ['cyanide-binary', 'json']
+    CELERY_TASK_SERIALIZER = 'cyanide-binary'
+    CELERY_RESULT_SERIALIZER = 'cyanide-binary'
+
+
 @template()
 class confirms(default):
     BROKER_URL = 'pyamqp://'
@@ -146,6 +170,31 @@ class sqs(default):
     }
 
 
+@template()
+class filesystem(default):
+    """Single host setup using the filesystem transport and
+    result backend, in :envvar:`CYANIDE_FSDIR`.
+
+    The transport has no fanout exchanges, so remote control
+    commands and events do not reach the workers.
+
+    """
+    BROKER_URL = 'filesystem://'
+    BROKER_TRANSPORT_OPTIONS = {
+        'data_folder_in': os.path.join(CYANIDE_FSDIR, 'queue'),
+        'data_folder_out': os.path.join(CYANIDE_FSDIR, 'queue'),
+    }
+    CELERY_RESULT_BACKEND = 'file://' + os.path.join(
+        CYANIDE_FSDIR, 'results')
+
+    @classmethod
+    def _prepare(cls):
+        for path in [os.path.join(CYANIDE_FSDIR, 'queue'),
+                     os.path.join(CYANIDE_FSDIR, 'results')]:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+
 @template()
 class proto1(default):
     CELERY_TASK_PROTOCOL = 1
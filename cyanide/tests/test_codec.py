@@ -0,0 +1,106 @@
+from __future__ import absolute_import, unicode_literals
+
+import datetime
+import decimal
+import json
+import uuid
+
+from collections import OrderedDict
+
+from cyanide.codec import INT64_MAX, INT64_MIN, decode, dumps, loads
+from cyanide.data import Data, JSONEncoder, decode_hook, find_reducer
+from cyanide.tests.case import Case
+
+
+class Unsupported(object):
+    pass
+
+
+class test_codec(Case):
+
+    def assertRoundTrip(self, obj, expected=None):
+        self.assertEqual(loads(dumps(obj)),
+                         obj if expected is None else expected)
+
+    def test_scalars(self):
+        for obj in (None, True, False, 0, -1, 3.25, b'\x00\xff',
+                    'text', 'h\xe5\xe5\xaeƒ'):
+            value = loads(dumps(obj))
+            self.assertEqual(value, obj)
+            self.assertIs(type(value), type(obj))
+
+    def test_ints(self):
+        for obj in (INT64_MIN, INT64_MAX, INT64_MIN - 1, INT64_MAX + 1,
+                    2 ** 100, -2 ** 100):
+            self.assertRoundTrip(obj)
+
+    def test_containers(self):
+        self.assertRoundTrip(
+            {'args': [1, 'a', None], 'kwargs': {'x': {'y': [b'z']}}})
+        self.assertRoundTrip([], [])
+        self.assertRoundTrip({}, {})
+
+    def test_tuple_as_list(self):
+        self.assertRoundTrip((1, (2, 3)), [1, [2, 3]])
+
+    def test_subclasses(self):
+        self.assertRoundTrip(OrderedDict([('a', 1)]), {'a': 1})
+
+    def test_data(self):
+        for data in ('x' * 1000, b'\x00' * 1000):
+            value = loads(dumps([Data('label', data)]))[0]
+            self.assertIsInstance(value, Data)
+            self.assertEqual(value.label, 'label')
+            self.assertEqual(value.data, data)
+
+    def test_reduced(self):
+        obj = uuid.UUID('a0b1c2d3-0000-4000-8000-000000000000')
+        self.assertRoundTrip(obj, str(obj))
+        self.assertRoundTrip(decimal.Decimal('1.5'), '1.5')
+        self.assertRoundTrip(
+            datetime.datetime(2016, 1, 2, 3, 4, 5), '2016-01-02T03:04:05')
+        self.assertRoundTrip(datetime.date(2016, 1, 2), '2016-01-02T00:00:00')
+
+    def test_unsupported(self):
+        with self.assertRaises(TypeError):
+            dumps({'obj': Unsupported()})
+
+    def test_memoryview(self):
+        self.assertEqual(loads(bytearray(dumps([1]))), [1])
+
+    def test_unknown_tag(self):
+        with self.assertRaises(ValueError):
+            decode(b'?')
+
+
+class test_json_reducers(Case):
+
+    def test_data(self):
+        s = json.dumps({'x': Data('label', 'data')}, cls=JSONEncoder)
+        value = json.loads(s, object_hook=decode_hook)['x']
+        self.assertIsInstance(value, Data)
+        self.assertEqual((value.label, value.data), ('label', 'data'))
+
+    def test_datetime(self):
+        utc = datetime.datetime(2016, 1, 2, 3, 4, 5, tzinfo=UTC())
+        self.assertEqual(json.dumps(utc, cls=JSONEncoder),
+                         '"2016-01-02T03:04:05Z"')
+        self.assertEqual(json.dumps(datetime.time(1, 2), cls=JSONEncoder),
+                         '"01:02:00"')
+
+    def test_cached(self):
+        self.assertIs(find_reducer(uuid.UUID), find_reducer(uuid.UUID))
+        self.assertIsNone(find_reducer(Unsupported))
+
+    def test_unsupported(self):
+        with self.assertRaises(TypeError):
+            json.dumps(Unsupported(), cls=JSONEncoder)
+
+
+class UTC(datetime.tzinfo):
+
+    def utcoffset(self, dt):
+        return datetime.timedelta(0)
+
+    def dst(self, dt):
+        return datetime.timedelta(0)
@@ -0,0 +1,128 @@
+from __future__ import absolute_import, unicode_literals
+
+from cyanide.collector import (
+    STRATEGIES, Collector, _iter_native, _per_result, supported_strategies,
+)
+from cyanide.tests.case import Case, Mock
+
+
+def result(task_id):
+    return Mock(name='AsyncResult', id=task_id)
+
+
+class test_supported_strategies(Case):
+
+    def test_native(self):
+        self.assertEqual(
+            supported_strategies(Mock(supports_native_join=True)),
+            list(STRATEGIES))
+
+    def test_not_native(self):
+        self.assertEqual(
+            supported_strategies(Mock(supports_native_join=False)),
+            ['get', 'join', 'per_result'])
+        self.assertEqual(
+            supported_strategies(object()), ['get', 'join', 'per_result'])
+
+
+class test_strategies(Case):
+
+    def test_iter_native(self):
+        rs = Mock(name='ResultSet')
+        rs.iter_native.return_value = [
+            ('a', {'status': 'SUCCESS', 'result': 1}),
+            ('b', {'status': 'FAILURE', 'result': KeyError('b')}),
+        ]
+        callback = Mock(name='callback')
+        _iter_native(rs, callback, propagate=False, timeout=3)
+        rs.iter_native.assert_called_with(timeout=3)
+        self.assertEqual(callback.call_count, 2)
+        callback.reset_mock()
+        with self.assertRaises(KeyError):
+            _iter_native(rs, callback)
+        callback.assert_called_once_with('a', 1)
+
+    def test_per_result(self):
+        rs = Mock(name='ResultSet')
+        rs.results = [result('a'), result('b')]
+        rs.results[0].get.return_value = 1
+        rs.results[1].get.return_value = 2
+        callback = Mock(name='callback')
+        _per_result(rs, callback, timeout=3)
+        rs.results[0].get.assert_called_with(timeout=3)
+        callback.assert_any_call('a', 1)
+        callback.assert_any_call('b', 2)
+
+
+class test_Collector(Case):
+
+    def setup(self):
+        self.results = [result(str(i)) for i in range(10)]
+        self.collector = Collector(self.results[:4])
+        self.collector.strategy = Mock(name='strategy')
+
+    def receive(self, *indices):
+        for i in indices:
+            self.collector(str(i), i * 10)
+
+    def test_add(self):
+        c = self.collector
+        c.add(self.results[4])
+        self.assertEqual(len(c), 5)
+        self.assertEqual(c.outstanding, 5)
+        self.assertEqual(c.resultset.results, self.results[:5])
+        self.assertEqual(c.first_outstanding(2), ['0', '1'])
+
+    def test_receive(self):
+        on_result = self.collector.on_result = Mock(name='on_result')
+        self.receive(2, 0)
+        self.assertEqual(self.collector.outstanding, 2)
+        self.assertEqual(self.collector.received, 2)
+        self.assertEqual(self.collector.results(), [0, None, 20, None])
+        on_result.assert_called_with('0', 0)
+        # duplicates and unknown tasks are ignored.
+        self.receive(2, 99)
+        self.assertEqual(self.collector.received, 2)
+        self.assertEqual(on_result.call_count, 2)
+
+    def test_keep_values(self):
+        c = Collector(self.results[:2], keep_values=False)
+        c('0', 'value')
+        self.assertFalse(c.values)
+        self.assertEqual(c.results(), [])
+        self.assertEqual(c.outstanding, 1)
+
+    def test_collect(self):
+        c = self.collector
+        c.strategy.side_effect = lambda rs, callback, **kw: self.receive(
+            *[int(r.id) for r in rs.results])
+        self.assertEqual(c.collect(timeout=10), [0, 10, 20, 30])
+        c.strategy.assert_called_once_with(c.resultset, c, timeout=10)
+        self.assertFalse(c.outstanding)
+
+    def test_collect__nothing_pending(self):
+        self.receive(0, 1, 2, 3)
+        self.collector.collect()
+        self.collector.strategy.assert_not_called()
+
+    def test_collect__reuses_result_set(self):
+        c = self.collector
+        resultset = c.resultset
+        self.receive(0)
+        c.collect()
+        c.add(self.results[4])
+        c.collect()
+        self.assertIs(c.resultset, resultset)
+        # one result received is not rebuilt away while it is outnumbered.
+        self.assertEqual(resultset.results, self.results[:5])
+        self.assertEqual(c.stale, 1)
+
+    def test_collect__removes_stale(self):
+        c = self.collector
+        resultset = c.resultset
+        self.receive(0, 1, 2)
+        c.collect()
+        self.assertIs(c.resultset, resultset)
+        self.assertEqual(resultset.results, [self.results[3]])
+        self.assertEqual(c.stale, 0)
+        c.strategy.assert_called_once_with(resultset, c)
@@ -0,0 +1,121 @@
+from __future__ import absolute_import, unicode_literals
+
+from io import StringIO
+
+from cyanide.distributed import Agent, Coordinator, share_of
+from cyanide.stats import TestStats as Stats
+from cyanide.tests.case import Case, Mock
+
+
+class test_share_of(Case):
+
+    def test_even(self):
+        self.assertEqual([share_of(9, i, 3) for i in range(3)], [3, 3, 3])
+
+    def test_remainder(self):
+        self.assertEqual([share_of(10, i, 4) for i in range(4)],
+                         [3, 3, 2, 2])
+
+    def test_more_agents_than_iterations(self):
+        self.assertEqual([share_of(2, i, 3) for i in range(3)], [1, 1, 0])
+
+    def test_adds_up(self):
+        for n in range(20):
+            for total in range(1, 7):
+                self.assertEqual(
+                    sum(share_of(n, i, total) for i in range(total)), n)
+
+
+class test_Coordinator(Case):
+
+    def setup(self):
+        self.app = Mock(name='app')
+        self.stdout, self.stderr = StringIO(), StringIO()
+        self.coordinator = Coordinator(
+            self.app, ['manyshort'], 2, {
+                'iterations': 10, 'json_report': 'x.json', 'diag': True,
+            }, suite='cyanide.suites.default:Default', group='green',
+            param=['n=1'], stdout=self.stdout, stderr=self.stderr,
+        )
+        self.coordinator.offsets = {'a': 0.5, 'b': -0.5}
+
+    def report(self, runtime, latencies):
+        stats = Stats('manyshort')
+        stats.iterations, stats.runtime = 5, runtime
+        for value in latencies:
+            stats.latency.record(value)
+        return {'tests': [stats.as_dict()]}
+
+    def test_options(self):
+        self.assertEqual(self.coordinator.options, {
+            'iterations': 10, 'group': 'green', 'param': ['n=1'],
+        })
+
+    def test_run_test(self):
+        bound = Mock(name='mailbox')
+        bound._broadcast.return_value = [
+            {'a': {'report': self.report(1.0, [0.1]), 'started': 100.5}},
+            {'b': {'report': self.report(2.0, [0.2, 0.3]),
+                   'started': 99.75}},
+        ]
+        self.coordinator.run_test(bound, ['a', 'b'], 'manyshort')
+        args, kwargs = bound._broadcast.call_args
+        self.assertEqual(args[0], 'run')
+        self.assertEqual(args[1]['names'], ['manyshort'])
+        self.assertEqual(args[1]['options'], self.coordinator.options)
+        start_at = args[1]['start_at']
+        self.assertAlmostEqual(start_at['a'] - start_at['b'], 1.0)
+        self.assertEqual(kwargs['destination'], ['a', 'b'])
+        self.assertEqual(kwargs['limit'], 2)
+        stats, agents, spread = self.coordinator.results['manyshort']
+        self.assertEqual(agents, 2)
+        self.assertAlmostEqual(spread, 0.25)
+        self.assertEqual(stats.iterations, 10)
+        self.assertEqual(stats.tasks, 3)
+        self.assertEqual(stats.runtime, 2.0)
+
+    def test_run_test__failed(self):
+        bound = Mock(name='mailbox')
+        bound._broadcast.return_value = [
+            {'a': {'report': self.report(1.0, [0.1]), 'started': 100.0}},
+            {'b': {'error': 'KeyError()'}},
+        ]
+        self.coordinator.run_test(bound, ['a', 'b'], 'manyshort')
+        self.assertIn('b: KeyError()', self.stderr.getvalue())
+        self.assertIn('1 of 2 agent(s) did not complete',
+                      self.stderr.getvalue())
+        self.assertEqual(self.coordinator.results['manyshort'][1], 1)
+
+    def test_run_test__no_replies(self):
+        bound = Mock(name='mailbox')
+        bound._broadcast.return_value = []
+        self.coordinator.run_test(bound, ['a', 'b'], 'manyshort')
+        self.assertNotIn('manyshort', self.coordinator.results)
+
+
+class test_Agent(Case):
+
+    def setup(self):
+        self.app = Mock(name='app')
+        self.agent = Agent(self.app, 'b', stdout=StringIO(),
+                           stderr=StringIO())
+        self.suite = self.agent.suites['path'] = Mock(name='suite')
+        self.suite.report.return_value = {'tests': []}
+
+    def test_run_test(self):
+        reply = self.agent.run_test(
+            'path', ['manyshort'], {'iterations': 10},
+            start_at={'a': 0, 'b': 0}, agents=['a', 'b'])
+        self.suite.results.clear.assert_called_with()
+        self.suite.run.assert_called_with(
+            ['manyshort'], share=(1, 2), iterations=10)
+        self.assertEqual(reply['report'], {'tests': []})
+        self.assertIn('started', reply)
+
+    def test_run_test__error(self):
+        self.suite.run.side_effect = KeyError('manyshort')
+        reply = self.agent.run_test(
+            'path', ['manyshort'], {}, start_at={'b': 0}, agents=['b'])
+        self.assertEqual(list(reply), ['error'])
+        self.assertIn('KeyError', reply['error'])
+        self.assertIn('test failed', self.agent.stderr.getvalue())
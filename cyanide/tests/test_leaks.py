@@ -0,0 +1,146 @@
+from __future__ import absolute_import, unicode_literals
+
+from cyanide.leaks import (
+    LeakHunter, fit_line, format_leak, leak_table, monotonicity,
+    parse_bytes, pool_rss, signed_bytes, worker_rss,
+)
+from cyanide.tests.case import Case, Mock
+
+
+class test_fit_line(Case):
+
+    def test_line(self):
+        slope, intercept, r2 = fit_line([0, 1, 2, 3], [1.0, 3.0, 5.0, 7.0])
+        self.assertAlmostEqual(slope, 2.0)
+        self.assertAlmostEqual(intercept, 1.0)
+        self.assertAlmostEqual(r2, 1.0)
+
+    def test_noise(self):
+        slope, _, r2 = fit_line([0, 1, 2, 3], [0.0, 2.0, 0.0, 2.0])
+        self.assertAlmostEqual(slope, 0.4)
+        self.assertAlmostEqual(r2, 0.2)
+
+    def test_flat(self):
+        self.assertEqual(fit_line([0, 1, 2], [5.0, 5.0, 5.0]),
+                         (0.0, 5.0, 0.0))
+
+    def test_too_few(self):
+        self.assertEqual(fit_line([], []), (0.0, 0.0, 0.0))
+        self.assertEqual(fit_line([0], [3.0]), (0.0, 3.0, 0.0))
+
+    def test_same_x(self):
+        self.assertEqual(fit_line([1, 1], [1.0, 3.0]), (0.0, 2.0, 0.0))
+
+
+class test_monotonicity(Case):
+
+    def test_monotonicity(self):
+        self.assertEqual(monotonicity([1, 2, 2, 3]), 1.0)
+        self.assertEqual(monotonicity([1, 0, 2, 1, 3]), 0.5)
+        self.assertEqual(monotonicity([1]), 0.0)
+
+
+class test_parse_bytes(Case):
+
+    def test_parse(self):
+        self.assertEqual(parse_bytes('100'), 100)
+        self.assertEqual(parse_bytes('1.5MB'), 1572864)
+        self.assertEqual(parse_bytes(' 2 kb '), 2048)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_bytes('N/A')
+
+
+class test_remote(Case):
+
+    def setup(self):
+        self.app = Mock(name='app')
+
+    def test_pool_rss(self):
+        self.app.control.broadcast.return_value = [
+            {'a': {'ok': 100}}, {'b': {'ok': 50}}, {'c': {'error': 'x'}},
+        ]
+        self.assertEqual(pool_rss(self.app, limit=3), 150)
+        self.app.control.broadcast.assert_called_with(
+            'poolrss', reply=True, timeout=1.0, limit=3)
+
+    def test_pool_rss__unknown(self):
+        self.app.control.broadcast.return_value = [{'a': {'error': 'x'}}]
+        self.assertIsNone(pool_rss(self.app))
+        self.app.control.broadcast.return_value = None
+        self.assertIsNone(pool_rss(self.app))
+
+    def test_worker_rss(self):
+        memsample = self.app.control.inspect.return_value.memsample
+        memsample.return_value = {'a': '1MB', 'b': 'N/A', 'c': None}
+        self.assertEqual(worker_rss(self.app), 1048576)
+        memsample.return_value = {'a': 'garbage'}
+        self.assertIsNone(worker_rss(self.app))
+
+
+class test_LeakHunter(Case):
+
+    def setup(self):
+        self.app = Mock(name='app')
+        self.app.control.ping.return_value = [{'a': 'pong'}, {'b': 'pong'}]
+
+    def hunter(self, samples, **kwargs):
+        hunter = LeakHunter(self.app, [1], warmup=0, **kwargs)
+        hunter.samples = list(samples)
+        return hunter
+
+    def test_leak(self):
+        report = self.hunter(
+            [i * 2 ** 20 for i in range(10)]).report()
+        self.assertTrue(report['leak'])
+        self.assertAlmostEqual(report['slope'], 2 ** 20)
+        self.assertAlmostEqual(report['growth'], 9 * 2 ** 20)
+        self.assertEqual(report['source'], 'pool')
+        self.assertIn('LEAK?', format_leak(report))
+        self.assertEqual(leak_table({'t': report, 'u': None}),
+                         [['t', '+1024.0', '+9MB', '1.00']])
+
+    def test_below_threshold(self):
+        report = self.hunter([i * 1024 for i in range(10)]).report()
+        self.assertFalse(report['leak'])
+        self.assertNotIn('LEAK?', format_leak(report))
+
+    def test_not_monotonic(self):
+        samples = [i * 2 ** 20 + (2 ** 22 if i % 2 else 0)
+                   for i in range(10)]
+        self.assertFalse(self.hunter(samples).report()['leak'])
+
+    def test_warmup(self):
+        hunter = self.hunter([2 ** 30] + [2 ** 20] * 9)
+        hunter.warmup = 0.1
+        self.assertEqual(hunter.report()['samples'], 9)
+        self.assertFalse(hunter.report()['leak'])
+
+    def test_too_few_samples(self):
+        self.assertIsNone(self.hunter([1, 2]).report())
+
+    def test_remote_pool(self):
+        self.app.control.broadcast.return_value = [{'a': {'ok': 100}}]
+        hunter = LeakHunter(self.app)
+        self.assertEqual(hunter.limit, 2)
+        self.assertEqual(hunter.sample(), 100)
+        self.assertEqual(hunter.samples, [100])
+        self.assertEqual(hunter.source, 'pool')
+
+    def test_remote_main_process(self):
+        self.app.control.broadcast.return_value = [{'a': {'error': 'x'}}]
+        memsample = self.app.control.inspect.return_value.memsample
+        memsample.return_value = {'a': '1KB'}
+        hunter = LeakHunter(self.app)
+        self.assertEqual(hunter.sample(), 1024)
+        self.assertEqual(hunter.source, 'main process')
+        hunter.sample()
+        self.assertEqual(self.app.control.broadcast.call_count, 1)
+
+
+class test_signed_bytes(Case):
+
+    def test_signed_bytes(self):
+        self.assertEqual(signed_bytes(2048), '+2KB')
+        self.assertEqual(signed_bytes(-2048), '-2KB')
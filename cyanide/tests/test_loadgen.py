@@ -0,0 +1,50 @@
+from __future__ import absolute_import, unicode_literals
+
+from cyanide.loadgen import Step, parse_schedule
+from cyanide.tests.case import Case
+
+
+class test_parse_schedule(Case):
+
+    def test_rate(self):
+        self.assertEqual(parse_schedule(rate=100), [(100.0, 10.0)])
+
+    def test_ramp(self):
+        self.assertEqual(
+            parse_schedule(ramp='500, 1000,,5000', duration=2),
+            [(500.0, 2.0), (1000.0, 2.0), (5000.0, 2.0)])
+
+    def test_ramp_before_rate(self):
+        self.assertEqual(parse_schedule(rate=1, ramp='2'), [(2.0, 10.0)])
+
+    def test_not_positive(self):
+        with self.assertRaises(ValueError):
+            parse_schedule(rate=0)
+        with self.assertRaises(ValueError):
+            parse_schedule(ramp='100,-1')
+        with self.assertRaises(ValueError):
+            parse_schedule(ramp=' , ')
+
+    def test_not_a_number(self):
+        with self.assertRaises(ValueError):
+            parse_schedule(ramp='100,fast')
+
+
+class test_Step(Case):
+
+    def test_rates(self):
+        step = Step(1, 100.0, 10.0)
+        self.assertEqual(step.achieved, 0)
+        self.assertEqual(step.completed_rate, 0)
+        step.published, step.publish_time = 1000, 10.0
+        step.completed, step.complete_time = 900, 10.0
+        self.assertEqual(step.achieved, 100.0)
+        self.assertEqual(step.completed_rate, 90.0)
+
+    def test_saturated(self):
+        step = Step(1, 100.0, 10.0)
+        step.completed, step.complete_time = 960, 10.0
+        self.assertFalse(step.saturated(0.95))
+        self.assertTrue(step.saturated(0.99))
+        step.lost = 1
+        self.assertTrue(step.saturated(0.95))
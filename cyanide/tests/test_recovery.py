@@ -0,0 +1,107 @@
+from __future__ import absolute_import, unicode_literals
+
+from cyanide.recovery import analyze, duration, format_recovery, spans
+from cyanide.tests.case import Case
+
+
+def busy(pid, start, n, t=0.1):
+    """Probes executed back to back by one process."""
+    return [(pid, start + i * t, start + (i + 1) * t) for i in range(n)]
+
+
+def in_order(*probes):
+    # the probes in the order sent, which is roughly the order started.
+    return sorted(sum(probes, []), key=lambda p: p[1])
+
+
+class test_analyze(Case):
+
+    def setup(self):
+        # two processes, 20 probes each taking 2s in total.
+        self.baseline = in_order(busy(1, 0.0, 20), busy(2, 0.0, 20))
+
+    def test_replaced(self):
+        # process 1 dies at 1.0, replaced by process 3 at 1.5.
+        probes = in_order(busy(1, 0.0, 10), busy(2, 0.0, 25),
+                          busy(3, 1.5, 10))
+        report = analyze(self.baseline, probes)
+        self.assertEqual(report['replaced'], 1)
+        self.assertAlmostEqual(report['recovery'], 0.5)
+        self.assertAlmostEqual(report['delay'], 0.5)
+        # 7 probes completed in 0.5s (both ends included),
+        # the baseline rate is 20/s.
+        self.assertAlmostEqual(report['throughput_drop'], 0.3)
+
+    def test_hang(self):
+        probes = in_order(busy(1, 0.0, 10), busy(2, 0.0, 25),
+                          busy(3, 1.5, 10))
+        report = analyze(self.baseline, probes, hang=0.2)
+        self.assertAlmostEqual(report['recovery'], 0.3)
+
+    def test_idle_processes_are_not_the_dead_one(self):
+        # process 4 idled after the first probe, and process 5 idled
+        # just before the replacement, process 1 died at the crash.
+        baseline = in_order(self.baseline, busy(4, 0.0, 1),
+                            busy(5, 0.0, 20))
+        probes = in_order(busy(4, 0.0, 1), busy(1, 0.0, 10),
+                          busy(2, 0.0, 25), busy(5, 0.0, 14),
+                          busy(3, 1.5, 10))
+        # 31 probes started before the crashing task.
+        report = analyze(baseline, probes, crash_index=31)
+        self.assertAlmostEqual(report['recovery'], 0.5)
+        self.assertAlmostEqual(
+            analyze(baseline, probes)['recovery'], 0.5)
+
+    def test_not_replaced(self):
+        # the group completed before the dead process was replaced.
+        probes = in_order(busy(1, 0.0, 10), busy(2, 0.0, 30))
+        report = analyze(self.baseline, probes)
+        self.assertEqual(report['replaced'], 0)
+        self.assertIsNone(report['recovery'])
+        self.assertIsNone(report['throughput_drop'])
+        self.assertAlmostEqual(report['delay'], 1.0)
+
+    def test_no_process_stopped(self):
+        # a new process started before any known process stopped.
+        probes = in_order(busy(1, 0.0, 20), busy(2, 0.0, 20),
+                          busy(3, 0.0, 5))
+        report = analyze(self.baseline, probes)
+        self.assertEqual(report['replaced'], 1)
+        self.assertIsNone(report['recovery'])
+
+    def test_faster_than_baseline(self):
+        probes = in_order(busy(1, 0.0, 10), busy(2, 0.0, 15),
+                          busy(3, 1.0, 5, t=0.05))
+        report = analyze(self.baseline, probes)
+        self.assertAlmostEqual(report['delay'], -0.5)
+        self.assertAlmostEqual(report['recovery'], 0.0)
+        self.assertIsNone(report['throughput_drop'])
+
+    def test_no_probes(self):
+        report = analyze([], [])
+        self.assertEqual(report, {
+            'replaced': 0, 'recovery': None,
+            'delay': None, 'throughput_drop': None,
+        })
+
+
+class test_helpers(Case):
+
+    def test_spans(self):
+        self.assertEqual(spans([(1, 0.5, 1.0), (1, 0.0, 0.5), (2, 1, 2)]),
+                         {1: (0.0, 1.0, 2), 2: (1, 2, 1)})
+
+    def test_duration(self):
+        self.assertIsNone(duration([]))
+        self.assertEqual(duration([(1, 1.0, 2.0), (2, 0.5, 1.5)]), 1.5)
+
+    def test_format_recovery(self):
+        self.assertEqual(format_recovery({
+            'replaced': 1, 'recovery': 0.5, 'delay': 0.25,
+            'throughput_drop': 0.5,
+        }), 'recovery: 1 replaced, recovered in 500.00ms, healthy tasks '
+            'delayed 250.00ms, throughput drop 50%')
+        self.assertIn('throughput drop -', format_recovery({
+            'replaced': 0, 'recovery': None, 'delay': None,
+            'throughput_drop': None,
+        }))
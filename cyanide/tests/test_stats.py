@@ -0,0 +1,293 @@
+from __future__ import absolute_import, unicode_literals
+
+import json
+
+from cyanide.stats import (
+    Histogram, Samples, TestStats as Stats,
+    find_cliff, format_latency, format_table, format_value,
+    log_range, mean_ci, t_critical,
+)
+from cyanide.tests.case import Case
+
+
+class test_Histogram(Case):
+
+    def test_empty(self):
+        h = Histogram()
+        self.assertFalse(h)
+        self.assertEqual(len(h), 0)
+        self.assertIsNone(h.percentile(50))
+        self.assertIsNone(h.mean)
+        self.assertIn('min=-', h.summary())
+
+    def test_record(self):
+        h = Histogram()
+        for i in range(1, 101):
+            h.record(i / 1000.0)
+        self.assertEqual(h.count, 100)
+        self.assertEqual(h.min, 0.001)
+        self.assertEqual(h.max, 0.1)
+        self.assertAlmostEqual(h.mean, 0.0505)
+        self.assertFalse(h.clamped)
+
+    def test_record__n(self):
+        h = Histogram()
+        h.record(0.5, n=10)
+        self.assertEqual(h.count, 10)
+        self.assertAlmostEqual(h.total, 5.0)
+
+    def test_percentile__within_precision(self):
+        h = Histogram(precision=0.01)
+        for i in range(1, 1001):
+            h.record(i / 1000.0)
+        for p, expected in ((50, 0.5), (90, 0.9), (99, 0.99)):
+            self.assertAlmostEqual(
+                h.percentile(p), expected, delta=expected * 0.01)
+        self.assertAlmostEqual(h.percentile(100), 1.0, delta=0.01)
+
+    def test_percentile__within_min_max(self):
+        h = Histogram()
+        h.record(0.25)
+        self.assertEqual(h.percentile(0), 0.25)
+        self.assertEqual(h.percentile(50), 0.25)
+        self.assertEqual(h.percentile(100), 0.25)
+
+    def test_clamped(self):
+        h = Histogram(lowest=1e-3, highest=1.0)
+        h.record(-1.0)
+        h.record(1e-6)
+        h.record(10.0)
+        h.record(0.5)
+        self.assertEqual(h.clamped, 3)
+        self.assertEqual(h.min, 1e-3)
+        self.assertEqual(h.max, 1.0)
+        self.assertIn('clamped=3', h.summary())
+
+    def test_merge(self):
+        a, b = Histogram(), Histogram()
+        a.record(0.001)
+        a.record(-1)
+        b.record(0.1)
+        b.record(0.2)
+        self.assertIs(a.merge(b), a)
+        self.assertEqual(a.count, 4)
+        self.assertEqual(a.clamped, 1)
+        self.assertEqual(a.min, 1e-6)
+        self.assertEqual(a.max, 0.2)
+        self.assertEqual(a.percentile(100), 0.2)
+
+    def test_merge__empty(self):
+        h = Histogram()
+        h.record(0.1)
+        h.merge(Histogram())
+        self.assertEqual(h.count, 1)
+        self.assertEqual((h.min, h.max), (0.1, 0.1))
+
+    def test_as_dict__from_dict(self):
+        h = Histogram()
+        for value in (0.001, 0.01, 0.01, 5000.0):
+            h.record(value)
+        # must survive a json round-trip, where keys become lists.
+        h2 = Histogram.from_dict(json.loads(json.dumps(h.as_dict())))
+        self.assertEqual(h2.buckets, h.buckets)
+        self.assertEqual(h2.count, h.count)
+        self.assertEqual(h2.clamped, 1)
+        self.assertEqual((h2.min, h2.max), (h.min, h.max))
+        self.assertEqual(h2.percentile(50), h.percentile(50))
+
+    def test_from_dict__without_clamped(self):
+        d = Histogram().as_dict()
+        d.pop('clamped')
+        self.assertEqual(Histogram.from_dict(d).clamped, 0)
+
+
+class test_Samples(Case):
+
+    def test_negative(self):
+        s = Samples()
+        for value in (-0.5, 0.25, 1.0, -2.0):
+            s.record(value)
+        self.assertEqual(len(s), 4)
+        self.assertEqual(s.percentile(0), -2.0)
+        self.assertEqual(s.percentile(50), -0.5)
+        self.assertEqual(s.percentile(100), 1.0)
+        self.assertAlmostEqual(s.mean, -0.3125)
+        self.assertEqual(
+            s.summary(), 'min=-2.000s p50=-500.00ms p99=1.000s max=1.000s')
+
+    def test_empty(self):
+        s = Samples('%')
+        self.assertFalse(s)
+        self.assertIsNone(s.percentile(50))
+        self.assertIsNone(s.mean)
+        self.assertEqual(s.summary(), 'min=- p50=- p99=- max=-')
+
+    def test_merge(self):
+        a, b = Samples(values=[1.0]), Samples(values=[-1.0, 2.0])
+        self.assertIs(a.merge(b), a)
+        self.assertEqual(a.values, [1.0, -1.0, 2.0])
+
+    def test_as_dict__from_dict(self):
+        s = Samples('%', [-0.1, 0.2])
+        s2 = Samples.from_dict(json.loads(json.dumps(s.as_dict())))
+        self.assertEqual(s2.unit, '%')
+        self.assertEqual(s2.values, [-0.1, 0.2])
+        self.assertEqual(Samples.from_dict({}).unit, 's')
+
+
+class test_TestStats(Case):
+
+    def stats(self, name, runtime, latencies, times=()):
+        stats = Stats(name)
+        stats.runtime = runtime
+        stats.iterations = len(times) or 1
+        stats.times = list(times)
+        for value in latencies:
+            stats.latency.record(value)
+        return stats
+
+    def test_rate(self):
+        stats = self.stats('x', 2.0, [0.1] * 10)
+        self.assertEqual(stats.tasks, 10)
+        self.assertEqual(stats.rate, 5.0)
+        self.assertEqual(Stats('x').rate, 0.0)
+
+    def test_metric__sample(self):
+        stats = Stats('x')
+        self.assertIs(stats.metric('join'), stats.metric('join'))
+        self.assertIs(stats.sample('drop', '%'), stats.sample('drop'))
+        self.assertEqual(stats.sample('drop').unit, '%')
+        stats.metric('join').record(0.5)
+        stats.sample('drop').record(-0.25)
+        self.assertEqual(stats.metrics_summary(), [
+            'join: min=500.00ms p50=500.00ms p99=500.00ms max=500.00ms',
+            'drop: min=-25.0% p50=-25.0% p99=-25.0% max=-25.0%',
+        ])
+
+    def test_combine(self):
+        a = self.stats('a', 1.0, [0.1, 0.2], times=[0.5, 0.5])
+        b = self.stats('b', 3.0, [0.3], times=[1.0])
+        a.metric('join').record(0.1)
+        b.metric('join').record(0.2)
+        b.sample('delay').record(-1.0)
+        combined = Stats.combine('suite', [a, b])
+        self.assertEqual(combined.name, 'suite')
+        self.assertEqual(combined.iterations, 3)
+        self.assertEqual(combined.runtime, 4.0)
+        self.assertEqual(combined.tasks, 3)
+        self.assertEqual(combined.times, [0.5, 0.5, 1.0])
+        self.assertEqual(combined.metric('join').count, 2)
+        self.assertEqual(combined.sample('delay').values, [-1.0])
+        # the originals are not changed.
+        self.assertEqual(a.latency.count, 2)
+        self.assertEqual(a.metric('join').count, 1)
+
+    def test_combine__concurrent(self):
+        combined = Stats.combine('x', [
+            self.stats('x', 1.0, [0.1]), self.stats('x', 3.0, [0.1]),
+        ], concurrent=True)
+        self.assertEqual(combined.runtime, 3.0)
+        self.assertEqual(combined.rate, 2 / 3.0)
+
+    def test_converged(self):
+        stats = self.stats('x', 1.0, [], times=[1.0] * 4)
+        self.assertFalse(stats.converged(0.05))
+        stats.times.append(1.0)
+        self.assertTrue(stats.converged(0.05))
+        stats.times.extend([2.0, 0.1])
+        self.assertFalse(stats.converged(0.05))
+
+    def test_as_dict__from_dict(self):
+        stats = self.stats('x', 2.0, [0.1, 0.2], times=[1.0, 1.0])
+        stats.warmup = 3
+        stats.metric('join').record(0.5)
+        stats.sample('drop', '%').record(-0.5)
+        stats.leak = {'leak': False}
+        d = json.loads(json.dumps(stats.as_dict()))
+        stats2 = Stats.from_dict(d)
+        self.assertEqual(stats2.as_dict(), stats.as_dict())
+        self.assertEqual(stats2.sample('drop').unit, '%')
+
+
+class test_mean_ci(Case):
+
+    def test_empty(self):
+        self.assertEqual(mean_ci([]), (None, None))
+
+    def test_single(self):
+        self.assertEqual(mean_ci([2.0]), (2.0, None))
+
+    def test_constant(self):
+        self.assertEqual(mean_ci([2.0] * 10), (2.0, 0.0))
+
+    def test_values(self):
+        mean, half = mean_ci([1.0, 2.0, 3.0])
+        self.assertEqual(mean, 2.0)
+        # t(2) * stdev 1.0 / sqrt(3)
+        self.assertAlmostEqual(half, 4.303 / 3 ** 0.5)
+
+
+class test_t_critical(Case):
+
+    def test_table(self):
+        self.assertEqual(t_critical(1), 12.706)
+        self.assertEqual(t_critical(30), 2.042)
+
+    def test_large_df(self):
+        self.assertAlmostEqual(t_critical(40), 2.021, places=3)
+        self.assertAlmostEqual(t_critical(120), 1.980, places=3)
+        self.assertAlmostEqual(t_critical(10 ** 6), 1.960, places=3)
+
+
+class test_log_range(Case):
+
+    def test_range(self):
+        self.assertEqual(log_range(1, 64), [1, 4, 16, 64])
+        self.assertEqual(log_range(1, 100), [1, 4, 16, 64, 100])
+        self.assertEqual(log_range(1, 8, factor=2), [1, 2, 4, 8])
+
+    def test_single(self):
+        self.assertEqual(log_range(10, 10), [10])
+
+
+class test_find_cliff(Case):
+
+    def test_cliff(self):
+        self.assertEqual(
+            find_cliff([1, 2, 4, 8], [10.0, 20.0, 15.0, 5.0]),
+            (4, 8, 5.0 / 15.0))
+
+    def test_cliff_after_peak_only(self):
+        self.assertIsNone(find_cliff([1, 2, 4], [10.0, 1.0, 20.0]))
+        self.assertEqual(
+            find_cliff([1, 2, 4, 8], [10.0, 1.0, 20.0, 2.0]),
+            (4, 8, 0.1))
+
+    def test_no_cliff(self):
+        self.assertIsNone(find_cliff([1, 2, 4], [10.0, 8.0, 6.0]))
+        self.assertIsNone(find_cliff([], []))
+
+
+class test_format(Case):
+
+    def test_format_latency(self):
+        self.assertEqual(format_latency(None), '-')
+        self.assertEqual(format_latency(5e-6), '5us')
+        self.assertEqual(format_latency(0.0125), '12.50ms')
+        self.assertEqual(format_latency(2.5), '2.500s')
+
+    def test_format_value(self):
+        self.assertEqual(format_value(None), '-')
+        self.assertEqual(format_value(-0.0125), '-12.50ms')
+        self.assertEqual(format_value(0.0125), '12.50ms')
+        self.assertEqual(format_value(-0.25, '%'), '-25.0%')
+        self.assertEqual(format_value(1234.5, 'B'), '1.23e+03B')
+        self.assertEqual(format_value(2, None), '2')
+
+    def test_format_table(self):
+        self.assertEqual(
+            format_table(['test', 'n'], [['a', 10], ['long', 1]]),
+            'test   n\n'
+            'a     10\n'
+            'long   1',
+        )
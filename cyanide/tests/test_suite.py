@@ -0,0 +1,117 @@
+from __future__ import absolute_import, unicode_literals
+
+from io import StringIO
+
+from cyanide import suite
+from cyanide.suite import ParametrizedTest, expand_axes, parse_param_filters
+from cyanide.tests.case import Case, Mock
+
+
+class Payload(object):
+    label = 'BIG'
+
+
+class ExampleSuite(suite.Suite):
+
+    @suite.testcase('all', 'simple')
+    def plain(self):
+        pass
+
+    @suite.testcase('all', n=[1, 10], data=['a', 'b'])
+    def sweep(self, n, data):
+        return n, data
+
+    @suite.testcase('all', iterations=3, obj=[Payload()])
+    def labelled(self, obj):
+        return obj
+
+
+class test_parse_param_filters(Case):
+
+    def test_empty(self):
+        self.assertEqual(parse_param_filters(None), {})
+        self.assertEqual(parse_param_filters([]), {})
+
+    def test_filters(self):
+        self.assertEqual(
+            parse_param_filters(['n=1, 10', 'data=a', 'n=100']),
+            {'n': {'1', '10', '100'}, 'data': {'a'}})
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_param_filters(['n'])
+
+
+class test_expand_axes(Case):
+
+    def setup(self):
+        self.suite = ExampleSuite(Mock(name='app'), stdout=StringIO())
+
+    def test_not_parametrized(self):
+        self.assertEqual(expand_axes(self.suite.plain), [self.suite.plain])
+
+    def test_combinations(self):
+        tests = expand_axes(self.suite.sweep)
+        self.assertEqual([t.__name__ for t in tests], [
+            'sweep[data=a,n=1]', 'sweep[data=a,n=10]',
+            'sweep[data=b,n=1]', 'sweep[data=b,n=10]',
+        ])
+        for test in tests:
+            self.assertIsInstance(test, ParametrizedTest)
+            self.assertEqual(test.basename, 'sweep')
+        self.assertEqual(tests[1](), (10, 'a'))
+
+    def test_labels(self):
+        test, = expand_axes(self.suite.labelled)
+        self.assertEqual(test.__name__, 'labelled[obj=BIG]')
+        self.assertEqual(test.__iterations__, 3)
+        self.assertIsInstance(test(), Payload)
+
+    def test_matches(self):
+        test = expand_axes(self.suite.sweep)[0]
+        self.assertTrue(test.matches({}))
+        self.assertTrue(test.matches({'n': {'1', '10'}}))
+        self.assertFalse(test.matches({'n': {'10'}}))
+        # axes of other tests are ignored.
+        self.assertTrue(test.matches({'size': {'1'}}))
+
+    def test_testcase_requires_group(self):
+        with self.assertRaises(ValueError):
+            suite.testcase(n=[1])
+
+
+class test_filtertests(Case):
+
+    def setup(self):
+        self.suite = ExampleSuite(Mock(name='app'), stdout=StringIO())
+
+    def names(self, *args, **kwargs):
+        return [t.__name__ for t in self.suite.filtertests(*args, **kwargs)]
+
+    def test_group(self):
+        self.assertEqual(self.names('simple', None), ['plain'])
+        self.assertEqual(len(self.names('all', None)), 6)
+
+    def test_by_name(self):
+        self.assertEqual(
+            self.names('all', ['sweep[data=b,n=1]', 'plain']),
+            ['sweep[data=b,n=1]', 'plain'])
+        self.assertEqual(len(self.names('all', ['sweep'])), 4)
+        with self.assertRaises(KeyError):
+            self.names('all', ['nosuchtest'])
+
+    def test_params(self):
+        self.assertEqual(
+            self.names('all', None, ['n=10', 'data=b']),
+            ['plain', 'sweep[data=b,n=10]', 'labelled[obj=BIG]'])
+        self.assertEqual(
+            self.names('all', ['sweep'], ['n=1']),
+            ['sweep[data=a,n=1]', 'sweep[data=b,n=1]'])
+
+    def test_include_test(self):
+        self.suite.include_test = lambda test: (
+            getattr(test, 'params', {}).get('data') != 'a')
+        self.suite.init_groups()
+        self.assertEqual(
+            self.names('all', ['sweep']),
+            ['sweep[data=b,n=1]', 'sweep[data=b,n=10]'])
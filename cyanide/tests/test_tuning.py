@@ -0,0 +1,72 @@
+from __future__ import absolute_import, unicode_literals
+
+import math
+
+from cyanide.tests.case import Case, Mock
+from cyanide.tuning import Search, parse_range
+
+
+class test_parse_range(Case):
+
+    def test_range(self):
+        self.assertEqual(parse_range('1:64'), (1, 64))
+        self.assertEqual(parse_range('8'), (8, 8))
+
+    def test_default(self):
+        self.assertEqual(parse_range(None), (1, 256))
+        self.assertEqual(parse_range(True, default=(2, 4)), (2, 4))
+
+
+class test_Search(Case):
+
+    def peak_at(self, best):
+        # measurements are the score, highest at ``best``.
+        return Mock(name='measure', side_effect=lambda value: -abs(
+            math.log(value) - math.log(best)))
+
+    def test_search(self):
+        search = Search(self.peak_at(24), 1, 256)
+        self.assertAlmostEqual(search.search(lambda m: m), 24, delta=2)
+        # the coarse grid is measured first.
+        self.assertEqual(list(search.results)[:5], [1, 4, 16, 64, 256])
+        self.assertLess(len(search.results), 256)
+
+    def test_grid_point(self):
+        search = Search(self.peak_at(16), 1, 256)
+        self.assertEqual(search.search(lambda m: m), 16)
+
+    def test_edges(self):
+        self.assertEqual(Search(self.peak_at(1), 1, 256).search(
+            lambda m: m), 1)
+        self.assertEqual(Search(self.peak_at(256), 1, 256).search(
+            lambda m: m), 256)
+
+    def test_measurements_cached(self):
+        measure = self.peak_at(24)
+        search = Search(measure, 1, 256)
+        search.evaluate(4)
+        search.evaluate(4)
+        measure.assert_called_once_with(4)
+        # searching for several scores measures every value once.
+        search.search(lambda m: m)
+        search.search(lambda m: -m)
+        self.assertEqual(measure.call_count, len(search.results))
+
+    def test_failed_measurements(self):
+        search = Search(lambda value: None if value > 4 else value, 1, 256)
+        self.assertEqual(search.search(lambda m: m), 4)
+
+    def test_all_failed(self):
+        search = Search(lambda value: None, 1, 256)
+        self.assertIsNone(search.search(lambda m: m))
+
+    def test_rounds(self):
+        search = Search(self.peak_at(24), 1, 256, rounds=0)
+        self.assertEqual(search.search(lambda m: m), 16)
+
+    def test_between(self):
+        search = Search(None)
+        search.results.update((v, v) for v in (1, 4, 16))
+        self.assertEqual(search.between(4), [2, 8])
+        self.assertEqual(search.between(1), [2])
+        self.assertEqual(search.between(16), [8])
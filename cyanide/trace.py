@@ -0,0 +1,232 @@
+"""Recording and replaying task traffic.
+
+:class:`Recorder` consumes the worker event stream (like
+:class:`~cyanide.fbi.FBI`), and writes a line for every task completed
+to a trace file as it happens: when the task was received relative to
+the first task, its name, the size of its arguments and result, and
+its runtime.  Only tasks not yet completed are kept in memory.
+
+:class:`Replay` publishes :task:`~cyanide.tasks.stand_in` tasks with the
+same arguments size, runtime and result size, at the same intervals as
+recorded (or faster or slower), using the name of the recorded task
+in logs and events.
+
+The argument and result sizes are the length of their representation
+in the events, which the worker truncates (by default to 1024
+characters).
+
+Trace files are compressed if the name ends with ``.gz``.  The first
+line is a json header, followed by a json list for every task::
+
+    [received, name, argument size, result size, runtime]
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import gzip
+import heapq
+import io
+import json
+import sys
+import threading
+
+from collections import OrderedDict
+from itertools import count
+from time import sleep, time
+
+from celery.five import monotonic
+from celery.utils import uuid
+
+from .compat import text_t
+from .data import payload
+from .loadgen import OpenLoop
+from .tasks import stand_in
+
+__all__ = ['Recorder', 'Replay', 'read_trace']
+
+F_RECORDED = """\
+recorded {tasks} tasks of {names} types in {elapsed:.1f}s \
+({rate:.1f} tasks/s, {dropped} dropped)\
+"""
+
+#: Version of the trace file format.
+VERSION = 1
+
+
+def open_trace(path, mode='r'):
+    if path.endswith('.gz'):
+        return io.TextIOWrapper(gzip.open(path, mode + 'b'))
+    return io.open(path, mode)
+
+
+def read_trace(path):
+    """Iterate over the tasks in trace file, in the order recorded."""
+    with open_trace(path) as fh:
+        header = json.loads(fh.readline() or '{}')
+        if header.get('version') != VERSION:
+            raise ValueError('{0}: not a trace file (version {1!r})'.format(
+                path, header.get('version')))
+        for line in fh:
+            yield json.loads(line)
+
+
+def _size(value):
+    return len(value) if value else 0
+
+
+class Recorder(object):
+    """Record tasks executed by workers to a trace file.
+
+    :param path: Trace file to write.
+    :keyword max_pending: Max number of tasks not completed to keep
+        track of, the oldest are dropped first.
+
+    """
+
+    def __init__(self, app, path, max_pending=10000, stdout=None):
+        self.app = app
+        self.path = path
+        self.max_pending = max_pending
+        self.stdout = sys.stdout if stdout is None else stdout
+        self.pending = OrderedDict()
+        self.names = set()
+        self.epoch = None
+        self.tasks = 0
+        self.dropped = 0
+        self.file = None
+        self.lock = threading.Lock()
+
+    def print(self, message):
+        print(message, file=self.stdout)
+
+    def run(self, duration=None):
+        """Record until ``duration`` seconds passed, or interrupted."""
+        self.print('+enable worker task events...')
+        self.app.control.enable_events()
+        started = monotonic()
+        with self.app.connection() as conn:
+            receiver = self.app.events.Receiver(conn, handlers={
+                'task-received': self.on_received,
+                'task-started': self.on_started,
+                'task-succeeded': self.on_completed,
+                'task-failed': self.on_completed,
+            })
+            thread = threading.Thread(
+                target=receiver.run, name='cyanide.Recorder')
+            thread.daemon = True
+            with open_trace(self.path, 'w') as self.file:
+                self.write({'version': VERSION, 'recorded': time()})
+                self.print('+recording to {0}...'.format(self.path))
+                thread.start()
+                try:
+                    while duration is None or \
+                            monotonic() - started < duration:
+                        sleep(0.5)
+                except KeyboardInterrupt:
+                    pass
+                receiver.should_stop = True
+                thread.join(5.0)
+                with self.lock:
+                    self.file.flush()
+        elapsed = monotonic() - started
+        self.print(F_RECORDED.format(
+            tasks=self.tasks, names=len(self.names), elapsed=elapsed,
+            rate=self.tasks / elapsed if elapsed else 0.0,
+            dropped=self.dropped,
+        ))
+        return self.tasks
+
+    def write(self, record):
+        line = json.dumps(record, separators=(',', ':'))
+        with self.lock:
+            self.file.write(text_t(line) + '\n')
+
+    def on_received(self, event):
+        if self.epoch is None:
+            self.epoch = event['timestamp']
+        self.pending[event['uuid']] = [
+            round(event['timestamp'] - self.epoch, 6), event.get('name'),
+            _size(event.get('args')) + _size(event.get('kwargs')), None,
+        ]
+        if len(self.pending) > self.max_pending:
+            self.pending.popitem(last=False)
+            self.dropped += 1
+
+    def on_started(self, event):
+        task = self.pending.get(event['uuid'])
+        if task is not None:
+            task[3] = event['timestamp']
+
+    def on_completed(self, event):
+        task = self.pending.pop(event['uuid'], None)
+        if task is None:  # received before recording started
+            return
+        received, name, arg_size, started = task
+        runtime = event.get('runtime')
+        if runtime is None:
+            runtime = event['timestamp'] - (started or event['timestamp'])
+        self.write([received, name, arg_size,
+                    _size(event.get('result')), round(runtime, 6)])
+        self.names.add(name)
+        self.tasks += 1
+
+
+class Replay(OpenLoop):
+    """Publish tasks at the times recorded in a trace file.
+
+    :param path: Trace file to read.
+    :keyword speed: Speed relative to the recording, e.g. ``10.0``
+        publishes ten times as fast (runtimes stay the same).
+    :keyword window: Seconds of the trace read ahead, as tasks are
+        recorded in the order they completed, not received.
+
+    """
+    task = stand_in
+
+    def __init__(self, app, path, speed=1.0, window=60.0, **kwargs):
+        self.path = path
+        self.speed = speed
+        self.window = window
+        # only the length and rate are needed up front.
+        tasks, duration = 0, 0.0
+        for record in read_trace(path):
+            tasks += 1
+            duration = max(duration, record[0])
+        if not tasks:
+            raise ValueError('{0}: no tasks in trace'.format(path))
+        duration = max(duration / speed, 1e-3)
+        super(Replay, self).__init__(
+            app, [(tasks / duration, duration)], **kwargs)
+
+    def run(self):
+        self.print('replay: {0} at {1:g}x speed'.format(
+            self.path, self.speed))
+        return super(Replay, self).run()
+
+    def records(self):
+        """Iterate over tasks in the order received."""
+        ahead, seq = [], count()
+        for record in read_trace(self.path):
+            heapq.heappush(ahead, (record[0], next(seq), record))
+            while ahead[0][0] < record[0] - self.window:
+                yield heapq.heappop(ahead)[2]
+        while ahead:
+            yield heapq.heappop(ahead)[2]
+
+    def publish(self, step, intended, published, reply_to):
+        with self.app.producer_or_acquire() as producer:
+            for received, name, arg_size, result_size, runtime \
+                    in self.records():
+                scheduled = step.started + received / self.speed
+                delay = scheduled - monotonic()
+                if delay > 0:
+                    sleep(delay)
+                task_id = uuid()
+                intended[task_id] = scheduled
+                published.put(self.task.apply_async(
+                    (payload(arg_size) if arg_size else None,
+                     runtime, result_size),
+                    task_id=task_id, producer=producer,
+                    reply_to=reply_to, shadow=name,
+                ))
+                step.published += 1
+        step.publish_time = monotonic() - step.started
@@ -0,0 +1,175 @@
+"""Searching for the best prefetch multiplier.
+
+Every setting is measured by starting local workers with
+:envvar:`CYANIDE_PREFETCH` set, and running the selected tests in a
+child process.  Instead of trying every value, a coarse log-scale
+grid is measured first, and the search then narrows in on the best
+value found so far.
+"""
+from __future__ import absolute_import, print_function, unicode_literals
+
+import math
+import os
+import sys
+
+from collections import OrderedDict
+
+from celery.five import items, values
+
+from .compare import run_report
+from .fleet import Fleet
+from .stats import TestStats, format_latency, format_table, log_range
+
+__all__ = ['Search', 'Tuner', 'parse_range']
+
+
+def parse_range(s, default=(1, 256)):
+    """Parse ``LOW:HIGH`` (e.g. ``1:256``)."""
+    if not s or s is True:
+        return default
+    low, _, high = s.partition(':')
+    return int(low), int(high or low)
+
+
+class Search(object):
+    """Coarse-to-fine search for the integer maximizing a score.
+
+    :param measure: Function called with a value, returning a measurement
+        (or :const:`None` if it failed).  Measurements are cached, so
+        searching for several scores reuses them.
+    :keyword factor: Step between values of the coarse grid.
+    :keyword rounds: Max number of refinement rounds.
+
+    """
+
+    def __init__(self, measure, lowest=1, highest=256, factor=4, rounds=4):
+        self.measure = measure
+        self.lowest = lowest
+        self.highest = highest
+        self.factor = factor
+        self.rounds = rounds
+        self.results = OrderedDict()
+
+    def evaluate(self, value):
+        if value not in self.results:
+            self.results[value] = self.measure(value)
+        return self.results[value]
+
+    def best(self, score):
+        scored = [(score(m), value) for value, m in items(self.results)
+                  if m is not None and score(m) is not None]
+        return max(scored)[1] if scored else None
+
+    def search(self, score):
+        """Return value with the highest ``score(measurement)``."""
+        for value in log_range(self.lowest, self.highest, self.factor):
+            self.evaluate(value)
+        for _ in range(self.rounds):
+            best = self.best(score)
+            if best is None:
+                return None
+            new = [v for v in self.between(best) if v not in self.results]
+            if not new:
+                break
+            for value in new:
+                self.evaluate(value)
+        return self.best(score)
+
+    def between(self, value):
+        # geometric midpoints between value and its measured neighbours.
+        measured = sorted(self.results)
+        i = measured.index(value)
+        neighbours = measured[max(i - 1, 0):i] + measured[i + 1:i + 2]
+        return sorted(set(
+            int(round(math.sqrt(value * other))) for other in neighbours
+        ) - set([value]))
+
+
+class Tuner(object):
+    """Find the prefetch multiplier giving the highest throughput,
+    and the one giving the lowest p99 latency.
+
+    :param argv: Arguments passed on to every :program:`celery cyanide`
+        child process (the tests to run).
+    :keyword prefetch: Tuple of ``(lowest, highest)`` multiplier.
+    :keyword concurrency: List of pool concurrency values to search
+        the prefetch multiplier for, by default the worker default.
+
+    """
+
+    def __init__(self, app, argv, prefetch=(1, 256), concurrency=None,
+                 workers=1, pool=None, logdir=None, template=None,
+                 stdout=None, python=None):
+        self.app = app
+        self.argv = argv
+        self.prefetch = prefetch
+        self.concurrency = concurrency or [None]
+        self.workers = workers
+        self.pool = pool
+        self.logdir = logdir
+        self.template = template or app.template or 'default'
+        self.stdout = sys.stdout if stdout is None else stdout
+        self.python = python
+
+    def print(self, message):
+        print(message, file=self.stdout)
+
+    def run(self):
+        best = OrderedDict()
+        rows = []
+        for concurrency in self.concurrency:
+            search = Search(
+                lambda prefetch: self.measure(prefetch, concurrency),
+                *self.prefetch)
+            best[concurrency] = (
+                search.search(lambda s: s.rate or None),
+                search.search(lambda s: _negated(s.latency.percentile(99))),
+                search.results,
+            )
+            rows.extend(
+                [concurrency or '-', prefetch] + _columns(stats)
+                for prefetch, stats in sorted(items(search.results))
+            )
+        self.print(format_table(
+            ['concurrency', 'prefetch', 'tasks/s', 'p50', 'p99'], rows))
+        for concurrency, (throughput, p99, results) in items(best):
+            prefix = ('concurrency {0}: '.format(concurrency)
+                      if concurrency else '')
+            self.print('{0}best throughput: prefetch={1}{2}'.format(
+                prefix, throughput, _describe(results.get(throughput))))
+            self.print('{0}best p99 latency: prefetch={1}{2}'.format(
+                prefix, p99, _describe(results.get(p99))))
+        return best
+
+    def measure(self, prefetch, concurrency=None):
+        self.print('+measuring prefetch={0} concurrency={1}'.format(
+            prefetch, concurrency or 'default'))
+        env = dict(os.environ, CYANIDE_PREFETCH=str(prefetch))
+        with Fleet(self.app, self.workers, concurrency=concurrency,
+                   pool=self.pool, logdir=self.logdir, template=self.template,
+                   env=env, stdout=self.stdout):
+            retcode, report = run_report(
+                self.template, self.argv, self.python, env=env)
+        if retcode or not report:
+            self.print('-prefetch={0} failed with exit code {1}'.format(
+                prefetch, retcode))
+            return None
+        return TestStats.combine('(total)', list(values(report)))
+
+
+def _negated(value):
+    return -value if value is not None else None
+
+
+def _columns(stats):
+    if stats is None:
+        return ['failed', '-', '-']
+    return ['{0:.1f}'.format(stats.rate),
+            format_latency(stats.latency.percentile(50)),
+            format_latency(stats.latency.percentile(99))]
+
+
+def _describe(stats):
+    if stats is None:
+        return ''
+    return ' ({0} tasks/s, p50={1}, p99={2})'.format(*_columns(stats))